@@ -1,15 +1,19 @@
 from langgraph.graph import StateGraph, START, END
 from langgraph.prebuilt import ToolNode
 import asyncio
-from ..prebuilt import tools_condition, ToolState
+from ..prebuilt import tools_condition, ToolState, AGENT_STREAMING, run_agent_turn
 from typing import Sequence
-from langchain_core.language_models import BaseChatModel
+from langchain_core.language_models import LanguageModelLike
 from langchain_core.prompts.base import BasePromptTemplate
 from langchain_core.tools import BaseTool
 from langchain_core.prompts import ChatPromptTemplate
 from ..models.schemas import ArchitectAgentResult
 from typing import List, Dict, Optional
-from langchain_core.messages import HumanMessage
+from langchain_core.messages import HumanMessage, AIMessage
+from langchain_core.runnables import RunnableConfig
+from ..utils.progress import emit_progress
+from ..core.deadline import DeadlineExceeded, current_deadline
+from ..core.model_router import update_model
 import json,re
 class ArchitectState(ToolState):
     """Architect 에이전트 전용으로 확장된 상태"""
@@ -26,21 +30,42 @@ class ArchitectState(ToolState):
     architect_result: Optional[ArchitectAgentResult]
 
 def create_architect_agent(
-        model: BaseChatModel,
+        model: LanguageModelLike,
         tools: Sequence[BaseTool],
         prompt: BasePromptTemplate,
-        name: str = "agent"
+        name: str = "agent",
+        streaming: bool = AGENT_STREAMING,
     ) -> StateGraph:
     """
         Based on create_react_agent from langchain.
         This function uses custom tool_condition and logic for ai-cm usecases.
+        With `streaming`, each turn streams its tokens into the graph's event stream.
     """
+    if not streaming:
+        # 스트리밍 콜백이 붙어 있어도 응답을 한 번에 받는다
+        model = update_model(model, disable_streaming=True)
     model_with_tools = model.bind_tools(tools)
     agent_chain = prompt | model_with_tools
 
-    async def agent(state: ArchitectState) -> ArchitectState:
+    async def agent(state: ArchitectState, config: RunnableConfig) -> ArchitectState:
         """Confluence agent."""
-        result = await asyncio.to_thread(agent_chain.invoke, state)
+        deadline = current_deadline()
+        if deadline.expired:
+            # 단계 예산을 모두 썼으므로 지금까지의 결과로 마무리한다
+            return {}
+        try:
+            async with asyncio.timeout(deadline.remaining()):
+                result = await run_agent_turn(agent_chain, state, config, streaming)
+        except (TimeoutError, DeadlineExceeded):
+            await emit_progress("architect_deadline", {"owner": state.get("owner")}, config)
+            return {}
+        # 에이전트 턴마다 진행 상황을 이벤트 스트림으로 보고한다
+        step = sum(1 for msg in state.get("messages", []) if isinstance(msg, AIMessage)) + 1
+        await emit_progress("architect_step", {
+            "owner": state.get("owner"),
+            "step": step,
+            "tool_calls": [tc.get("name") for tc in (getattr(result, "tool_calls", None) or [])],
+        }, config)
         return {"messages": [result], "intermediate_steps": [result.content]}
 
     async def answer_generator(state: ArchitectState) -> ArchitectState:
@@ -148,7 +173,8 @@ def create_architect_agent(
 
         decision = tools_condition(state)
 
-        if decision == "tools":
+        # 예산(시간 또는 단계)이 끝나면 남은 도구 호출 없이 부분 결과를 만든다
+        if decision == "tools" and not current_deadline().expired and state["remaining_steps"] > 2:
             return "tools"
 
         return "answer_generator"
@@ -1,28 +1,33 @@
 from langgraph.graph import StateGraph, START, END
 from langgraph.prebuilt import ToolNode
-import asyncio
-from ..prebuilt import tools_condition, ToolState
+from ..prebuilt import tools_condition, ToolState, AGENT_STREAMING, run_agent_turn
+from ..core.model_router import update_model
 from typing import Sequence
-from langchain_core.language_models import BaseChatModel
+from langchain_core.language_models import LanguageModelLike
 from langchain_core.prompts.base import BasePromptTemplate
 from langchain_core.tools import BaseTool
+from langchain_core.runnables import RunnableConfig
 
 def create_custom_react_agent(
-        model: BaseChatModel,
+        model: LanguageModelLike,
         tools: Sequence[BaseTool],
         prompt: BasePromptTemplate,
-        name: str = "agent"
+        name: str = "agent",
+        streaming: bool = AGENT_STREAMING,
     ) -> StateGraph:
     """
         Based on create_react_agent from langchain.
         This function uses custom tool_condition and logic for ai-cm usecases.
+        With `streaming`, each turn streams its tokens into the graph's event stream.
     """
+    if not streaming:
+        model = update_model(model, disable_streaming=True)
     model_with_tools = model.bind_tools(tools)
     agent_chain = prompt | model_with_tools
 
-    async def agent(state: ToolState) -> ToolState:
+    async def agent(state: ToolState, config: RunnableConfig) -> ToolState:
         """Confluence agent."""
-        result = await asyncio.to_thread(agent_chain.invoke, state)
+        result = await run_agent_turn(agent_chain, state, config, streaming)
         return {"messages": [result], "intermediate_steps": [result.content]}
 
     graph_builder = StateGraph(ToolState)
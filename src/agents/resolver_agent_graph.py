@@ -1,17 +1,18 @@
 # /agents/cr_agent.py
 
-import asyncio
 from typing import Sequence, List, Dict, Optional
 import re
-from langchain_core.language_models import BaseChatModel
+from langchain_core.language_models import LanguageModelLike
 from langchain_core.messages import HumanMessage
 from langchain_core.prompts.base import BasePromptTemplate
 from langchain_core.tools import BaseTool
+from langchain_core.runnables import RunnableConfig
 from langgraph.graph import StateGraph, START, END
 from langgraph.prebuilt import ToolNode, tools_condition
 import json
 from ..models.schemas import ResolverAgentResult # Pydantic 모델 (별도 파일에 정의 가정)
-from ..prebuilt import ToolState # LangGraph의 기본 상태 (별도 파일에 정의 가정)
+from ..prebuilt import ToolState, AGENT_STREAMING, run_agent_turn # LangGraph의 기본 상태 (별도 파일에 정의 가정)
+from ..core.model_router import update_model
 
 
 class ResolverState(ToolState):
@@ -27,23 +28,28 @@ class ResolverState(ToolState):
 
 
 def create_resolver_agent(
-        model: BaseChatModel,
+        model: LanguageModelLike,
         tools: Sequence[BaseTool],
         prompt: BasePromptTemplate,
-        name: str = "resolver_agent"
+        name: str = "resolver_agent",
+        streaming: bool = AGENT_STREAMING,
     ) -> StateGraph:
     """
     Langchain의 ReAct 에이전트를 기반으로, 코드 충돌 해결 및 통합(CR)
     유스케이스에 맞춰 커스텀된 StateGraph를 생성합니다.
+    `streaming`이 켜져 있으면 각 턴의 토큰을 이벤트 스트림으로 바로 내보냅니다.
     """
+    if not streaming:
+        # 스트리밍 콜백이 붙어 있어도 응답을 한 번에 받는다
+        model = update_model(model, disable_streaming=True)
     # 모델에 도구를 바인딩하여, LLM이 도구 사용을 결정할 수 있도록 합니다.
     model_with_tools = model.bind_tools(tools)
     # 프롬프트와 모델을 연결하여 에이전트의 핵심 체인을 구성합니다.
     agent_chain = prompt | model_with_tools
 
-    async def agent(state: ResolverState) -> ResolverState:
+    async def agent(state: ResolverState, config: RunnableConfig) -> ResolverState:
         """Confluence agent."""
-        result = await asyncio.to_thread(agent_chain.invoke, state)
+        result = await run_agent_turn(agent_chain, state, config, streaming)
         return {"messages": [result], "intermediate_steps": [result.content]}
 
     async def answer_generator(state: ResolverState) -> ResolverState:
@@ -74,7 +80,8 @@ def create_resolver_agent(
         LangGraph의 내장 `tools_condition`을 사용하여 분기합니다.
         """
         decision = tools_condition(state)
-        if decision == "tools":
+        # 단계 예산(recursion_limit)이 끝나면 도구 호출 없이 마무리한다
+        if decision == "tools" and state["remaining_steps"] > 2:
               return "tools"
 
         return "answer_generator"
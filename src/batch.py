@@ -0,0 +1,184 @@
+"""
+Offline batch mode: runs many workflow requests from a JSONL file without the HTTP server.
+
+Usage:
+    python -m src.batch jobs.jsonl -o results.jsonl -c 4
+
+Every input line is a JSON object with `input` and `git_url` (and optionally an
+`id`, a `deadline_seconds` overriding `RUN_DEADLINE_SECONDS` and a rate limiter `priority`,
+`low` by default so batches yield Bedrock capacity to interactive runs). Every output line holds the job id, the run status, the elapsed time and
+the (optionally projected) final state, written as soon as the run finishes.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+from typing import Optional
+
+from dotenv import load_dotenv
+from fastapi.encoders import jsonable_encoder
+from langchain_core.messages import HumanMessage
+
+from .logging_config import setup_logging
+from .workflow.graph import graph
+from .core.config import load_github_config
+from .services.run_service import WorkflowRunService, request_fingerprint
+from .services.admission_service import FairRunQueue
+from .services.event_log import EventLogStore
+from .utils.response_utils import parse_fields, project_state
+from .constants.run_status import RunStatus
+
+setup_logging()
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+def read_jobs(path: str) -> list[dict]:
+    """
+    Reads the job file, skipping blank lines. Jobs without an `id` are numbered by line.
+
+    Raises:
+        ValueError: If a line is not a JSON object with `input` and `git_url`.
+    """
+    jobs = []
+    with open(path, encoding="utf-8") as f:
+        for line_no, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            job = json.loads(line)
+            if not isinstance(job, dict) or not job.get("input") or not job.get("git_url"):
+                raise ValueError(f"{path}:{line_no}: a job needs `input` and `git_url`")
+            job.setdefault("id", str(line_no))
+            jobs.append(job)
+    return jobs
+
+def completed_job_ids(path: str) -> set[str]:
+    """Ids of jobs that already succeeded in an earlier invocation writing to `path`."""
+    if not os.path.exists(path):
+        return set()
+    done = set()
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if record.get("status") == RunStatus.SUCCEEDED.value:
+                done.add(str(record.get("id")))
+    return done
+
+async def run_batch(
+    jobs: list[dict],
+    output_path: str,
+    concurrency: int,
+    fields: Optional[str] = None,
+    append: bool = False,
+) -> dict[str, int]:
+    """
+    Runs the jobs on a `WorkflowRunService` and appends one result line per job.
+
+    The service provides the same execution path as the server: identical jobs
+    share a single run, at most `concurrency` runs execute at once, and the
+    process-wide container and Bedrock caps apply across all of them.
+
+    Args:
+        jobs (list[dict]): Jobs from `read_jobs`.
+        output_path (str): JSONL file to write results to.
+        concurrency (int): Number of workflow runs executed at the same time.
+        fields (str | None): Comma-separated state fields to keep, as in `?fields=` of the API.
+        append (bool): Append to `output_path` instead of truncating it.
+
+    Returns:
+        dict[str, int]: Number of jobs per final run status.
+    """
+    service = WorkflowRunService(
+        graph,
+        max_concurrency=concurrency,
+        event_logs=EventLogStore(os.environ.get("EVENT_LOG_DIR", "logs/runs")),
+        # Every job is admitted up front; the workers pace the actual execution
+        queue=FairRunQueue(max_queued=max(1, len(jobs)), max_queued_per_tenant=max(1, len(jobs))),
+        run_deadline=float(os.environ.get("RUN_DEADLINE_SECONDS", "0")) or None,
+    )
+    await service.start()
+    projection = parse_fields(fields)
+    counts: dict[str, int] = {}
+
+    async def run_job(job: dict, run) -> dict:
+        await run.wait()
+        return {
+            "id": job["id"],
+            "run_id": run.run_id,
+            "status": run.status.value,
+            "error": run.error,
+            "elapsed_seconds": round(time.time() - run.created_at, 1),
+            "response": jsonable_encoder(project_state(run.result, projection)),
+        }
+
+    runs, tasks = [], []
+    for job in jobs:
+        run, created = service.submit(
+            {"messages": [HumanMessage(content=job["input"])], "base_url": job["git_url"]},
+            config={"configurable": {
+                "deadline_seconds": job.get("deadline_seconds"),
+                "priority": job.get("priority", "low"),
+            }},
+            dedup_key=request_fingerprint(job["input"], job["git_url"]),
+            tenant="batch",
+            detached=True,
+        )
+        if not created:
+            logger.info(f"Job {job['id']} shares run {run.run_id} with an identical job")
+        runs.append(run)
+        tasks.append(asyncio.create_task(run_job(job, run)))
+
+    try:
+        with open(output_path, "a" if append else "w", encoding="utf-8") as out:
+            for finished in asyncio.as_completed(tasks):
+                record = await finished
+                out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                out.flush()
+                counts[record["status"]] = counts.get(record["status"], 0) + 1
+                logger.info(f"Job {record['id']} {record['status']} ({sum(counts.values())}/{len(jobs)})")
+    finally:
+        # On Ctrl-C, stop the runs so their shell commands and containers are torn down
+        for task in tasks:
+            task.cancel()
+        for run in runs:
+            service.cancel(run, "Batch was interrupted.")
+        await service.stop()
+    return counts
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Run workflow requests from a JSONL file without the HTTP server.")
+    parser.add_argument("jobs", help="JSONL file with one {\"input\", \"git_url\"} job per line.")
+    parser.add_argument("-o", "--output", default="batch_results.jsonl", help="JSONL file to write results to.")
+    parser.add_argument(
+        "-c", "--concurrency",
+        type=int,
+        default=int(os.environ.get("WORKFLOW_MAX_CONCURRENCY", "4")),
+        help="Number of workflow runs executed at the same time.",
+    )
+    parser.add_argument("--fields", default=None, help="Comma-separated state fields to keep, e.g. `response,agent_results.cost_usd`.")
+    parser.add_argument("--resume", action="store_true", help="Skip jobs that already succeeded in the output file and append to it.")
+    args = parser.parse_args(argv)
+
+    jobs = read_jobs(args.jobs)
+    if args.resume:
+        done = completed_job_ids(args.output)
+        jobs = [job for job in jobs if str(job["id"]) not in done]
+        logger.info(f"Skipping {len(done)} jobs that already succeeded")
+    if not jobs:
+        logger.info("Nothing to run")
+        return 0
+
+    load_github_config()
+    counts = asyncio.run(run_batch(jobs, args.output, args.concurrency, args.fields, append=args.resume))
+    logger.info(f"Batch finished: {counts}")
+    return 0 if counts.get(RunStatus.SUCCEEDED.value, 0) == len(jobs) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,5 +1,6 @@
 """Constants for the project."""
 
 from .aws_model import AWSModel
+from .run_status import RunStatus
 
-__all__ = ["AWSModel"]
+__all__ = ["AWSModel", "RunStatus"]
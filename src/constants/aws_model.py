@@ -32,6 +32,7 @@ class AWSModel(str, Enum):
     ANTHROPIC_CLAUDE_2_1_CROSS_REGION = "us.anthropic.claude-2.1-cross-region"
     ANTHROPIC_CLAUDE_INSTANT_CROSS_REGION = "us.anthropic.claude-instant-v1-cross-region"
     ANTHROPIC_CLAUDE_3_7_SONNET_CROSS_REGION = "us.anthropic.claude-3-7-sonnet-20250219-v1:0"
+    ANTHROPIC_CLAUDE_3_5_HAIKU_CROSS_REGION = "us.anthropic.claude-3-5-haiku-20241022-v1:0"
     META_LLAMA4_SCOUT_17B_INSTRUCT_CROSS_REGION = "us.meta.llama4-scout-17b-instruct-v1:0"
     META_LLAMA4_MAVERICK_17B_INSTRUCT_CROSS_REGION = "us.meta.llama4-maverick-17b-instruct-v1:0"
     META_LLAMA3_3_70B_CROSS_REGION = "us.meta.llama3-3-70b-instruct-v1:0"
@@ -82,7 +83,8 @@ class AWSModel(str, Enum):
             cls.COHERE_COMMAND_CROSS_REGION,
             cls.COHERE_COMMAND_LIGHT_CROSS_REGION,
             cls.ANTHROPIC_CLAUDE_4_SONNET_CROSS_REGION,
-            cls.ANTHROPIC_CLAUDE_4_SONNET_SEOUL_CROSS_REGION
+            cls.ANTHROPIC_CLAUDE_4_SONNET_SEOUL_CROSS_REGION,
+            cls.ANTHROPIC_CLAUDE_3_5_HAIKU_CROSS_REGION
         ]
 
     @classmethod
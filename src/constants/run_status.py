@@ -0,0 +1,27 @@
+"""
+Lifecycle states for workflow runs executed by the background worker pool.
+"""
+
+from enum import Enum
+
+class RunStatus(str, Enum):
+    """
+    Status of a workflow run submitted through the job API.
+    """
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+    # Stopped at its deadline; the result holds the state reached so far
+    DEADLINE_EXCEEDED = "deadline_exceeded"
+
+    @classmethod
+    def terminal_states(cls):
+        """Get the states a run can no longer leave"""
+        return {cls.SUCCEEDED, cls.FAILED, cls.CANCELLED, cls.DEADLINE_EXCEEDED}
+
+    @classmethod
+    def resumable_states(cls):
+        """Get the terminal states a run can be resumed from"""
+        return {cls.FAILED, cls.CANCELLED, cls.DEADLINE_EXCEEDED}
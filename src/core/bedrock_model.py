@@ -0,0 +1,456 @@
+import asyncio
+import contextvars
+import itertools
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, AsyncIterator, Iterator, List, Optional
+
+from langchain_aws import ChatBedrockConverse
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatGenerationChunk, ChatResult
+from pydantic import Field
+
+from .bedrock_pool import BedrockEndpoint, is_endpoint_failure
+from .brownout import brownout
+from .cancellation import current_token
+from .deadline import DeadlineExceeded, current_deadline
+from .hedging import Admission, call_site, first_of, hedge_policy
+from .model_router import current_node, model_usage
+from .prompt_cache import insert_cache_points, prompt_cache_stats, supports_prompt_caching
+from .rate_limiter import bedrock_limiter, current_lane, is_throttling_error, retry_after_seconds
+
+# boto3 has no async client, so async model calls block a thread of their own pool
+# instead of one of the event loop's default executor, which tools and stores share.
+# Calls hold a Bedrock slot before they are submitted, so the pool only needs to be
+# as large as the slot limit.
+bedrock_executor = ThreadPoolExecutor(
+    max_workers=int(os.environ.get("BEDROCK_EXECUTOR_WORKERS", "64")),
+    thread_name_prefix="bedrock",
+)
+
+# Output tokens reserved against the token quota for calls without `max_tokens`
+OUTPUT_TOKEN_ESTIMATE = int(os.environ.get("BEDROCK_OUTPUT_TOKEN_ESTIMATE", "1024"))
+
+# Retries of throttled, failing or unreachable requests, on top of the limiter's admission
+THROTTLE_RETRIES = int(os.environ.get("BEDROCK_THROTTLE_RETRIES", "4"))
+
+def _should_retry(error: Exception, attempt: int) -> bool:
+    return attempt < THROTTLE_RETRIES and is_endpoint_failure(error)
+
+def _backoff(attempt: int) -> float:
+    # Full jitter; the limiter has already shrunk its window and applied any Retry-After pause
+    return random.uniform(0, 0.5 * 2 ** attempt)
+
+def _may_hedge() -> bool:
+    """A hedge would only queue behind calls that are already waiting for Bedrock, and add to the load."""
+    if bedrock_limiter.congested:
+        hedge_policy.suppress()
+        return False
+    return True
+
+class _SlotHold:
+    """
+    Bedrock slot held by an async call.
+
+    Cancelling the call does not stop the work it handed to `bedrock_executor`:
+    the thread keeps waiting for Bedrock until the request returns. The slot is
+    therefore given back only once the call has ended and that work is done,
+    so requests still in flight are never more than the limiter allows.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._running = 0
+        self._closed = False
+        self._released = False
+
+    def track(self, future: Future) -> None:
+        with self._lock:
+            self._running += 1
+        future.add_done_callback(self._work_done)
+
+    def _release_if_idle_locked(self) -> bool:
+        release = self._closed and self._running == 0 and not self._released
+        self._released |= release
+        return release
+
+    def _work_done(self, future: Future) -> None:
+        # Runs on the executor thread, or right away if the work already finished
+        with self._lock:
+            self._running -= 1
+            release = self._release_if_idle_locked()
+        if release:
+            bedrock_limiter.release()
+
+    def close(self) -> None:
+        with self._lock:
+            self._closed = True
+            release = self._release_if_idle_locked()
+        if release:
+            bedrock_limiter.release()
+
+async def _run_blocking(hold: _SlotHold, func, *args, **kwargs):
+    """Run `func` on the Bedrock executor within a copy of the current context, under the slot `hold`."""
+    future = bedrock_executor.submit(contextvars.copy_context().run, func, *args, **kwargs)
+    hold.track(future)
+    return await asyncio.wrap_future(future)
+
+class ManagedChatBedrockConverse(ChatBedrockConverse):
+    """
+    ChatBedrockConverse whose calls go through the process-wide Bedrock controls.
+
+    Every chain, agent turn and tool shares the same model instance, so wrapping
+    the low-level `_generate`/`_stream` calls and their async counterparts is
+    enough to put every Bedrock request of all concurrent workflow runs through
+    `bedrock_limiter`, which admits them by priority lane, request and token
+    quotas and an adaptive concurrency window fed back by throttling errors.
+    Async callers (`ainvoke`, `astream`) wait for admission on the event loop and
+    only occupy a thread of `bedrock_executor` while the request is actually in
+    flight.
+
+    With an `endpoint_pool`, every call is routed to one of its endpoints
+    (region and model or inference profile) by health and weight, and a failed
+    call is retried on another endpoint. Async calls that take longer than
+    `hedge_policy` allows for their graph node are duplicated to another
+    endpoint, and the first answer wins.
+
+    Calls made on behalf of a cancelled run fail with `RunCancelled` instead of
+    sending a request that nobody is waiting for. Calls that cannot get a slot
+    before the deadline of their run or stage fail with `DeadlineExceeded`.
+
+    With `prompt_caching`, requests to models that support it carry Converse
+    cache points after the static system prompt, the first user message and the
+    newest turn, so the agents' ReAct loops reuse their cached prefix instead of
+    resending it at full price. It is meant for models whose prompts repeat; the
+    one-shot chains turn it off. Cache token counts of every call are recorded
+    in `prompt_cache_stats`, and its latency, tokens and estimated cost in
+    `model_usage`, under `route` or the graph node it runs in.
+
+    With a `brownout_model`, calls go to that cheaper model instead while the
+    service is browned out (see `brownout`).
+    """
+
+    prompt_caching: bool = False
+    # Endpoints the calls are routed over; None sends every call to `client` and `model_id`
+    endpoint_pool: Optional[Any] = Field(default=None, exclude=True)
+    # Routing table entry (node or agent name) this model was built for; usage is reported under it
+    route: Optional[str] = Field(default=None, exclude=True)
+    # Cheaper model that answers instead while `brownout` is active
+    brownout_model: Optional[Any] = Field(default=None, exclude=True)
+
+    def _brownout_delegate(self) -> Optional["ManagedChatBedrockConverse"]:
+        return self.brownout_model if self.brownout_model is not None and brownout.active else None
+
+    def _get_llm_string(self, stop: Optional[List[str]] = None, **kwargs: Any) -> str:
+        # Answers of the brownout model are cached under its own configuration
+        if (delegate := self._brownout_delegate()) is not None:
+            return delegate._get_llm_string(stop=stop, **kwargs)
+        return super()._get_llm_string(stop=stop, **kwargs)
+
+    def _choose(self, failed: List[BedrockEndpoint]) -> Optional[BedrockEndpoint]:
+        return self.endpoint_pool.choose(exclude=failed) if self.endpoint_pool is not None else None
+
+    def _target(self, endpoint: Optional[BedrockEndpoint]) -> ChatBedrockConverse:
+        """This model, pointed at the client and model id of `endpoint`."""
+        if endpoint is None or (endpoint.client is self.client and endpoint.model_id == self.model_id):
+            return self
+        return self.model_copy(update={"client": endpoint.client, "model_id": endpoint.model_id})
+
+    def _prepare(self, target: ChatBedrockConverse, messages: List[BaseMessage]) -> List[BaseMessage]:
+        if self.prompt_caching and supports_prompt_caching(target.model_id):
+            return insert_cache_points(messages)
+        return messages
+
+    def _estimate_tokens(self, messages: List[BaseMessage]) -> int:
+        """Rough input (about four characters per token) plus output tokens of a call."""
+        chars = sum(
+            len(message.content) if isinstance(message.content, str) else len(json.dumps(message.content, default=str))
+            for message in messages
+        )
+        return chars // 4 + (self.max_tokens or OUTPUT_TOKEN_ESTIMATE)
+
+    def _hedge_endpoint(
+        self, endpoint: Optional[BedrockEndpoint], failed: List[BedrockEndpoint], hedges: List[BedrockEndpoint]
+    ) -> Optional[BedrockEndpoint]:
+        """Endpoint for the duplicate of a slow call to `endpoint`; preferably a different one."""
+        hedge = self._choose([*failed, endpoint]) if self._has_alternative(endpoint) else endpoint
+        hedges.append(hedge)
+        return hedge
+
+    def _has_alternative(self, endpoint: Optional[BedrockEndpoint]) -> bool:
+        return self.endpoint_pool is not None and self.endpoint_pool.has_alternative(endpoint)
+
+    @contextmanager
+    def _slot(self, estimated: int):
+        token = current_token()
+        deadline = current_deadline()
+        token.raise_if_cancelled()
+        deadline.raise_if_expired()
+        if not bedrock_limiter.acquire(estimated, current_lane(), deadline.remaining()):
+            raise DeadlineExceeded(f"No Bedrock slot became free before the {deadline.name} deadline")
+        try:
+            token.raise_if_cancelled()
+            yield
+        finally:
+            bedrock_limiter.release()
+
+    @asynccontextmanager
+    async def _aslot(self, estimated: int, admission: Optional[Admission] = None):
+        token = current_token()
+        deadline = current_deadline()
+        token.raise_if_cancelled()
+        deadline.raise_if_expired()
+        try:
+            async with asyncio.timeout(deadline.remaining()):
+                await bedrock_limiter.aacquire(estimated, current_lane())
+        except TimeoutError:
+            raise DeadlineExceeded(f"No Bedrock slot became free before the {deadline.name} deadline")
+        hold = _SlotHold()
+        try:
+            token.raise_if_cancelled()
+            if admission is not None:
+                admission.set()
+            yield hold
+        finally:
+            # Released now, or when the executor thread of a cancelled call returns
+            hold.close()
+
+    @contextmanager
+    def _feedback(self, endpoint: Optional[BedrockEndpoint], model_id: str):
+        """Report the outcome of a call to the endpoint pool, and throttling to the limiter."""
+        started = time.monotonic()
+        try:
+            yield
+        except Exception as e:
+            model_usage.record_failure(self.route or current_node(), model_id)
+            if endpoint is not None:
+                self.endpoint_pool.report_failure(endpoint, e)
+            # A throttled endpoint only slows every call down when no other endpoint can take over
+            if is_throttling_error(e) and not self._has_alternative(endpoint):
+                bedrock_limiter.on_throttle(retry_after_seconds(e))
+            raise
+        if endpoint is not None:
+            self.endpoint_pool.report_success(endpoint, time.monotonic() - started)
+
+    def _record(self, estimated: int, usage: Optional[dict], model_id: str, latency: float) -> None:
+        prompt_cache_stats.record(usage)
+        model_usage.record(self.route or current_node(), model_id, latency, usage)
+        bedrock_limiter.record_usage(estimated, (usage or {}).get("total_tokens") or estimated)
+        bedrock_limiter.on_success()
+
+    def _call(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]],
+        run_manager,
+        estimated: int,
+        endpoint: Optional[BedrockEndpoint],
+        **kwargs: Any,
+    ) -> ChatResult:
+        target = self._target(endpoint)
+        started = time.monotonic()
+        with self._feedback(endpoint, target.model_id):
+            result = ChatBedrockConverse._generate(
+                target, self._prepare(target, messages), stop=stop, run_manager=run_manager, **kwargs
+            )
+        message = result.generations[0].message if result.generations else None
+        self._record(estimated, getattr(message, "usage_metadata", None), target.model_id, time.monotonic() - started)
+        return result
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        if (delegate := self._brownout_delegate()) is not None:
+            return delegate._generate(messages, stop, run_manager, **kwargs)
+        estimated = self._estimate_tokens(messages)
+        failed: List[BedrockEndpoint] = []
+        for attempt in itertools.count():
+            endpoint = self._choose(failed)
+            try:
+                with self._slot(estimated):
+                    return self._call(messages, stop, run_manager, estimated, endpoint, **kwargs)
+            except Exception as e:
+                if not _should_retry(e, attempt):
+                    raise
+                failed.append(endpoint)
+            if not self._has_alternative(endpoint):
+                time.sleep(current_deadline().clamp(_backoff(attempt)))
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        if (delegate := self._brownout_delegate()) is not None:
+            return await delegate._agenerate(messages, stop, run_manager, **kwargs)
+        key = call_site("response")
+        estimated = self._estimate_tokens(messages)
+        sync_run_manager = run_manager.get_sync() if run_manager else None
+        failed: List[BedrockEndpoint] = []
+        for attempt in itertools.count():
+            endpoint = self._choose(failed)
+            hedges: List[BedrockEndpoint] = []
+            # The hedge timer and the observed latency start once the first request holds its slot
+            admission = Admission()
+
+            async def call(index: int) -> ChatResult:
+                target = endpoint if index == 0 else self._hedge_endpoint(endpoint, failed, hedges)
+                async with self._aslot(estimated, admission if index == 0 else None) as hold:
+                    # A cancelled call keeps its executor thread and its slot until Bedrock answers;
+                    # its usage and outcome are still recorded then, since the request was paid for
+                    return await _run_blocking(
+                        hold, self._call, messages, stop, sync_run_manager, estimated, target, **kwargs
+                    )
+
+            try:
+                index, result = await first_of(call, hedge_policy.delay(key), admission=admission, allow=_may_hedge)
+                hedge_policy.observe(key, admission.elapsed(), estimated, bool(hedges), index == 1)
+                return result
+            except Exception as e:
+                if not _should_retry(e, attempt):
+                    raise
+                failed.extend([endpoint, *hedges])
+            if not self._has_alternative(endpoint):
+                await asyncio.sleep(current_deadline().clamp(_backoff(attempt)))
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        if (delegate := self._brownout_delegate()) is not None:
+            yield from delegate._stream(messages, stop, run_manager, **kwargs)
+            return
+        estimated = self._estimate_tokens(messages)
+        failed: List[BedrockEndpoint] = []
+        for attempt in itertools.count():
+            endpoint = self._choose(failed)
+            target = self._target(endpoint)
+            usage, streamed = None, False
+            try:
+                with self._slot(estimated), self._feedback(endpoint, target.model_id):
+                    started = time.monotonic()
+                    for chunk in ChatBedrockConverse._stream(
+                        target, self._prepare(target, messages), stop=stop, run_manager=run_manager, **kwargs
+                    ):
+                        usage = getattr(chunk.message, "usage_metadata", None) or usage
+                        streamed = True
+                        yield chunk
+                break
+            except Exception as e:
+                # Chunks already handed out cannot be taken back, so only a stream that never started is retried
+                if streamed or not _should_retry(e, attempt):
+                    raise
+                failed.append(endpoint)
+            if not self._has_alternative(endpoint):
+                time.sleep(current_deadline().clamp(_backoff(attempt)))
+        self._record(estimated, usage, target.model_id, time.monotonic() - started)
+
+    async def _astream_attempt(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]],
+        run_manager: Optional[CallbackManagerForLLMRun],
+        estimated: int,
+        endpoint: Optional[BedrockEndpoint],
+        admission: Optional[Admission] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        done = object()
+        target = self._target(endpoint)
+        usage = None
+        async with self._aslot(estimated, admission) as hold:
+            started = time.monotonic()
+            chunks = ChatBedrockConverse._stream(
+                target, self._prepare(target, messages), stop=stop, run_manager=run_manager, **kwargs
+            )
+            try:
+                # Each read of the response stream blocks, so it runs on the executor
+                with self._feedback(endpoint, target.model_id):
+                    while (chunk := await _run_blocking(hold, next, chunks, done)) is not done:
+                        usage = getattr(chunk.message, "usage_metadata", None) or usage
+                        yield chunk
+            finally:
+                try:
+                    chunks.close()
+                except ValueError:
+                    # Cancelled while a read was still running on the executor
+                    pass
+        self._record(estimated, usage, target.model_id, time.monotonic() - started)
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        if (delegate := self._brownout_delegate()) is not None:
+            async for chunk in delegate._astream(messages, stop, run_manager, **kwargs):
+                yield chunk
+            return
+        done = object()
+        key = call_site("first_chunk")
+        estimated = self._estimate_tokens(messages)
+        failed: List[BedrockEndpoint] = []
+        for attempt in itertools.count():
+            endpoint = self._choose(failed)
+            hedges: List[BedrockEndpoint] = []
+            streamed = False
+            admission = Admission()
+
+            async def open_stream(index: int):
+                # Only the first request reports tokens to `run_manager`, so a losing hedge
+                # never shows up in the callbacks (`astream` passes none and reports them itself)
+                if index == 0:
+                    chunks = self._astream_attempt(
+                        messages, stop, run_manager.get_sync() if run_manager else None, estimated, endpoint,
+                        admission, **kwargs
+                    )
+                else:
+                    target = self._hedge_endpoint(endpoint, failed, hedges)
+                    chunks = self._astream_attempt(messages, stop, None, estimated, target, **kwargs)
+                try:
+                    return chunks, await anext(chunks, done)
+                except BaseException:
+                    await chunks.aclose()
+                    raise
+
+            try:
+                index, (chunks, chunk) = await first_of(
+                    open_stream,
+                    hedge_policy.delay(key),
+                    discard=lambda opened: opened[0].aclose(),
+                    admission=admission,
+                    allow=_may_hedge,
+                )
+                hedge_policy.observe(key, admission.elapsed(), estimated, bool(hedges), index == 1)
+                try:
+                    while chunk is not done:
+                        streamed = True
+                        yield chunk
+                        chunk = await anext(chunks, done)
+                finally:
+                    await chunks.aclose()
+                break
+            except Exception as e:
+                # Chunks already handed out cannot be taken back, so only a stream that never started is retried
+                if streamed or not _should_retry(e, attempt):
+                    raise
+                failed.extend([endpoint, *hedges])
+            if not self._has_alternative(endpoint):
+                await asyncio.sleep(current_deadline().clamp(_backoff(attempt)))
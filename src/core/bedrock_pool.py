@@ -0,0 +1,292 @@
+import json
+import logging
+import os
+import random
+import threading
+import time
+from typing import Any, Iterable, Optional
+
+import boto3
+from botocore.config import Config
+from botocore.exceptions import ClientError, ConnectionClosedError, EndpointConnectionError, ReadTimeoutError
+
+from ..constants.aws_model import AWSModel
+from .rate_limiter import is_throttling_error, retry_after_seconds
+
+logger = logging.getLogger(__name__)
+
+# Consecutive failures that open an endpoint's circuit
+BREAKER_FAILURES = int(os.environ.get("BEDROCK_BREAKER_FAILURES", "3"))
+# First open period of a circuit; doubled every time a probe fails, up to BREAKER_MAX_COOLDOWN_SECONDS
+BREAKER_COOLDOWN_SECONDS = float(os.environ.get("BEDROCK_BREAKER_COOLDOWN_SECONDS", "30"))
+BREAKER_MAX_COOLDOWN_SECONDS = 300.0
+# Lowest routing share an endpoint keeps while its circuit is closed
+MIN_HEALTH = 0.05
+
+def is_endpoint_failure(error: BaseException) -> bool:
+    """Whether `error` says something about the endpoint (throttled, down, unreachable) rather than the request."""
+    if is_throttling_error(error):
+        return True
+    if isinstance(error, (EndpointConnectionError, ConnectionClosedError, ReadTimeoutError)):
+        return True
+    if isinstance(error, ClientError):
+        status = error.response.get("ResponseMetadata", {}).get("HTTPStatusCode") or 0
+        code = error.response.get("Error", {}).get("Code", "")
+        return status >= 500 or code in ("ServiceUnavailableException", "ModelNotReadyException", "InternalServerException")
+    return False
+
+class BedrockEndpoint:
+    """
+    One region and model (or inference profile) that model calls can be sent to.
+
+    Args:
+        name (str): Name used in logs and metrics.
+        client: `bedrock-runtime` client, or any object with `converse`/`converse_stream`.
+        model_id (str): Model or inference profile id used on this endpoint.
+        weight (float): Share of the traffic while the endpoint is healthy.
+    """
+
+    def __init__(self, name: str, client: Any, model_id: str, weight: float = 1.0):
+        self.name = name
+        self.client = client
+        self.model_id = model_id
+        self.weight = max(0.0, weight)
+        # 1.0 when every recent call succeeded; halved by each failure, recovers with successes
+        self.health = 1.0
+        self.latency: Optional[float] = None
+        self.consecutive_failures = 0
+        self.open_until = 0.0
+        self.cooldown = BREAKER_COOLDOWN_SECONDS
+        # Start of the probe call in flight while half open; 0 when there is none
+        self.probing = 0.0
+        self.metrics = {"requests": 0, "failures": 0, "throttles": 0, "circuit_opens": 0}
+
+    def state(self, now: float) -> str:
+        if now < self.open_until:
+            return "open"
+        if self.open_until:
+            return "half_open"
+        return "closed"
+
+class BedrockEndpointPool:
+    """
+    Weighted routing of model calls over several Bedrock endpoints, with failover.
+
+    Calls are spread over the endpoints whose circuit is closed in proportion
+    to `weight * health`. Throttling, 5xx and connection errors lower an
+    endpoint's health; after `BREAKER_FAILURES` of them in a row, or a
+    throttling response with `Retry-After`, its circuit opens and the endpoint
+    is drained. Once the open period ends a single probe call is let through;
+    it closes the circuit on success and reopens it for twice as long on
+    failure. Retries of a failed call go to a different endpoint where possible.
+
+    Args:
+        endpoints (Iterable[BedrockEndpoint]): At least one endpoint.
+    """
+
+    def __init__(self, endpoints: Iterable[BedrockEndpoint]):
+        self.endpoints = list(endpoints)
+        if not self.endpoints:
+            raise ValueError("A Bedrock endpoint pool needs at least one endpoint")
+        self._lock = threading.Lock()
+        self._random = random.Random()
+
+    @property
+    def primary(self) -> BedrockEndpoint:
+        return self.endpoints[0]
+
+    def _usable_locked(self, endpoint: BedrockEndpoint, now: float) -> bool:
+        state = endpoint.state(now)
+        # A probe that never reported back (e.g. its run was cancelled) stops blocking after a cooldown
+        return state == "closed" or (
+            state == "half_open" and (not endpoint.probing or now - endpoint.probing > endpoint.cooldown)
+        )
+
+    def choose(self, exclude: Iterable[BedrockEndpoint] = ()) -> BedrockEndpoint:
+        """Endpoint for the next call, avoiding the ones in `exclude` (e.g. those that just failed it)."""
+        exclude = set(map(id, exclude))
+        now = time.monotonic()
+        with self._lock:
+            candidates = [
+                endpoint for endpoint in self.endpoints
+                if id(endpoint) not in exclude and endpoint.weight > 0 and self._usable_locked(endpoint, now)
+            ]
+            if not candidates:
+                # Everything is drained: try whichever endpoint recovers first rather than failing outright
+                fallback = [endpoint for endpoint in self.endpoints if id(endpoint) not in exclude] or self.endpoints
+                endpoint = min(fallback, key=lambda endpoint: endpoint.open_until)
+                endpoint.metrics["requests"] += 1
+                return endpoint
+            weights = [endpoint.weight * endpoint.health for endpoint in candidates]
+            endpoint = self._random.choices(candidates, weights=weights)[0]
+            if endpoint.state(now) == "half_open":
+                endpoint.probing = now
+            endpoint.metrics["requests"] += 1
+            return endpoint
+
+    def has_alternative(self, endpoint: BedrockEndpoint) -> bool:
+        """Whether another endpoint could take calls right now."""
+        now = time.monotonic()
+        with self._lock:
+            return any(
+                other is not endpoint and other.weight > 0 and self._usable_locked(other, now)
+                for other in self.endpoints
+            )
+
+    def report_success(self, endpoint: BedrockEndpoint, latency: float) -> None:
+        with self._lock:
+            endpoint.health = min(1.0, endpoint.health + (1.0 - endpoint.health) * 0.2)
+            endpoint.latency = latency if endpoint.latency is None else 0.8 * endpoint.latency + 0.2 * latency
+            endpoint.consecutive_failures = 0
+            if endpoint.open_until:
+                logger.info(f"Bedrock endpoint {endpoint.name} recovered")
+            endpoint.open_until = 0.0
+            endpoint.cooldown = BREAKER_COOLDOWN_SECONDS
+            endpoint.probing = 0.0
+
+    def report_failure(self, endpoint: BedrockEndpoint, error: BaseException) -> None:
+        """Record a failed call; errors caused by the request itself are ignored."""
+        if not is_endpoint_failure(error):
+            with self._lock:
+                endpoint.probing = 0.0
+            return
+        now = time.monotonic()
+        retry_after = retry_after_seconds(error)
+        with self._lock:
+            endpoint.metrics["failures"] += 1
+            if is_throttling_error(error):
+                endpoint.metrics["throttles"] += 1
+            endpoint.health = max(MIN_HEALTH, endpoint.health * 0.5)
+            endpoint.consecutive_failures += 1
+            was_probing, endpoint.probing = bool(endpoint.probing), 0.0
+            if was_probing or endpoint.consecutive_failures >= BREAKER_FAILURES or retry_after:
+                if was_probing:
+                    endpoint.cooldown = min(BREAKER_MAX_COOLDOWN_SECONDS, endpoint.cooldown * 2)
+                endpoint.open_until = now + max(endpoint.cooldown, retry_after or 0.0)
+                endpoint.metrics["circuit_opens"] += 1
+                logger.warning(
+                    f"Bedrock endpoint {endpoint.name} drained for {endpoint.open_until - now:.0f}s after: {error}"
+                )
+
+    def stats(self) -> list[dict]:
+        now = time.monotonic()
+        with self._lock:
+            return [
+                {
+                    "name": endpoint.name,
+                    "model": endpoint.model_id,
+                    "weight": endpoint.weight,
+                    "state": endpoint.state(now),
+                    "health": round(endpoint.health, 3),
+                    "latency_seconds": round(endpoint.latency, 3) if endpoint.latency is not None else None,
+                    "open_for_seconds": round(max(0.0, endpoint.open_until - now), 1),
+                    **endpoint.metrics,
+                }
+                for endpoint in self.endpoints
+            ]
+
+class StubBedrockClient:
+    """
+    Offline stand-in for a `bedrock-runtime` client, for tests and local development.
+
+    `converse` and `converse_stream` answer with `response` (by default an echo
+    of the last user text) after `latency` seconds, and fail with a throttling
+    or 5xx error at the given rates, so routing and failover can be exercised
+    without AWS.
+    """
+
+    def __init__(self, response: Optional[str] = None, latency: float = 0.0, throttle_rate: float = 0.0, error_rate: float = 0.0):
+        self.response = response
+        self.latency = latency
+        self.throttle_rate = throttle_rate
+        self.error_rate = error_rate
+
+    def _reply(self, request: dict) -> str:
+        time.sleep(self.latency)
+        roll = random.random()
+        if roll < self.throttle_rate:
+            raise ClientError(
+                {"Error": {"Code": "ThrottlingException", "Message": "Too many requests (stub)"},
+                 "ResponseMetadata": {"HTTPStatusCode": 429}},
+                "Converse",
+            )
+        if roll < self.throttle_rate + self.error_rate:
+            raise ClientError(
+                {"Error": {"Code": "ServiceUnavailableException", "Message": "Service unavailable (stub)"},
+                 "ResponseMetadata": {"HTTPStatusCode": 503}},
+                "Converse",
+            )
+        if self.response is not None:
+            return self.response
+        for message in reversed(request.get("messages", [])):
+            texts = [block["text"] for block in message.get("content", []) if "text" in block]
+            if message.get("role") == "user" and texts:
+                return texts[-1]
+        return ""
+
+    def _usage(self, request: dict, text: str) -> dict:
+        prompt = json.dumps(request.get("messages", []), default=str)
+        input_tokens, output_tokens = len(prompt) // 4, len(text) // 4
+        return {"inputTokens": input_tokens, "outputTokens": output_tokens, "totalTokens": input_tokens + output_tokens}
+
+    def converse(self, **request) -> dict:
+        text = self._reply(request)
+        return {
+            "output": {"message": {"role": "assistant", "content": [{"text": text}]}},
+            "stopReason": "end_turn",
+            "usage": self._usage(request, text),
+            "metrics": {"latencyMs": int(self.latency * 1000)},
+        }
+
+    def converse_stream(self, **request) -> dict:
+        text = self._reply(request)
+
+        def events():
+            yield {"messageStart": {"role": "assistant"}}
+            for i in range(0, len(text), 16):
+                yield {"contentBlockDelta": {"delta": {"text": text[i:i + 16]}, "contentBlockIndex": 0}}
+            yield {"contentBlockStop": {"contentBlockIndex": 0}}
+            yield {"messageStop": {"stopReason": "end_turn"}}
+            yield {"metadata": {"usage": self._usage(request, text), "metrics": {"latencyMs": int(self.latency * 1000)}}}
+
+        return {"stream": events()}
+
+def resolve_model(model: str) -> str:
+    """Model or profile id of `model`, which may also name an `AWSModel` member."""
+    return AWSModel[model].value if model in AWSModel.__members__ else model
+
+def create_endpoint_client(entry: dict, client_config: Optional[Config] = None) -> Any:
+    """`bedrock-runtime` client for the `region`, `endpoint_url` or `stub` of an endpoint entry."""
+    if "stub" in entry:
+        return StubBedrockClient(**(entry["stub"] or {}))
+    return boto3.client(
+        "bedrock-runtime",
+        region_name=entry.get("region") or os.environ["AWS_DEFAULT_REGION"],
+        endpoint_url=entry.get("endpoint_url"),
+        config=client_config,
+    )
+
+def create_bedrock_pool(default_client: Any, default_model: str, client_config: Optional[Config] = None) -> BedrockEndpointPool:
+    """
+    Builds the endpoint pool from `BEDROCK_ENDPOINTS`, a JSON list of endpoints such as
+
+        [{"region": "ap-northeast-2", "model": "ANTHROPIC_CLAUDE_4_SONNET_SEOUL_CROSS_REGION", "weight": 2},
+         {"region": "us-east-1", "model": "ANTHROPIC_CLAUDE_4_SONNET_CROSS_REGION"},
+         {"name": "local", "stub": {"latency": 0.2}}]
+
+    `model` is a model or profile id or an `AWSModel` member name (default `default_model`),
+    `endpoint_url` points an endpoint at another server, and `stub` makes it a
+    `StubBedrockClient` with the given options. Without the variable, the pool holds
+    `default_client` and `default_model` only.
+    """
+    spec = os.environ.get("BEDROCK_ENDPOINTS")
+    if not spec:
+        return BedrockEndpointPool([BedrockEndpoint("default", default_client, default_model)])
+    endpoints = []
+    for i, entry in enumerate(json.loads(spec)):
+        model = resolve_model(entry.get("model", default_model))
+        client = create_endpoint_client(entry, client_config)
+        name = entry.get("name") or entry.get("region") or f"endpoint-{i}"
+        endpoints.append(BedrockEndpoint(name, client, model, float(entry.get("weight", 1.0))))
+    logger.info(f"Routing Bedrock calls over {', '.join(f'{e.name} ({e.model_id})' for e in endpoints)}")
+    return BedrockEndpointPool(endpoints)
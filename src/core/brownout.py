@@ -0,0 +1,173 @@
+import logging
+import os
+import threading
+import time
+from typing import Callable
+
+from .rate_limiter import bedrock_limiter
+
+logger = logging.getLogger(__name__)
+
+# Queued workflow runs at which brownout starts; the run services register this signal
+RUN_QUEUE_THRESHOLD = float(os.environ.get("BROWNOUT_RUN_QUEUE", "20"))
+
+class BrownoutController:
+    """
+    Degrades the work of every run while the service is overloaded, so that more
+    runs finish with a slightly worse result instead of all of them timing out.
+
+    Load signals are callables returning the current value of a metric (queued
+    runs, queued Bedrock calls, throttle rate), each with the value at which it
+    counts as overloaded. They are sampled at most every `interval` seconds,
+    when a caller asks whether brownout is `active`. Brownout starts as soon as
+    one signal reaches its threshold and ends once every signal has stayed below
+    `exit_ratio` of its threshold for `min_seconds`.
+
+    While it is active:
+    - models with a brownout model (`BROWNOUT_MODEL_ROUTES`) answer with it;
+    - `recursion_limit` shrinks the step budgets of the agents by `step_factor`;
+    - `container_token_limits` caps the output and thinking tokens of the
+      engineer containers.
+
+    Args:
+        enabled (bool): Whether brownout may start at all.
+        interval (float): Seconds between two samples of the load signals.
+        exit_ratio (float): Share of its threshold every signal must stay below for brownout to end.
+        min_seconds (float): Time brownout lasts at least, and load must stay low before it ends.
+        step_factor (float): Factor applied to agent recursion limits.
+        container_output_tokens (int): Cap of `CLAUDE_CODE_MAX_OUTPUT_TOKENS` in containers.
+        container_thinking_tokens (int): Cap of `MAX_THINKING_TOKENS` in containers; 0 turns thinking off.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = False,
+        interval: float = 5.0,
+        exit_ratio: float = 0.5,
+        min_seconds: float = 60.0,
+        step_factor: float = 0.5,
+        container_output_tokens: int = 4096,
+        container_thinking_tokens: int = 0,
+    ):
+        self.enabled = enabled
+        self.interval = interval
+        self.exit_ratio = exit_ratio
+        self.min_seconds = min_seconds
+        self.step_factor = step_factor
+        self.container_output_tokens = container_output_tokens
+        self.container_thinking_tokens = container_thinking_tokens
+        self._lock = threading.Lock()
+        self._signals: dict[str, tuple[Callable[[], float], float]] = {}
+        self._values: dict[str, float] = {}
+        self._active = False
+        self._changed_at = time.monotonic()
+        self._calm_since = None
+        self._sampled_at = 0.0
+        self._metrics = {"activations": 0, "brownout_seconds": 0.0}
+
+    def add_signal(self, name: str, read: Callable[[], float], threshold: float) -> None:
+        """Watch `read()`; a threshold of 0 or less leaves the signal out."""
+        if threshold > 0:
+            with self._lock:
+                self._signals[name] = (read, threshold)
+
+    @property
+    def active(self) -> bool:
+        if not self.enabled:
+            return False
+        now = time.monotonic()
+        with self._lock:
+            if now - self._sampled_at >= self.interval:
+                self._sampled_at = now
+                self._sample_locked(now)
+            return self._active
+
+    def _sample_locked(self, now: float) -> None:
+        ratios = {}
+        for name, (read, threshold) in self._signals.items():
+            try:
+                value = float(read())
+            except Exception:
+                logger.exception(f"Could not read brownout signal {name}")
+                continue
+            self._values[name] = value
+            ratios[name] = value / threshold
+        overloaded = [name for name, ratio in ratios.items() if ratio >= 1]
+        calm = all(ratio < self.exit_ratio for ratio in ratios.values())
+        if not self._active:
+            if overloaded:
+                self._active = True
+                self._changed_at = now
+                self._calm_since = None
+                self._metrics["activations"] += 1
+                logger.warning(f"Brownout started: {', '.join(f'{n}={self._values[n]:g}' for n in overloaded)}")
+            return
+        if not calm:
+            self._calm_since = None
+            return
+        if self._calm_since is None:
+            self._calm_since = now
+        if now - self._calm_since >= self.min_seconds and now - self._changed_at >= self.min_seconds:
+            lasted = now - self._changed_at
+            self._active = False
+            self._metrics["brownout_seconds"] += lasted
+            self._changed_at = now
+            logger.warning(f"Brownout ended after {lasted:.0f}s")
+
+    def recursion_limit(self, limit: int) -> int:
+        """Recursion limit of an agent run that would get `limit` under normal load."""
+        return max(10, int(limit * self.step_factor)) if self.active else limit
+
+    def container_token_limits(self, max_output_tokens: int, max_thinking_tokens: int) -> tuple[int, int]:
+        """`CLAUDE_CODE_MAX_OUTPUT_TOKENS` and `MAX_THINKING_TOKENS` of a container started now."""
+        if not self.active:
+            return max_output_tokens, max_thinking_tokens
+        return min(max_output_tokens, self.container_output_tokens), min(max_thinking_tokens, self.container_thinking_tokens)
+
+    def stats(self) -> dict:
+        active = self.active
+        now = time.monotonic()
+        with self._lock:
+            metrics = dict(self._metrics)
+            if active:
+                metrics["brownout_seconds"] += now - self._changed_at
+            return {
+                "enabled": self.enabled,
+                "active": active,
+                "since_seconds": round(now - self._changed_at, 1),
+                "signals": {
+                    name: {"value": self._values.get(name), "threshold": threshold}
+                    for name, (_, threshold) in self._signals.items()
+                },
+                **metrics,
+                "brownout_seconds": round(metrics["brownout_seconds"], 1),
+            }
+
+def _throttle_rate() -> Callable[[], float]:
+    """Share of Bedrock calls throttled since the previous sample."""
+    last = {"granted": 0, "throttled": 0}
+
+    def read() -> float:
+        stats = bedrock_limiter.stats()
+        granted = stats["granted"] - last["granted"]
+        throttled = stats["throttled"] - last["throttled"]
+        last.update(granted=stats["granted"], throttled=stats["throttled"])
+        return throttled / granted if granted else 0.0
+
+    return read
+
+brownout = BrownoutController(
+    enabled=os.environ.get("BROWNOUT_ENABLED", "0") != "0",
+    interval=float(os.environ.get("BROWNOUT_INTERVAL_SECONDS", "5")),
+    exit_ratio=float(os.environ.get("BROWNOUT_EXIT_RATIO", "0.5")),
+    min_seconds=float(os.environ.get("BROWNOUT_MIN_SECONDS", "60")),
+    step_factor=float(os.environ.get("BROWNOUT_STEP_FACTOR", "0.5")),
+    container_output_tokens=int(os.environ.get("BROWNOUT_CONTAINER_OUTPUT_TOKENS", "4096")),
+    container_thinking_tokens=int(os.environ.get("BROWNOUT_CONTAINER_THINKING_TOKENS", "0")),
+)
+brownout.add_signal(
+    "bedrock_queue",
+    lambda: bedrock_limiter.stats()["queue_depth"],
+    float(os.environ.get("BROWNOUT_BEDROCK_QUEUE", "32")),
+)
+brownout.add_signal("throttle_rate", _throttle_rate(), float(os.environ.get("BROWNOUT_THROTTLE_RATE", "0.05")))
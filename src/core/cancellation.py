@@ -0,0 +1,89 @@
+import contextvars
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+class RunCancelled(Exception):
+    """Raised by blocking code that notices its workflow run was cancelled."""
+
+class CancelToken:
+    """
+    Thread-safe cancellation flag of a single workflow run.
+
+    Cancelling the asyncio task of a run stops its coroutines, but not the
+    blocking work they started in threads (shell commands, container polling,
+    model calls on the Bedrock executor). That work checks the token of the
+    current run, or registers a callback that is invoked as soon as the run is
+    cancelled, so it can stop and free its capacity right away.
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks: list[Callable[[], None]] = []
+        self.reason: Optional[str] = None
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self, reason: str = "Run was cancelled.") -> None:
+        """Set the flag and run the registered callbacks. Later calls are no-ops."""
+        with self._lock:
+            if self._event.is_set():
+                return
+            self.reason = reason
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                logger.warning(f"Cancellation callback failed: {e}")
+
+    def raise_if_cancelled(self) -> None:
+        if self._event.is_set():
+            raise RunCancelled(self.reason)
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Sleep for up to `timeout` seconds, returning early (True) if cancelled."""
+        return self._event.wait(timeout)
+
+    @contextmanager
+    def on_cancel(self, callback: Callable[[], None]):
+        """
+        Run `callback` if the token is cancelled while the block is active.
+        Runs it immediately if the token is already cancelled.
+        """
+        with self._lock:
+            registered = not self._event.is_set()
+            if registered:
+                self._callbacks.append(callback)
+        if not registered:
+            callback()
+        try:
+            yield
+        finally:
+            with self._lock:
+                if callback in self._callbacks:
+                    self._callbacks.remove(callback)
+
+# Token of the run the current task or thread works for. asyncio tasks and
+# `asyncio.to_thread` copy the context, so it reaches every node, tool and thread.
+_current_token: contextvars.ContextVar[Optional[CancelToken]] = contextvars.ContextVar(
+    "cancel_token", default=None
+)
+
+# Shared token that is never cancelled, for code running outside of a run
+_NEVER_CANCELLED = CancelToken()
+
+def current_token() -> CancelToken:
+    """Cancellation token of the workflow run executing in the current context."""
+    return _current_token.get() or _NEVER_CANCELLED
+
+def set_current_token(token: CancelToken) -> None:
+    """Bind `token` to the current context, e.g. at the start of a run's task."""
+    _current_token.set(token)
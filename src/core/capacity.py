@@ -0,0 +1,138 @@
+import asyncio
+import os
+import threading
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from typing import Optional
+
+class CapacityGate:
+    """
+    A counting semaphore shared by worker threads and the asyncio event loop.
+
+    Graph nodes run both as coroutines and inside `asyncio.to_thread`, so a
+    plain `asyncio.Semaphore` or `threading.Semaphore` cannot cap them both.
+    Waiters are served in FIFO order regardless of how they wait, and async
+    waiters do not occupy a thread while queued. The limit can be changed at
+    runtime.
+
+    Args:
+        name (str): Name used in metrics.
+        limit (int): Maximum number of concurrent holders.
+    """
+
+    def __init__(self, name: str, limit: int):
+        self.name = name
+        self._limit = max(1, limit)
+        self._in_use = 0
+        self._lock = threading.Lock()
+        # Each waiter is either a threading.Event or an (event loop, future) pair
+        self._waiters: deque = deque()
+
+    @property
+    def limit(self) -> int:
+        return self._limit
+
+    def set_limit(self, limit: int) -> None:
+        """Change the limit, waking waiters if capacity became available."""
+        with self._lock:
+            self._limit = max(1, limit)
+            while self._waiters and self._in_use < self._limit:
+                if self._grant_next_locked():
+                    self._in_use += 1
+
+    def try_acquire(self) -> bool:
+        """Take a slot if one is free right now, without waiting."""
+        with self._lock:
+            if self._in_use < self._limit and not self._waiters:
+                self._in_use += 1
+                return True
+            return False
+
+    def acquire(self, timeout: Optional[float] = None) -> bool:
+        """Take a slot, blocking the calling thread until one is free."""
+        with self._lock:
+            if self._in_use < self._limit and not self._waiters:
+                self._in_use += 1
+                return True
+            event = threading.Event()
+            self._waiters.append(event)
+        if event.wait(timeout):
+            return True
+        with self._lock:
+            if event in self._waiters:
+                self._waiters.remove(event)
+                return False
+        # The slot was granted between the timeout and taking the lock
+        return True
+
+    async def aacquire(self) -> None:
+        """Take a slot, suspending the calling coroutine until one is free."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._in_use < self._limit and not self._waiters:
+                self._in_use += 1
+                return
+            future = loop.create_future()
+            waiter = (loop, future)
+            self._waiters.append(waiter)
+        try:
+            await future
+        except asyncio.CancelledError:
+            with self._lock:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+                    raise
+            # Granted concurrently with the cancellation: hand the slot back
+            if future.done() and not future.cancelled():
+                self.release()
+            raise
+
+    def release(self) -> None:
+        with self._lock:
+            # Hand the slot directly to the next waiter while we are within the limit
+            while self._waiters and self._in_use <= self._limit:
+                if self._grant_next_locked():
+                    return
+            self._in_use = max(0, self._in_use - 1)
+
+    def _grant_next_locked(self) -> bool:
+        waiter = self._waiters.popleft()
+        if isinstance(waiter, threading.Event):
+            waiter.set()
+            return True
+        loop, future = waiter
+        if loop.is_closed():
+            return False
+        loop.call_soon_threadsafe(self._resolve, future)
+        return True
+
+    def _resolve(self, future: asyncio.Future) -> None:
+        if future.done():
+            # The waiter gave up after being granted; pass the slot on
+            self.release()
+            return
+        future.set_result(None)
+
+    @contextmanager
+    def hold(self):
+        self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    @asynccontextmanager
+    async def ahold(self):
+        await self.aacquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"limit": self._limit, "in_use": self._in_use, "waiting": len(self._waiters)}
+
+# Process-wide caps shared by every workflow run
+container_slots = CapacityGate("containers", int(os.environ.get("MAX_CONCURRENT_CONTAINERS", "8")))
+bedrock_slots = CapacityGate("bedrock_calls", int(os.environ.get("MAX_INFLIGHT_BEDROCK_CALLS", "16")))
@@ -1,7 +1,28 @@
 from fastapi import FastAPI
 from contextlib import asynccontextmanager
+import asyncio
+import logging
 import os
 from ..services.github_service import get_github_app_token
+from ..tools.spawn_container import remove_owned_containers
+
+logger = logging.getLogger(__name__)
+
+# Seconds in-flight runs get to finish on shutdown before they are checkpointed
+SHUTDOWN_DRAIN_TIMEOUT = float(os.environ.get("SHUTDOWN_DRAIN_TIMEOUT", "300"))
+
+def load_github_config() -> None:
+    """Issue a GitHub App installation token and expose the git settings to the workflow."""
+    github_token = get_github_app_token()
+    os.environ["GH_APP_TOKEN"] = github_token
+    os.environ["TARGET_REPO_URL"] = os.environ.get("GIT_URL") or "https://github.com/saehoon0501/agentic-coding-testing.git"
+
+async def cleanup_owned_containers() -> None:
+    """Remove the `se-agent` containers owned by this instance, logging instead of failing."""
+    try:
+        await asyncio.to_thread(remove_owned_containers)
+    except Exception as e:
+        logger.warning(f"Could not remove containers owned by this instance: {e}")
 
 @asynccontextmanager
 async def git_config(app: FastAPI):
@@ -9,10 +30,21 @@ async def git_config(app: FastAPI):
     Defines tasks to be performed when the application starts and ends.
     """
     print("Application starting! Loading GitHub configuration.")
-    github_token = get_github_app_token()
-    os.environ["GH_APP_TOKEN"] = github_token
-    os.environ["TARGET_REPO_URL"] = os.environ.get("GIT_URL") or "https://github.com/saehoon0501/agentic-coding-testing.git"
+    load_github_config()
+
+    # Containers left behind by a previous process of this instance are not owned by any run anymore
+    await cleanup_owned_containers()
+
+    # Start the background workers that execute submitted workflow runs
+    run_service = getattr(app.state, "run_service", None)
+    if run_service is not None:
+        await run_service.start()
 
     yield
 
-    print("Application shutting down!")
\ No newline at end of file
+    print("Application shutting down!")
+    if run_service is not None:
+        # Stop admitting runs, let running ones finish and checkpoint the rest
+        await run_service.drain(SHUTDOWN_DRAIN_TIMEOUT)
+        await run_service.stop()
+    await cleanup_owned_containers()
@@ -0,0 +1,146 @@
+import asyncio
+import contextvars
+import functools
+import logging
+import os
+import time
+from contextlib import contextmanager
+from typing import Awaitable, Callable, Mapping, Optional
+
+logger = logging.getLogger(__name__)
+
+# Part of a stage budget held back so the stage can wind down and hand over partial results
+DEADLINE_RESERVE_SECONDS = float(os.environ.get("DEADLINE_RESERVE_SECONDS", "30"))
+
+class DeadlineExceeded(Exception):
+    """Raised when a run or one of its stages has no time left for the work it was about to do."""
+
+class Deadline:
+    """
+    Point in time by which a workflow run, or one stage of it, has to be done.
+
+    The run deadline is split into stage deadlines by `budgeted`; the deadline
+    of the innermost stage is the one found by `current_deadline`. Code that
+    blocks or loops (model calls, agent turns, shell commands, containers)
+    clamps its own timeouts to the remaining time, and loops that can stop
+    early return what they have so far once it runs out.
+
+    Args:
+        expires_at (float | None): `time.monotonic()` value of the deadline; None means no deadline.
+        name (str): Run or stage the deadline belongs to, used in messages.
+        parent (Deadline | None): Deadline of the enclosing run.
+    """
+
+    def __init__(self, expires_at: Optional[float], name: str = "run", parent: Optional["Deadline"] = None):
+        self.expires_at = expires_at
+        self.name = name
+        self.parent = parent
+
+    @classmethod
+    def after(cls, seconds: Optional[float], name: str = "run") -> "Deadline":
+        return cls(time.monotonic() + seconds if seconds else None, name)
+
+    @property
+    def root(self) -> "Deadline":
+        deadline = self
+        while deadline.parent is not None:
+            deadline = deadline.parent
+        return deadline
+
+    def remaining(self) -> Optional[float]:
+        """Seconds left, or None without a deadline."""
+        if self.expires_at is None:
+            return None
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return self.expires_at is not None and time.monotonic() >= self.expires_at
+
+    def clamp(self, timeout: float) -> float:
+        """`timeout`, shortened to the remaining time."""
+        remaining = self.remaining()
+        return timeout if remaining is None else min(timeout, remaining)
+
+    def raise_if_expired(self) -> None:
+        if self.expired:
+            raise DeadlineExceeded(f"The {self.name} deadline was reached")
+
+    def child(self, name: str, seconds: float) -> "Deadline":
+        """Deadline `seconds` from now, but never later than this one."""
+        expires_at = time.monotonic() + seconds
+        if self.expires_at is not None:
+            expires_at = min(expires_at, self.expires_at)
+        return Deadline(expires_at, name, parent=self)
+
+# Deadline of the run or stage the current task or thread works for. Like the
+# cancellation token, it reaches every node, tool and thread through the context.
+_current_deadline: contextvars.ContextVar[Optional[Deadline]] = contextvars.ContextVar(
+    "deadline", default=None
+)
+
+_NO_DEADLINE = Deadline(None)
+
+def current_deadline() -> Deadline:
+    """Deadline of the run or stage executing in the current context."""
+    return _current_deadline.get() or _NO_DEADLINE
+
+def set_current_deadline(deadline: Deadline) -> None:
+    """Bind `deadline` to the current context, e.g. at the start of a run's task."""
+    _current_deadline.set(deadline)
+
+@contextmanager
+def deadline_scope(deadline: Deadline):
+    """Make `deadline` the current deadline within the block."""
+    token = _current_deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current_deadline.reset(token)
+
+def stage_budget(name: str, weights: Mapping[str, float]) -> Optional[float]:
+    """
+    Seconds of the run's remaining time that stage `name` may use.
+
+    The remaining time is shared between this stage and the stages after it
+    (in the order of `weights`) in proportion to their weights, so time saved
+    by fast stages is passed on to the later ones. Stages without a weight get
+    whatever is left of the run.
+    """
+    remaining = current_deadline().root.remaining()
+    if remaining is None or name not in weights:
+        return remaining
+    stages = list(weights)
+    later = sum(weights[stage] for stage in stages[stages.index(name):])
+    return remaining * weights[name] / later if later > 0 else remaining
+
+def budgeted(name: str, func: Callable[..., Awaitable], weights: Mapping[str, float]) -> Callable[..., Awaitable]:
+    """
+    Wrap the async graph node `func` so it runs within its share of the run deadline.
+
+    Inside the node, `current_deadline` is the stage deadline, which leaves
+    `DEADLINE_RESERVE_SECONDS` (at most a tenth of the budget) for winding down.
+    A node still running at the end of its budget is stopped with `DeadlineExceeded`,
+    as is a node that would start after the run deadline.
+    """
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        run_deadline = current_deadline().root
+        budget = stage_budget(name, weights)
+        if budget is None:
+            return await func(*args, **kwargs)
+        if budget <= 0:
+            raise DeadlineExceeded(f"The run deadline was reached before stage {name!r}")
+        reserve = min(DEADLINE_RESERVE_SECONDS, 0.1 * budget)
+        logger.info(f"Stage {name!r} has a budget of {budget:.0f}s")
+        with deadline_scope(run_deadline.child(name, budget - reserve)):
+            try:
+                async with asyncio.timeout(budget) as cm:
+                    return await func(*args, **kwargs)
+            except TimeoutError:
+                if cm.expired():
+                    raise DeadlineExceeded(f"Stage {name!r} did not finish within its budget of {budget:.0f}s")
+                raise
+
+    return wrapper
@@ -0,0 +1,181 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Optional
+
+from .model_router import current_node
+
+logger = logging.getLogger(__name__)
+
+class HedgePolicy:
+    """
+    When to send a duplicate ("hedge") of a slow model call, and what hedging costs.
+
+    Latencies are kept per call site (graph node, split into time to first
+    chunk for streamed calls and time to the full response otherwise). Once a
+    call site has `min_samples` observations, a call that has produced nothing
+    by the `percentile`-th percentile of its history is duplicated; the first
+    of the two to answer is used and the other is cancelled. At most
+    `max_fraction` of all calls are hedged, which bounds the extra cost.
+
+    Latencies are service times, counted from when a call got its Bedrock
+    slot: time queued in the rate limiter says nothing about the endpoint, and
+    hedging a call that is slow only because Bedrock is saturated would add
+    load where there is none to spare.
+
+    Args:
+        percentile (float): Latency percentile (0-100) after which a call is hedged; 0 disables hedging.
+        min_samples (int): Observations a call site needs before its calls are hedged.
+        max_fraction (float): Largest share of calls that may be hedged.
+        history (int): Latencies remembered per call site.
+    """
+
+    def __init__(self, percentile: float = 0.0, min_samples: int = 20, max_fraction: float = 0.1, history: int = 200):
+        self.percentile = percentile
+        self.min_samples = max(1, min_samples)
+        self.max_fraction = max_fraction
+        self.history = history
+        self._lock = threading.Lock()
+        self._latencies: dict[str, deque[float]] = {}
+        self._metrics = {"calls": 0, "hedged": 0, "hedge_wins": 0, "suppressed": 0, "tokens": 0, "extra_tokens": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.percentile > 0
+
+    def delay(self, key: str) -> Optional[float]:
+        """Seconds after which a call at `key` is hedged, or None to not hedge it."""
+        if not self.enabled:
+            return None
+        with self._lock:
+            if self._metrics["hedged"] >= self.max_fraction * max(1, self._metrics["calls"]):
+                return None
+            samples = sorted(self._latencies.get(key, ()))
+        if len(samples) < self.min_samples:
+            return None
+        return samples[min(len(samples) - 1, int(len(samples) * self.percentile / 100))]
+
+    def observe(self, key: str, latency: float, tokens: int, hedged: bool, hedge_won: bool) -> None:
+        """Record a finished call; `tokens` is its estimated cost, paid twice when hedged."""
+        with self._lock:
+            self._latencies.setdefault(key, deque(maxlen=self.history)).append(latency)
+            self._metrics["calls"] += 1
+            self._metrics["tokens"] += tokens
+            if hedged:
+                self._metrics["hedged"] += 1
+                self._metrics["extra_tokens"] += tokens
+                self._metrics["hedge_wins"] += hedge_won
+
+    def suppress(self) -> None:
+        """Record a hedge that was due but not sent because Bedrock was congested."""
+        with self._lock:
+            self._metrics["suppressed"] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            metrics = dict(self._metrics)
+            sites = {
+                key: {
+                    "samples": len(samples),
+                    "p50_seconds": round(sorted(samples)[len(samples) // 2], 3),
+                }
+                for key, samples in self._latencies.items() if samples
+            }
+        return {
+            "enabled": self.enabled,
+            "percentile": self.percentile,
+            **metrics,
+            "hedge_rate": round(metrics["hedged"] / metrics["calls"], 3) if metrics["calls"] else None,
+            "hedge_win_rate": round(metrics["hedge_wins"] / metrics["hedged"], 3) if metrics["hedged"] else None,
+            # Estimated extra tokens sent by hedges, relative to the tokens of all calls
+            "cost_overhead": round(metrics["extra_tokens"] / metrics["tokens"], 3) if metrics["tokens"] else None,
+            "call_sites": sites,
+        }
+
+def call_site(kind: str) -> str:
+    """Key of the graph node making the current model call, for latency histories."""
+    return f"{current_node()}:{kind}"
+
+class Admission:
+    """Marks when attempt 0 of a hedged call got its Bedrock slot and started being served."""
+
+    def __init__(self):
+        self._event = asyncio.Event()
+        self.at: Optional[float] = None
+
+    def set(self) -> None:
+        if self.at is None:
+            self.at = time.monotonic()
+            self._event.set()
+
+    async def wait(self) -> None:
+        await self._event.wait()
+
+    def elapsed(self) -> float:
+        """Service time so far; 0 if the call was never admitted."""
+        return time.monotonic() - self.at if self.at is not None else 0.0
+
+async def first_of(
+    start: Callable[[int], Awaitable[Any]],
+    delay: Optional[float],
+    discard: Optional[Callable[[Any], Awaitable[Any]]] = None,
+    admission: Optional[Admission] = None,
+    allow: Optional[Callable[[], bool]] = None,
+) -> tuple[int, Any]:
+    """
+    Runs attempt `start(0)` and, if it has not finished after `delay` seconds,
+    also the hedge `start(1)`. Returns the index and result of the first attempt
+    to succeed and cancels the other; raises the first error if both fail.
+
+    Args:
+        start (Callable): Starts attempt 0 or 1 and returns its result.
+        delay (Optional[float]): Seconds to wait before hedging; None never hedges.
+        discard (Optional[Callable]): Releases the result of an attempt that succeeded but lost.
+        admission (Optional[Admission]): Set by attempt 0 once it is admitted; `delay` counts from then.
+        allow (Optional[Callable]): Asked when the hedge is due; it is not sent if this returns False.
+    """
+    tasks = {asyncio.ensure_future(start(0)): 0}
+    hedged = delay is None
+    errors: list[BaseException] = []
+    try:
+        if not hedged and admission is not None:
+            admitted = asyncio.ensure_future(admission.wait())
+            try:
+                await asyncio.wait([admitted, *tasks], return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                admitted.cancel()
+        while tasks:
+            timeout = None if hedged else delay
+            finished, _ = await asyncio.wait(tasks, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            if not finished:
+                hedged = True
+                if allow is not None and not allow():
+                    continue
+                logger.debug(f"Hedging a model call that took longer than {delay:.2f}s")
+                tasks[asyncio.ensure_future(start(1))] = 1
+                continue
+            for task in sorted(finished, key=tasks.get):
+                index = tasks.pop(task)
+                if task.exception() is None:
+                    return index, task.result()
+                errors.append(task.exception())
+        raise errors[0]
+    finally:
+        for task in tasks:
+            task.cancel()
+        for task in tasks:
+            try:
+                result = await task
+            except BaseException:
+                continue
+            if discard is not None:
+                await discard(result)
+
+hedge_policy = HedgePolicy(
+    percentile=float(os.environ.get("HEDGE_PERCENTILE", "0")),
+    min_samples=int(os.environ.get("HEDGE_MIN_SAMPLES", "20")),
+    max_fraction=float(os.environ.get("HEDGE_MAX_FRACTION", "0.1")),
+)
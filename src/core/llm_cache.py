@@ -0,0 +1,203 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import warnings
+from collections import OrderedDict
+from typing import Any, Optional
+
+from langchain_core._api import LangChainBetaWarning
+from langchain_core.caches import RETURN_VAL_TYPE, BaseCache
+from langchain_core.load import dumps, loads
+
+logger = logging.getLogger(__name__)
+
+class TieredLLMCache(BaseCache):
+    """
+    Response cache for deterministic (`temperature=0`) model calls.
+
+    Entries are addressed by a hash of the model configuration string (model
+    id and parameters) and the rendered prompt messages, so identical calls
+    from any run, retry or resumed run are answered without calling Bedrock.
+
+    A small in-memory LRU sits in front of a SQLite file shared by every
+    process on the host. Entries expire after `ttl` seconds, and once the file
+    holds more than `max_bytes` of responses the least recently used ones are
+    evicted.
+
+    Args:
+        path (str): Database file.
+        memory_entries (int): Capacity of the in-memory LRU.
+        ttl (float): Seconds an entry stays valid.
+        max_bytes (int): Size budget of the cached responses on disk.
+    """
+
+    # Size and expiry are enforced every this many writes
+    EVICT_EVERY = 50
+
+    def __init__(self, path: str, memory_entries: int = 256, ttl: float = 7 * 24 * 3600, max_bytes: int = 256 * 1024 * 1024):
+        self.path = path
+        self.memory_entries = memory_entries
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        # key -> (created_at, generations)
+        self._memory: OrderedDict[str, tuple[float, RETURN_VAL_TYPE]] = OrderedDict()
+        self._writes = 0
+        self._metrics = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "writes": 0, "expired": 0, "evicted": 0}
+        self._connection().executescript(
+            """
+            CREATE TABLE IF NOT EXISTS llm_cache (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS llm_cache_accessed ON llm_cache (accessed_at);
+            """
+        )
+        self._evict()
+
+    def _connection(self) -> sqlite3.Connection:
+        # sqlite3 connections must not be shared across threads
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    @staticmethod
+    def _key(prompt: str, llm_string: str) -> str:
+        return hashlib.sha256(f"{llm_string}\x00{prompt}".encode("utf-8")).hexdigest()
+
+    def _count(self, metric: str, n: int = 1) -> None:
+        with self._lock:
+            self._metrics[metric] += n
+
+    def _remember(self, key: str, created_at: float, value: RETURN_VAL_TYPE) -> None:
+        with self._lock:
+            self._memory[key] = (created_at, value)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_entries:
+                self._memory.popitem(last=False)
+
+    def _lookup_memory(self, key: str) -> Optional[RETURN_VAL_TYPE]:
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is None:
+                return None
+            if time.time() - entry[0] > self.ttl:
+                del self._memory[key]
+                return None
+            self._memory.move_to_end(key)
+            self._metrics["memory_hits"] += 1
+        # Callers attach run-specific ids and metadata to the returned messages
+        return [generation.model_copy(deep=True) for generation in entry[1]]
+
+    def _lookup_disk(self, key: str) -> Optional[RETURN_VAL_TYPE]:
+        db = self._connection()
+        row = db.execute("SELECT value, created_at FROM llm_cache WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self._count("misses")
+            return None
+        value, created_at = row
+        now = time.time()
+        if now - created_at > self.ttl:
+            db.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+            self._count("expired")
+            self._count("misses")
+            return None
+        db.execute("UPDATE llm_cache SET accessed_at = ? WHERE key = ?", (now, key))
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", LangChainBetaWarning)
+            generations = [loads(item) for item in json.loads(value)]
+        self._remember(key, created_at, generations)
+        self._count("disk_hits")
+        return [generation.model_copy(deep=True) for generation in generations]
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        key = self._key(prompt, llm_string)
+        return self._lookup_memory(key) or self._lookup_disk(key)
+
+    async def alookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        key = self._key(prompt, llm_string)
+        # Memory hits are answered without a thread hop
+        return self._lookup_memory(key) or await asyncio.to_thread(self._lookup_disk, key)
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        key = self._key(prompt, llm_string)
+        now = time.time()
+        value = json.dumps([dumps(generation) for generation in return_val], ensure_ascii=False)
+        self._connection().execute(
+            "INSERT OR REPLACE INTO llm_cache (key, value, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+            (key, value, len(value), now, now),
+        )
+        self._remember(key, now, [generation.model_copy(deep=True) for generation in return_val])
+        with self._lock:
+            self._metrics["writes"] += 1
+            self._writes += 1
+            evict = self._writes % self.EVICT_EVERY == 0
+        if evict:
+            self._evict()
+
+    async def aupdate(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        await asyncio.to_thread(self.update, prompt, llm_string, return_val)
+
+    def _evict(self) -> None:
+        """Drop expired entries, then the least recently used ones beyond `max_bytes`."""
+        db = self._connection()
+        expired = db.execute("DELETE FROM llm_cache WHERE created_at < ?", (time.time() - self.ttl,)).rowcount
+        total = db.execute("SELECT COALESCE(SUM(size), 0) FROM llm_cache").fetchone()[0]
+        evicted = 0
+        if total > self.max_bytes:
+            excess = total - self.max_bytes
+            for key, size in db.execute("SELECT key, size FROM llm_cache ORDER BY accessed_at").fetchall():
+                if excess <= 0:
+                    break
+                db.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                excess -= size
+                evicted += 1
+        self._count("expired", expired)
+        self._count("evicted", evicted)
+        if expired or evicted:
+            logger.info(f"LLM cache: removed {expired} expired and {evicted} least recently used entries")
+
+    def clear(self, **kwargs: Any) -> None:
+        with self._lock:
+            self._memory.clear()
+        self._connection().execute("DELETE FROM llm_cache")
+
+    def stats(self) -> dict:
+        with self._lock:
+            metrics = dict(self._metrics)
+            memory_entries = len(self._memory)
+        lookups = metrics["memory_hits"] + metrics["disk_hits"] + metrics["misses"]
+        return {
+            **metrics,
+            "hit_rate": round((metrics["memory_hits"] + metrics["disk_hits"]) / lookups, 3) if lookups else None,
+            "memory_entries": memory_entries,
+        }
+
+def create_llm_cache(path: Optional[str]) -> Optional[TieredLLMCache]:
+    """
+    Creates the response cache configured by the `LLM_CACHE_*` environment variables;
+    an empty path or `none` disables caching.
+    """
+    if not path or path.lower() == "none":
+        logger.info("LLM response caching is disabled")
+        return None
+    return TieredLLMCache(
+        path,
+        memory_entries=int(os.environ.get("LLM_CACHE_MEMORY_ENTRIES", "256")),
+        ttl=float(os.environ.get("LLM_CACHE_TTL_SECONDS", str(7 * 24 * 3600))),
+        max_bytes=int(os.environ.get("LLM_CACHE_MAX_MB", "256")) * 1024 * 1024,
+    )
@@ -0,0 +1,226 @@
+import json
+import logging
+import os
+import threading
+from collections import deque
+from typing import Any, Optional
+
+from botocore.config import Config
+from botocore.exceptions import BotoCoreError, ClientError
+from langchain_core.language_models import BaseChatModel
+from langchain_core.runnables import Runnable
+from langchain_core.runnables.config import ensure_config
+from langchain_core.runnables.fallbacks import RunnableWithFallbacks
+
+from .bedrock_pool import create_endpoint_client, resolve_model
+
+logger = logging.getLogger(__name__)
+
+# USD per million input and output tokens, matched against the model id (first match wins).
+# `MODEL_PRICES` adds or overrides entries, e.g. {"claude-sonnet-4": [3.0, 15.0]}.
+MODEL_PRICES: dict[str, tuple[float, float]] = {
+    **{family: tuple(price) for family, price in (json.loads(os.environ.get("MODEL_PRICES", "null")) or {}).items()},
+    "claude-opus-4": (15.0, 75.0),
+    "claude-sonnet-4": (3.0, 15.0),
+    "claude-3-7-sonnet": (3.0, 15.0),
+    "claude-3-5-sonnet": (3.0, 15.0),
+    "claude-3-5-haiku": (0.8, 4.0),
+    "claude-3-sonnet": (3.0, 15.0),
+    "claude-3-haiku": (0.25, 1.25),
+}
+# Prices of cache reads and writes relative to uncached input tokens
+CACHE_READ_PRICE = 0.1
+CACHE_WRITE_PRICE = 1.25
+
+# Errors after which a route moves on to its next model: the model failed, not the request or the run
+FALLBACK_ERRORS = (ClientError, BotoCoreError)
+
+def model_price(model_id: str) -> Optional[tuple[float, float]]:
+    return next((price for family, price in MODEL_PRICES.items() if family in model_id), None)
+
+def current_node() -> str:
+    """Graph node the current model call runs in, or "default" outside a graph."""
+    metadata = ensure_config().get("metadata") or {}
+    return metadata.get("langgraph_node", "default")
+
+def update_model(model: Runnable, **update: Any) -> Runnable:
+    """`model.model_copy(update=update)` that also reaches every model of a fallback chain."""
+    if isinstance(model, RunnableWithFallbacks):
+        return model.model_copy(update={
+            "runnable": update_model(model.runnable, **update),
+            "fallbacks": [update_model(fallback, **update) for fallback in model.fallbacks],
+        })
+    return model.model_copy(update=update)
+
+class ModelUsageStats:
+    """
+    Latency, tokens and estimated cost of model calls, per route and model.
+
+    Calls of routed models are counted under their route (node or agent name),
+    other calls under the graph node they run in, so the routing table can be
+    tuned from `GET /metrics`.
+
+    Args:
+        history (int): Latencies remembered per route and model for percentiles.
+    """
+
+    def __init__(self, history: int = 200):
+        self.history = history
+        self._lock = threading.Lock()
+        self._entries: dict[tuple[str, str], dict] = {}
+
+    def _entry_locked(self, route: str, model_id: str) -> dict:
+        return self._entries.setdefault((route, model_id), {
+            "calls": 0,
+            "failures": 0,
+            "input_tokens": 0,
+            "cache_read_tokens": 0,
+            "cache_write_tokens": 0,
+            "output_tokens": 0,
+            "cost_usd": None,
+            "latencies": deque(maxlen=self.history),
+        })
+
+    def record(self, route: str, model_id: str, latency: float, usage: Optional[dict]) -> None:
+        usage = usage or {}
+        details = usage.get("input_token_details") or {}
+        input_tokens = usage.get("input_tokens", 0) or 0
+        cache_read = details.get("cache_read", 0) or 0
+        cache_write = details.get("cache_creation", 0) or 0
+        output_tokens = usage.get("output_tokens", 0) or 0
+        price = model_price(model_id)
+        cost = None
+        if price is not None:
+            cost = (
+                (input_tokens + cache_read * CACHE_READ_PRICE + cache_write * CACHE_WRITE_PRICE) * price[0]
+                + output_tokens * price[1]
+            ) / 1_000_000
+        with self._lock:
+            entry = self._entry_locked(route, model_id)
+            entry["calls"] += 1
+            entry["input_tokens"] += input_tokens
+            entry["cache_read_tokens"] += cache_read
+            entry["cache_write_tokens"] += cache_write
+            entry["output_tokens"] += output_tokens
+            if cost is not None:
+                entry["cost_usd"] = (entry["cost_usd"] or 0.0) + cost
+            entry["latencies"].append(latency)
+
+    def record_failure(self, route: str, model_id: str) -> None:
+        with self._lock:
+            self._entry_locked(route, model_id)["failures"] += 1
+
+    def stats(self) -> dict:
+        routes: dict[str, dict] = {}
+        with self._lock:
+            for (route, model_id), entry in self._entries.items():
+                latencies = sorted(entry["latencies"])
+                routes.setdefault(route, {})[model_id] = {
+                    **{key: value for key, value in entry.items() if key != "latencies"},
+                    "cost_usd": round(entry["cost_usd"], 4) if entry["cost_usd"] is not None else None,
+                    "p50_latency_seconds": round(latencies[len(latencies) // 2], 3) if latencies else None,
+                    "p95_latency_seconds": (
+                        round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 3) if latencies else None
+                    ),
+                }
+        return routes
+
+class ModelRouter:
+    """
+    Model of each graph node and agent, from a routing table with fallback chains.
+
+    `routes` maps a node or agent name to the models to try in order. An entry
+    is `"default"` (the shared model and its endpoint pool), a model or profile
+    id or `AWSModel` member name (sent through the default client), or an
+    object with `model` and the `region`, `endpoint_url` or `stub` of its own
+    endpoint, as in `BEDROCK_ENDPOINTS`. A model that fails with a Bedrock or
+    connection error hands the call to the next one. Names without a route use
+    the default model.
+
+    `brownout_routes` maps the names that may be downgraded under load to the
+    single cheaper model their first model switches to during brownout.
+
+    Args:
+        default (BaseChatModel): Shared model; its settings are copied to the routed models.
+        routes (dict): Routing table, e.g. {"define_req": ["ANTHROPIC_CLAUDE_3_5_HAIKU_CROSS_REGION", "default"]}.
+        client_config (Optional[Config]): botocore config of the clients of routed endpoints.
+        brownout_routes (Optional[dict]): Brownout model per name, with entries as in `routes`.
+    """
+
+    def __init__(
+        self,
+        default: BaseChatModel,
+        routes: dict,
+        client_config: Optional[Config] = None,
+        brownout_routes: Optional[dict] = None,
+    ):
+        self.default = default
+        self.routes = {name: chain if isinstance(chain, list) else [chain] for name, chain in routes.items()}
+        self.brownout_routes = brownout_routes or {}
+        self.client_config = client_config
+        self._clients: dict[str, Any] = {}
+
+    def _client(self, entry: dict) -> Any:
+        location = {key: entry[key] for key in ("region", "endpoint_url", "stub") if key in entry}
+        if not location:
+            return self.default.client
+        key = json.dumps(location, sort_keys=True)
+        if key not in self._clients:
+            self._clients[key] = create_endpoint_client(location, self.client_config)
+        return self._clients[key]
+
+    def _model(self, name: str, entry: Any) -> BaseChatModel:
+        if entry == "default":
+            return self.default.model_copy(update={"route": name})
+        if isinstance(entry, str):
+            entry = {"model": entry}
+        return type(self.default)(
+            model=resolve_model(entry["model"]),
+            client=self._client(entry),
+            region_name=entry.get("region") or self.default.region_name,
+            temperature=self.default.temperature,
+            max_tokens=self.default.max_tokens,
+            prompt_caching=self.default.prompt_caching,
+            route=name,
+        )
+
+    def model_for(self, name: str, **update: Any) -> Runnable:
+        """
+        Model for the node or agent `name`: its first routed model, falling back
+        to the others. `update` is applied to every model, including the brownout
+        model (e.g. `cache`, `prompt_caching`).
+        """
+        chain = [self._model(name, entry) for entry in self.routes.get(name, ["default"])]
+        if update:
+            chain = [model.model_copy(update=update) for model in chain]
+        if name in self.brownout_routes:
+            brownout_model = self._model(name, self.brownout_routes[name])
+            if update:
+                brownout_model = brownout_model.model_copy(update=update)
+            chain[0] = chain[0].model_copy(update={"brownout_model": brownout_model})
+        if len(chain) == 1:
+            return chain[0]
+        return chain[0].with_fallbacks(chain[1:], exceptions_to_handle=FALLBACK_ERRORS)
+
+    def table(self) -> dict:
+        """Routing table with every entry resolved to its model id."""
+        def model_id(entry: Any) -> str:
+            if entry == "default":
+                return self.default.model_id
+            return resolve_model(entry if isinstance(entry, str) else entry["model"])
+        return {
+            name: {
+                "models": [model_id(entry) for entry in self.routes.get(name, ["default"])],
+                "brownout": model_id(self.brownout_routes[name]) if name in self.brownout_routes else None,
+            }
+            for name in {**self.routes, **self.brownout_routes}
+        }
+
+def load_model_routes(variable: str = "MODEL_ROUTES") -> dict:
+    """Routing table from the JSON in `variable`; empty (everything uses the default model) without it."""
+    routes = json.loads(os.environ.get(variable, "null")) or {}
+    if routes:
+        logger.info(f"{variable}: {routes}")
+    return routes
+
+model_usage = ModelUsageStats()
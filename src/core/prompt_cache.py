@@ -0,0 +1,121 @@
+import logging
+import threading
+from typing import Any, List, Optional
+
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage, ToolMessage
+
+logger = logging.getLogger(__name__)
+
+# Converse content block marking the end of a cacheable prompt prefix
+CACHE_POINT = {"cachePoint": {"type": "default"}}
+
+# Bedrock accepts at most four cache points per request
+MAX_CACHE_POINTS = 4
+
+# Model families that accept cache points; other models reject requests containing them
+_CACHING_MODELS = (
+    "claude-3-5-haiku",
+    "claude-3-7-sonnet",
+    "claude-sonnet-4",
+    "claude-opus-4",
+    "amazon.nova",
+)
+
+def supports_prompt_caching(model_id: str) -> bool:
+    """Whether Bedrock prompt caching is available for the model or inference profile."""
+    return any(family in model_id for family in _CACHING_MODELS)
+
+def _with_cache_point(message: BaseMessage) -> Optional[BaseMessage]:
+    content = message.content
+    if isinstance(content, str):
+        if not content.strip():
+            return None
+        blocks: List[Any] = [{"type": "text", "text": content}]
+    else:
+        if not content:
+            return None
+        blocks = list(content)
+    return message.model_copy(update={"content": [*blocks, CACHE_POINT]})
+
+def insert_cache_points(messages: List[BaseMessage]) -> List[BaseMessage]:
+    """
+    Copy of `messages` with cache points after the prefixes that repeat between calls.
+
+    - the system prompt, which is static per prompt template and run (and carries
+      the architect's `dev_rules`);
+    - the first user message, which carries the plan, the injected `dev_rules`
+      text or the user story and stays the same for the whole agent loop;
+    - the newest user or tool message, so the next ReAct turn, which resends the
+      same history plus one exchange, reads everything up to here from the cache.
+
+    Bedrock caches the prefix up to each point once it is long enough for the
+    model (about 1k tokens for Claude); shorter prefixes are sent uncached.
+    """
+    positions = []
+    system = [i for i, message in enumerate(messages) if isinstance(message, SystemMessage)]
+    if system:
+        positions.append(system[-1])
+    first_human = next((i for i, message in enumerate(messages) if isinstance(message, HumanMessage)), None)
+    if first_human is not None:
+        positions.append(first_human)
+    if messages and isinstance(messages[-1], (HumanMessage, ToolMessage)):
+        positions.append(len(messages) - 1)
+
+    messages = list(messages)
+    for i in sorted(set(positions))[:MAX_CACHE_POINTS]:
+        marked = _with_cache_point(messages[i])
+        if marked is not None:
+            messages[i] = marked
+    return messages
+
+class PromptCacheStats:
+    """
+    Token counts of Bedrock prompt caching, summed over every model call of the process.
+
+    Bedrock reports tokens read from and written to the cache separately from
+    the uncached input tokens; `cached_share` is the part of all input tokens
+    that was served from the cache.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {
+            "calls": 0,
+            "cache_hit_calls": 0,
+            "input_tokens": 0,
+            "cache_read_tokens": 0,
+            "cache_write_tokens": 0,
+            "output_tokens": 0,
+        }
+
+    def record(self, usage: Optional[dict]) -> None:
+        """Add the `usage_metadata` of one model call."""
+        if not usage:
+            return
+        details = usage.get("input_token_details") or {}
+        cache_read = details.get("cache_read", 0) or 0
+        cache_write = details.get("cache_creation", 0) or 0
+        input_tokens = usage.get("input_tokens", 0) or 0
+        output_tokens = usage.get("output_tokens", 0) or 0
+        with self._lock:
+            self._metrics["calls"] += 1
+            self._metrics["cache_hit_calls"] += cache_read > 0
+            self._metrics["input_tokens"] += input_tokens
+            self._metrics["cache_read_tokens"] += cache_read
+            self._metrics["cache_write_tokens"] += cache_write
+            self._metrics["output_tokens"] += output_tokens
+        logger.info(
+            f"Bedrock call used {input_tokens} input tokens, {cache_read} read from and "
+            f"{cache_write} written to the prompt cache, {output_tokens} output tokens"
+        )
+
+    def stats(self) -> dict:
+        with self._lock:
+            metrics = dict(self._metrics)
+        total_input = metrics["input_tokens"] + metrics["cache_read_tokens"] + metrics["cache_write_tokens"]
+        return {
+            **metrics,
+            "cached_share": round(metrics["cache_read_tokens"] / total_input, 3) if total_input else None,
+        }
+
+prompt_cache_stats = PromptCacheStats()
@@ -0,0 +1,339 @@
+import asyncio
+import contextvars
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import Optional
+
+from botocore.exceptions import ClientError
+
+from .capacity import CapacityGate, bedrock_slots
+
+logger = logging.getLogger(__name__)
+
+# Priority lanes, most urgent first
+LANES = ("high", "normal", "low")
+
+# A waiter moves up one lane for every this many seconds it has waited, so low lanes never starve
+LANE_AGING_SECONDS = float(os.environ.get("RATE_LIMIT_LANE_AGING_SECONDS", "60"))
+
+# Concurrent throttling errors of one burst only shrink the window once
+DECREASE_COOLDOWN_SECONDS = 2.0
+
+_THROTTLING_MARKERS = ("throttling", "toomanyrequests", "too many requests", "rate exceeded")
+
+def is_throttling_error(error: BaseException) -> bool:
+    """Whether `error` is Bedrock (or the network in front of it) asking us to slow down."""
+    if isinstance(error, ClientError):
+        code = error.response.get("Error", {}).get("Code", "")
+        if any(marker in code.lower() for marker in _THROTTLING_MARKERS):
+            return True
+    # Some SDKs surface throttling as generic errors with message only
+    text = str(error).lower()
+    return any(marker in text for marker in _THROTTLING_MARKERS)
+
+def retry_after_seconds(error: BaseException) -> Optional[float]:
+    """Seconds from the `Retry-After` header of a throttling response, if there is one."""
+    if not isinstance(error, ClientError):
+        return None
+    headers = error.response.get("ResponseMetadata", {}).get("HTTPHeaders") or {}
+    value = headers.get("retry-after")
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        # Bedrock sends delta-seconds; an HTTP date is ignored
+        return None
+
+class _Bucket:
+    """Token bucket refilled continuously with `per_minute` units per minute, holding at most a minute's worth."""
+
+    def __init__(self, per_minute: int):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def refill(self, now: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until `amount` (at most a full bucket) is available."""
+        missing = min(amount, self.capacity) - self.level
+        return max(0.0, missing / self.rate)
+
+    def take(self, amount: float) -> None:
+        # May go negative when a call used more than estimated; later calls wait for the debt
+        self.level = min(self.capacity, self.level - amount)
+
+class _Waiter:
+    __slots__ = ("lane", "tokens", "enqueued", "event", "loop", "future")
+
+    def __init__(self, lane: str, tokens: int, loop: Optional[asyncio.AbstractEventLoop] = None):
+        self.lane = lane
+        self.tokens = tokens
+        self.enqueued = time.monotonic()
+        self.loop = loop
+        self.event = None if loop else threading.Event()
+        self.future = loop.create_future() if loop else None
+
+class AdaptiveRateLimiter:
+    """
+    Process-wide admission of Bedrock requests by priority, rate and concurrency.
+
+    Every model call (chains, agent turns, `CodeConflictResolverTool`) passes
+    through here before it takes a slot of `gate`. A call is admitted when
+
+    - it is the most urgent waiter: lanes are served in `LANES` order, and a
+      waiter gains one lane per `LANE_AGING_SECONDS` of waiting;
+    - the request and token buckets (`requests_per_minute`,
+      `tokens_per_minute`; 0 disables a bucket) hold enough for it. Token
+      costs are estimated up front and corrected once the response reports
+      its usage;
+    - no `Retry-After` pause is in effect;
+    - the gate has a free slot.
+
+    The gate's limit is the congestion window: it grows by one slot per
+    window of successful calls up to `max_concurrency` and is halved on
+    throttling, at most once per `DECREASE_COOLDOWN_SECONDS`, down to
+    `min_concurrency` (additive increase, multiplicative decrease). Like the
+    gate, the limiter serves threads and coroutines alike.
+
+    Args:
+        gate (CapacityGate): Concurrency gate whose limit is adjusted.
+        requests_per_minute (int): Request quota; 0 for no limit.
+        tokens_per_minute (int): Input plus output token quota; 0 for no limit.
+        min_concurrency (int): Smallest congestion window.
+        max_concurrency (int | None): Largest congestion window; defaults to the gate's limit.
+    """
+
+    def __init__(
+        self,
+        gate: CapacityGate,
+        requests_per_minute: int = 0,
+        tokens_per_minute: int = 0,
+        min_concurrency: int = 1,
+        max_concurrency: Optional[int] = None,
+    ):
+        self.gate = gate
+        self.max_concurrency = max(1, max_concurrency or gate.limit)
+        self.min_concurrency = max(1, min(min_concurrency, self.max_concurrency))
+        self._window = float(self.max_concurrency)
+        self.gate.set_limit(self.max_concurrency)
+        self._requests = _Bucket(requests_per_minute) if requests_per_minute > 0 else None
+        self._tokens = _Bucket(tokens_per_minute) if tokens_per_minute > 0 else None
+        self._lock = threading.Lock()
+        self._lanes: dict[str, deque[_Waiter]] = {lane: deque() for lane in LANES}
+        self._paused_until = 0.0
+        self._last_decrease = 0.0
+        self._timer: Optional[threading.Timer] = None
+        self._timer_at = 0.0
+        self._metrics = {"granted": 0, "throttled": 0, "decreases": 0, "abandoned": 0}
+        # Wait times of recent admissions, for the percentiles in stats()
+        self._waits: deque[float] = deque(maxlen=1000)
+
+    def _pick_locked(self, now: float) -> Optional[_Waiter]:
+        best, best_key = None, None
+        for rank, lane in enumerate(LANES):
+            queue = self._lanes[lane]
+            if not queue:
+                continue
+            head = queue[0]
+            waited = now - head.enqueued
+            key = (rank - int(waited // LANE_AGING_SECONDS) if LANE_AGING_SECONDS > 0 else rank, head.enqueued)
+            if best_key is None or key < best_key:
+                best, best_key = head, key
+        return best
+
+    def _schedule_locked(self, at: float, now: float) -> None:
+        if self._timer is not None and self._timer_at <= at:
+            return
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer = threading.Timer(max(0.0, at - now), self._on_timer)
+        self._timer.daemon = True
+        self._timer_at = at
+        self._timer.start()
+
+    def _on_timer(self) -> None:
+        with self._lock:
+            self._timer = None
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        """Admit waiters for as long as pauses, buckets and the gate allow."""
+        with self._lock:
+            while True:
+                now = time.monotonic()
+                waiter = self._pick_locked(now)
+                if waiter is None:
+                    return
+                if now < self._paused_until:
+                    self._schedule_locked(self._paused_until, now)
+                    return
+                delay = 0.0
+                for bucket, amount in ((self._requests, 1), (self._tokens, waiter.tokens)):
+                    if bucket is not None:
+                        bucket.refill(now)
+                        delay = max(delay, bucket.wait_time(amount))
+                if delay > 0:
+                    self._schedule_locked(now + delay, now)
+                    return
+                # release() dispatches again once a slot frees up
+                if not self.gate.try_acquire():
+                    return
+                self._lanes[waiter.lane].popleft()
+                if self._requests is not None:
+                    self._requests.take(1)
+                if self._tokens is not None:
+                    self._tokens.take(waiter.tokens)
+                self._metrics["granted"] += 1
+                self._waits.append(now - waiter.enqueued)
+                if waiter.event is not None:
+                    waiter.event.set()
+                elif waiter.loop.is_closed():
+                    self.gate.release()
+                else:
+                    waiter.loop.call_soon_threadsafe(self._resolve, waiter.future)
+
+    def _resolve(self, future: asyncio.Future) -> None:
+        if future.done():
+            # The waiter gave up after being admitted; pass the slot on
+            self.release()
+            return
+        future.set_result(None)
+
+    def _remove(self, waiter: _Waiter) -> bool:
+        with self._lock:
+            queue = self._lanes[waiter.lane]
+            if waiter in queue:
+                queue.remove(waiter)
+                self._metrics["abandoned"] += 1
+                return True
+            return False
+
+    @staticmethod
+    def _lane(lane: Optional[str]) -> str:
+        return lane if lane in LANES else "normal"
+
+    def acquire(self, tokens: int = 0, lane: Optional[str] = None, timeout: Optional[float] = None) -> bool:
+        """Wait for admission, blocking the calling thread; False if `timeout` passed first."""
+        waiter = _Waiter(self._lane(lane), tokens)
+        with self._lock:
+            self._lanes[waiter.lane].append(waiter)
+        self._dispatch()
+        if waiter.event.wait(timeout):
+            return True
+        # Admitted between the timeout and taking the lock
+        return not self._remove(waiter)
+
+    async def aacquire(self, tokens: int = 0, lane: Optional[str] = None) -> None:
+        """Wait for admission, suspending the calling coroutine."""
+        waiter = _Waiter(self._lane(lane), tokens, asyncio.get_running_loop())
+        with self._lock:
+            self._lanes[waiter.lane].append(waiter)
+        self._dispatch()
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            if self._remove(waiter):
+                raise
+            # Admitted concurrently with the cancellation: hand the slot back
+            if waiter.future.done() and not waiter.future.cancelled():
+                self.release()
+            raise
+
+    def release(self) -> None:
+        """Give back the slot of a finished call."""
+        self.gate.release()
+        self._dispatch()
+
+    def record_usage(self, estimated: int, actual: int) -> None:
+        """Correct the token bucket once a call reports the tokens it really used."""
+        if self._tokens is None or actual == estimated:
+            return
+        with self._lock:
+            self._tokens.refill(time.monotonic())
+            self._tokens.take(actual - estimated)
+        self._dispatch()
+
+    def on_success(self) -> None:
+        """Additive increase: one more slot per window of successful calls."""
+        with self._lock:
+            if self._window >= self.max_concurrency:
+                return
+            before = int(self._window)
+            self._window = min(float(self.max_concurrency), self._window + 1.0 / self._window)
+            grown = int(self._window) > before
+            if grown:
+                self.gate.set_limit(int(self._window))
+        if grown:
+            self._dispatch()
+
+    def on_throttle(self, retry_after: Optional[float] = None) -> None:
+        """Multiplicative decrease, and a pause of all admissions for `retry_after` seconds."""
+        now = time.monotonic()
+        with self._lock:
+            self._metrics["throttled"] += 1
+            if now - self._last_decrease >= DECREASE_COOLDOWN_SECONDS:
+                self._last_decrease = now
+                self._window = max(float(self.min_concurrency), self._window / 2)
+                self.gate.set_limit(int(self._window))
+                self._metrics["decreases"] += 1
+                logger.warning(f"Bedrock throttled; concurrency window reduced to {int(self._window)}")
+            if retry_after:
+                self._paused_until = max(self._paused_until, now + retry_after)
+
+    @property
+    def congested(self) -> bool:
+        """Whether calls are waiting for admission or a `Retry-After` pause is in effect."""
+        with self._lock:
+            return time.monotonic() < self._paused_until or any(self._lanes.values())
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        with self._lock:
+            queued = {lane: len(queue) for lane, queue in self._lanes.items()}
+            oldest = min((queue[0].enqueued for queue in self._lanes.values() if queue), default=None)
+            waits = sorted(self._waits)
+            for bucket in (self._requests, self._tokens):
+                if bucket is not None:
+                    bucket.refill(now)
+            stats = {
+                **self._metrics,
+                "window": round(self._window, 2),
+                "concurrency_limit": self.gate.limit,
+                "queued": queued,
+                "queue_depth": sum(queued.values()),
+                "oldest_wait_seconds": round(now - oldest, 3) if oldest is not None else None,
+                "paused_seconds": round(max(0.0, self._paused_until - now), 3),
+                "requests_available": int(self._requests.level) if self._requests else None,
+                "tokens_available": int(self._tokens.level) if self._tokens else None,
+            }
+        stats["avg_wait_seconds"] = round(sum(waits) / len(waits), 3) if waits else None
+        stats["p95_wait_seconds"] = round(waits[int(0.95 * (len(waits) - 1))], 3) if waits else None
+        stats["max_wait_seconds"] = round(waits[-1], 3) if waits else None
+        return stats
+
+# Lane of the run the current task or thread works for; bound per run like the deadline
+_current_lane: contextvars.ContextVar[str] = contextvars.ContextVar("rate_lane", default="normal")
+
+def current_lane() -> str:
+    """Priority lane of the workflow run executing in the current context."""
+    return _current_lane.get()
+
+def set_current_lane(lane: Optional[str]) -> None:
+    """Bind `lane` (one of `LANES`, default `normal`) to the current context."""
+    _current_lane.set(lane if lane in LANES else "normal")
+
+# Process-wide limiter of all Bedrock calls; its window drives the `bedrock_slots` limit
+bedrock_limiter = AdaptiveRateLimiter(
+    bedrock_slots,
+    requests_per_minute=int(os.environ.get("BEDROCK_REQUESTS_PER_MINUTE", "0")),
+    tokens_per_minute=int(os.environ.get("BEDROCK_TOKENS_PER_MINUTE", "0")),
+    min_concurrency=int(os.environ.get("BEDROCK_MIN_CONCURRENCY", "2")),
+)
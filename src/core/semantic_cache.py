@@ -0,0 +1,263 @@
+import hashlib
+import json
+import logging
+import os
+import random
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Optional
+
+logger = logging.getLogger(__name__)
+
+# Mersenne prime modulus of the MinHash permutations
+_PRIME = (1 << 61) - 1
+
+def normalize_text(text: str) -> str:
+    """NFKC-normalized, lower-cased text without punctuation and with single spaces."""
+    text = unicodedata.normalize("NFKC", text).lower()
+    text = re.sub(r"[^\w\s]", " ", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+def shingles(text: str, size: int = 2) -> set[str]:
+    """
+    Character bigrams of the text with spaces removed. Korean spacing varies a
+    lot between paraphrases ("하나만 만들어 줘" vs "하나 만들어줘"), so
+    characters work better than word tokens.
+    """
+    compact = text.replace(" ", "")
+    if len(compact) <= size:
+        return {compact} if compact else set()
+    return {compact[i:i + size] for i in range(len(compact) - size + 1)}
+
+def terms_match(text: str, other: str) -> bool:
+    """
+    Whether every word of each normalized text appears in the other one, ignoring
+    spacing. Paraphrases that only differ in spacing, punctuation or word order
+    pass; near-misses such as "결제 기능 포함" vs "결제 기능 제외", "with" vs
+    "without" or "3개" vs "5개" do not, however similar their shingles are.
+    """
+    compact, other_compact = text.replace(" ", ""), other.replace(" ", "")
+    return all(word in other_compact for word in text.split()) and all(word in compact for word in other.split())
+
+class SemanticCache:
+    """
+    Near-duplicate cache of `define_req` results, keyed by the user's request text.
+
+    Requests are normalized, split into character shingles and reduced to a
+    MinHash signature. Locality-sensitive hashing over bands of the signature
+    finds candidate entries in constant time. A candidate is a hit when the
+    estimated Jaccard similarity of the shingle sets reaches `threshold` and
+    `terms_match` confirms that neither request has a word the other lacks:
+    a request that differs in a single clause is still very similar, but must
+    not get the other request's requirements. Entries are scoped (per tenant),
+    and a lookup only sees entries of its own scope. Everything runs locally:
+    entries are kept in memory and persisted to a SQLite file so they survive
+    restarts.
+
+    Args:
+        path (str): Database file.
+        threshold (float): Minimum estimated similarity of a hit, between 0 and 1. Paraphrases
+            differing in spacing, punctuation or word order measure 0.88 and more; near-misses
+            differing in one clause reach 0.85 and are left to `terms_match`.
+        num_perm (int): Length of the MinHash signatures.
+        bands (int): Number of LSH bands; must divide `num_perm`.
+        max_entries (int): Entries kept before the least recently used are dropped.
+        ttl (float): Seconds an entry stays valid.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        threshold: float = 0.85,
+        num_perm: int = 128,
+        bands: int = 32,
+        max_entries: int = 5000,
+        ttl: float = 7 * 24 * 3600,
+    ):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.path = path
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.max_entries = max_entries
+        self.ttl = ttl
+        # Fixed seed, so signatures stay comparable across processes and restarts
+        rng = random.Random(1)
+        self._perms = [(rng.randrange(1, _PRIME), rng.randrange(0, _PRIME)) for _ in range(num_perm)]
+        self._lock = threading.Lock()
+        # key -> (scope, normalized text, signature, value, created_at)
+        self._entries: OrderedDict[str, tuple[str, str, tuple[int, ...], Any, float]] = OrderedDict()
+        # (band index, band hash) -> keys
+        self._buckets: dict[tuple[int, int], set[str]] = {}
+        self._metrics = {"lookups": 0, "hits": 0, "exact_hits": 0, "rejected": 0, "misses": 0, "writes": 0}
+        self._hit_similarity = 0.0
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(semantic_cache)")}
+        if columns and "scope" not in columns:
+            # Entries written before scoping and verification cannot be checked, so they are dropped
+            self._db.execute("DROP TABLE semantic_cache")
+        self._db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS semantic_cache (
+                key TEXT PRIMARY KEY,
+                scope TEXT NOT NULL,
+                text TEXT NOT NULL,
+                signature TEXT NOT NULL,
+                value TEXT NOT NULL,
+                created_at REAL NOT NULL
+            )
+            """
+        )
+        self._load()
+
+    def _load(self) -> None:
+        cutoff = time.time() - self.ttl
+        with self._lock:
+            self._db.execute("DELETE FROM semantic_cache WHERE created_at < ?", (cutoff,))
+            rows = self._db.execute(
+                "SELECT key, scope, text, signature, value, created_at FROM semantic_cache "
+                "ORDER BY created_at DESC LIMIT ?",
+                (self.max_entries,),
+            ).fetchall()
+            for key, scope, text, signature, value, created_at in reversed(rows):
+                signature = tuple(json.loads(signature))
+                if len(signature) == self.num_perm:
+                    self._insert_locked(key, (scope, text, signature, json.loads(value), created_at))
+        if rows:
+            logger.info(f"Loaded {len(self._entries)} entries into the semantic cache")
+
+    def signature(self, text: str) -> tuple[int, ...]:
+        """MinHash signature of the normalized text."""
+        hashes = [
+            int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "big")
+            for shingle in shingles(normalize_text(text))
+        ] or [0]
+        return tuple(min((a * h + b) % _PRIME for h in hashes) for a, b in self._perms)
+
+    def _bands(self, signature: tuple[int, ...]) -> list[tuple[int, int]]:
+        return [
+            (band, hash(signature[band * self.rows:(band + 1) * self.rows]))
+            for band in range(self.bands)
+        ]
+
+    def _insert_locked(self, key: str, entry: tuple[str, str, tuple[int, ...], Any, float]) -> None:
+        if key in self._entries:
+            self._remove_locked(key)
+        self._entries[key] = entry
+        for bucket in self._bands(entry[2]):
+            self._buckets.setdefault(bucket, set()).add(key)
+        while len(self._entries) > self.max_entries:
+            self._remove_locked(next(iter(self._entries)))
+
+    def _remove_locked(self, key: str) -> None:
+        signature = self._entries.pop(key)[2]
+        for bucket in self._bands(signature):
+            keys = self._buckets.get(bucket)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._buckets[bucket]
+
+    @staticmethod
+    def _key(scope: str, normalized: str) -> str:
+        return hashlib.sha256(f"{scope}\0{normalized}".encode("utf-8")).hexdigest()
+
+    def lookup(self, text: str, scope: str = "default") -> Optional[Any]:
+        """
+        The cached value of the most similar earlier request of the same scope,
+        if it is at least `threshold` similar, passes `terms_match` and has not
+        expired; None otherwise.
+        """
+        normalized = normalize_text(text)
+        signature = self.signature(text)
+        now = time.time()
+        with self._lock:
+            self._metrics["lookups"] += 1
+            candidates = set()
+            for bucket in self._bands(signature):
+                candidates |= self._buckets.get(bucket, set())
+            matches = []
+            for key in candidates:
+                entry_scope, entry_text, other, _, created_at = self._entries[key]
+                if entry_scope != scope or now - created_at > self.ttl:
+                    continue
+                similarity = sum(x == y for x, y in zip(signature, other)) / self.num_perm
+                if similarity >= self.threshold:
+                    matches.append((similarity, key, entry_text))
+            best_key, best_similarity = None, 0.0
+            for similarity, key, entry_text in sorted(matches, reverse=True):
+                if entry_text == normalized or terms_match(normalized, entry_text):
+                    best_key, best_similarity = key, similarity
+                    break
+            if best_key is None:
+                if matches:
+                    self._metrics["rejected"] += 1
+                self._metrics["misses"] += 1
+                return None
+            self._metrics["hits"] += 1
+            if self._entries[best_key][1] == normalized:
+                self._metrics["exact_hits"] += 1
+            self._hit_similarity += best_similarity
+            self._entries.move_to_end(best_key)
+            value = self._entries[best_key][3]
+        logger.info(f"Semantic cache hit with similarity {best_similarity:.2f}")
+        # Callers get their own copy to modify
+        return json.loads(json.dumps(value))
+
+    def add(self, text: str, value: Any, scope: str = "default") -> None:
+        """Cache a JSON-serializable value for the request text within `scope`."""
+        normalized = normalize_text(text)
+        key = self._key(scope, normalized)
+        signature = self.signature(text)
+        now = time.time()
+        encoded = json.dumps(value, ensure_ascii=False)
+        with self._lock:
+            self._insert_locked(key, (scope, normalized, signature, json.loads(encoded), now))
+            self._metrics["writes"] += 1
+            self._db.execute(
+                "INSERT OR REPLACE INTO semantic_cache (key, scope, text, signature, value, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, scope, normalized, json.dumps(signature), encoded, now),
+            )
+            if self._metrics["writes"] % 100 == 0:
+                self._db.execute(
+                    "DELETE FROM semantic_cache WHERE key NOT IN "
+                    "(SELECT key FROM semantic_cache ORDER BY created_at DESC LIMIT ?)",
+                    (self.max_entries,),
+                )
+
+    def stats(self) -> dict:
+        with self._lock:
+            metrics = dict(self._metrics)
+            entries = len(self._entries)
+            hit_similarity = self._hit_similarity
+        return {
+            **metrics,
+            "hit_rate": round(metrics["hits"] / metrics["lookups"], 3) if metrics["lookups"] else None,
+            "avg_hit_similarity": round(hit_similarity / metrics["hits"], 3) if metrics["hits"] else None,
+            "entries": entries,
+            "threshold": self.threshold,
+        }
+
+def create_semantic_cache(path: Optional[str]) -> Optional[SemanticCache]:
+    """
+    Creates the near-duplicate cache configured by the `SEMANTIC_CACHE_*` environment
+    variables; an empty path or `none` disables it.
+    """
+    if not path or path.lower() == "none":
+        logger.info("Semantic caching of requirement definitions is disabled")
+        return None
+    return SemanticCache(
+        path,
+        threshold=float(os.environ.get("SEMANTIC_CACHE_THRESHOLD", "0.85")),
+        max_entries=int(os.environ.get("SEMANTIC_CACHE_MAX_ENTRIES", "5000")),
+        ttl=float(os.environ.get("SEMANTIC_CACHE_TTL_SECONDS", str(7 * 24 * 3600))),
+    )
@@ -1,15 +1,34 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException, Header, Query, Depends, Request as HTTPRequest
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+from typing import Literal, Optional
 from .logging_config import setup_logging
 from dotenv import load_dotenv
 from fastapi.responses import JSONResponse, StreamingResponse
-from .workflow.graph import graph
+from .workflow.graph import graph, bedrock_pool, model_router, llm_cache, semantic_cache
 from langchain_core.messages import HumanMessage
 from .callbacks.logging_callback_handler import LoggingCallbackHandler
 from .core.config import git_config
+from .services.run_service import WorkflowRunService, IdempotencyConflictError, RunNotResumableError, request_fingerprint
+from .services.admission_service import AdmissionRejected, FairRunQueue
+from .services.event_log import EventLogStore
+from .services.run_store import create_run_store
+from .services.distributed_run_service import StoreRunService
+from .utils.event_utils import EventStreamOptions, coalesce_token_chunks
+from .utils.response_utils import parse_fields, project_state, encoded_json_response
+from .utils.structured_output import structured_output_stats
+from .core.capacity import container_slots, bedrock_slots
+from .core.prompt_cache import prompt_cache_stats
+from .core.rate_limiter import bedrock_limiter
+from .core.hedging import hedge_policy
+from .core.model_router import model_usage
+from .core.brownout import RUN_QUEUE_THRESHOLD, brownout
+from .constants.run_status import RunStatus
+import asyncio
 import logging
 import json
+import os
+import hashlib
 
 setup_logging()
 load_dotenv()
@@ -25,6 +44,46 @@ app = FastAPI(
     lifespan=git_config
 )
 
+# Background worker pool for the asynchronous job API.
+# With RUN_STORE_URL set, this process only enqueues runs in the shared store
+# and separate `python -m src.worker` processes execute them.
+if os.environ.get("RUN_STORE_URL"):
+    app.state.run_service = StoreRunService(
+        create_run_store(os.environ["RUN_STORE_URL"]),
+        run_ttl=float(os.environ.get("WORKFLOW_RUN_TTL", "3600")),
+        max_queued=int(os.environ.get("MAX_QUEUED_RUNS", "100")),
+        max_queued_per_tenant=int(os.environ.get("MAX_QUEUED_RUNS_PER_TENANT", "20")),
+        disconnect_grace=float(os.environ.get("DISCONNECT_GRACE_SECONDS", "30")),
+        webhook_max_retries=int(os.environ.get("WEBHOOK_MAX_RETRIES", "5")),
+    )
+else:
+    app.state.run_service = WorkflowRunService(
+        graph,
+        max_concurrency=int(os.environ.get("WORKFLOW_MAX_CONCURRENCY", "4")),
+        run_ttl=float(os.environ.get("WORKFLOW_RUN_TTL", "3600")),
+        event_logs=EventLogStore(os.environ.get("EVENT_LOG_DIR", "logs/runs")),
+        webhook_max_retries=int(os.environ.get("WEBHOOK_MAX_RETRIES", "5")),
+        disconnect_grace=float(os.environ.get("DISCONNECT_GRACE_SECONDS", "30")),
+        checkpoint_path=os.environ.get("RUN_CHECKPOINT_FILE", "logs/pending_runs.json"),
+        default_config={"callbacks": [callback_handler]},
+        run_deadline=float(os.environ.get("RUN_DEADLINE_SECONDS", "0")) or None,
+        queue=FairRunQueue(
+            # e.g. TENANT_WEIGHTS='{"team-a": 2, "team-b": 1}'
+            weights=json.loads(os.environ.get("TENANT_WEIGHTS", "{}")),
+            max_queued=int(os.environ.get("MAX_QUEUED_RUNS", "100")),
+            max_queued_per_tenant=int(os.environ.get("MAX_QUEUED_RUNS_PER_TENANT", "20")),
+        ),
+    )
+brownout.add_signal("run_queue", lambda: app.state.run_service.stats().get("queued", 0), RUN_QUEUE_THRESHOLD)
+
+@app.exception_handler(AdmissionRejected)
+async def admission_rejected_handler(request: HTTPRequest, exc: AdmissionRejected):
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
 # CORS 설정 추가
 app.add_middleware(
     CORSMiddleware,
@@ -37,65 +96,346 @@ app.add_middleware(
 class Request(BaseModel):
     input: str
     git_url: str
+    # 지정하면 실행 완료/실패 결과를 이 URL로 POST 합니다 (연결을 유지할 필요가 없음)
+    callback_url: Optional[str] = None
+    # 실행 시작부터 이 시간(초) 안에 끝나도록 단계별 예산을 나눕니다 (기본값: RUN_DEADLINE_SECONDS)
+    deadline_seconds: Optional[float] = Field(default=None, gt=0)
+    # Bedrock 호출이 공용 rate limiter에서 대기할 우선순위 레인
+    priority: Literal["high", "normal", "low"] = "normal"
+
+def _build_inputs(request: Request) -> dict:
+    return {
+        "messages": [HumanMessage(content=request.input)],
+        "base_url": request.git_url,
+    }
+
+def _get_run_or_404(run_id: str):
+    run = app.state.run_service.get(run_id)
+    if run is None:
+        raise HTTPException(status_code=404, detail=f"Run {run_id} not found")
+    return run
+
+def _resolve_tenant(tenant_id: Optional[str], api_key: Optional[str]) -> str:
+    """Runs are accounted to the X-Tenant-ID header, falling back to the API key."""
+    if tenant_id:
+        return tenant_id
+    if api_key:
+        # Never keep raw API keys around in queues, logs or metrics
+        return "key-" + hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:12]
+    return "default"
+
+def _submit(
+    request: Request,
+    idempotency_key: Optional[str] = None,
+    tenant_id: Optional[str] = None,
+    api_key: Optional[str] = None,
+    detached: bool = False,
+):
+    try:
+        run, _ = app.state.run_service.submit(
+            _build_inputs(request),
+            config={"configurable": {"deadline_seconds": request.deadline_seconds, "priority": request.priority}},
+            callback_url=request.callback_url,
+            dedup_key=request_fingerprint(request.input, request.git_url),
+            idempotency_key=idempotency_key,
+            tenant=_resolve_tenant(tenant_id, api_key),
+            detached=detached,
+        )
+    except IdempotencyConflictError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    return run
+
+@app.post("/runs", status_code=202)
+async def submit_run(
+    request: Request,
+    idempotency_key: Optional[str] = Header(default=None),
+    x_tenant_id: Optional[str] = Header(default=None),
+    x_api_key: Optional[str] = Header(default=None),
+):
+    return _submit(request, idempotency_key, x_tenant_id, x_api_key, detached=True).info()
+
+@app.get("/metrics")
+async def get_metrics():
+    return {
+        "admission": app.state.run_service.stats(),
+        "capacity": {
+            "containers": container_slots.stats(),
+            "bedrock_calls": bedrock_slots.stats(),
+        },
+        "llm_cache": llm_cache.stats() if llm_cache else None,
+        "semantic_cache": semantic_cache.stats() if semantic_cache else None,
+        "prompt_cache": prompt_cache_stats.stats(),
+        "rate_limiter": bedrock_limiter.stats(),
+        "bedrock_endpoints": bedrock_pool.stats(),
+        "hedging": hedge_policy.stats(),
+        "model_routes": model_router.table(),
+        "model_usage": model_usage.stats(),
+        "brownout": brownout.stats(),
+        "structured_output": structured_output_stats.stats(),
+    }
+
+@app.get("/runs/{run_id}")
+async def get_run_status(run_id: str):
+    return _get_run_or_404(run_id).info()
+
+@app.post("/runs/{run_id}/cancel", status_code=202)
+async def cancel_run(run_id: str):
+    """
+    Cancels a queued or running run. Shell commands and `se-agent` containers
+    started by the run are stopped and their capacity is released.
+    """
+    run = _get_run_or_404(run_id)
+    if not app.state.run_service.cancel(run, "Run was cancelled by request."):
+        raise HTTPException(status_code=409, detail=f"Run {run_id} already {run.status.value}")
+    return run.info()
+
+@app.post("/runs/{run_id}/resume", status_code=202)
+async def resume_run(
+    run_id: str,
+    x_tenant_id: Optional[str] = Header(default=None),
+    x_api_key: Optional[str] = Header(default=None),
+):
+    """
+    Queues a failed or cancelled run again under the same run id. It continues
+    from the last graph node that finished, so only the failed stage and the
+    ones after it are executed again. Events of the new attempt are appended to
+    the run's existing event stream.
+    """
+    try:
+        run = await app.state.run_service.resume(run_id, tenant=_resolve_tenant(x_tenant_id, x_api_key))
+    except RunNotResumableError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if run is None:
+        raise HTTPException(status_code=404, detail=f"Run {run_id} not found")
+    return run.info()
+
+FIELDS_DESCRIPTION = (
+    "Comma-separated state fields to return; dotted paths select nested fields, "
+    "e.g. `response,fe_branch_name,be_branch_name,agent_results.cost_usd`."
+)
+
+def _get_finished_run(run_id: str):
+    run = _get_run_or_404(run_id)
+    if not run.is_finished:
+        raise HTTPException(status_code=409, detail=f"Run {run_id} is still {run.status.value}")
+    if run.status == RunStatus.CANCELLED:
+        raise HTTPException(status_code=409, detail=run.error or "Run was cancelled")
+    if run.status == RunStatus.FAILED:
+        raise HTTPException(status_code=500, detail=run.error or "Run failed")
+    return run
+
+def _result_content(run, fields: Optional[str]) -> dict:
+    content = {"response": project_state(run.result, parse_fields(fields))}
+    if run.status == RunStatus.DEADLINE_EXCEEDED:
+        # The partial state is returned along with the reason it is partial
+        content["error"] = run.error
+    return content
+
+@app.get("/runs/{run_id}/result")
+async def get_run_result(
+    run_id: str,
+    fields: Optional[str] = Query(default=None, description=FIELDS_DESCRIPTION),
+    accept_encoding: Optional[str] = Header(default=None),
+):
+    run = _get_finished_run(run_id)
+    return await encoded_json_response(_result_content(run, fields), accept_encoding)
+
+@app.get("/runs/{run_id}/messages")
+async def get_run_messages(
+    run_id: str,
+    offset: int = Query(default=0, ge=0),
+    limit: int = Query(default=50, ge=1, le=500),
+    accept_encoding: Optional[str] = Header(default=None),
+):
+    """Pages through the message transcript of a finished run."""
+    run = _get_finished_run(run_id)
+    messages = (run.result or {}).get("messages", [])
+    return await encoded_json_response(
+        {
+            "total": len(messages),
+            "offset": offset,
+            "limit": limit,
+            "messages": messages[offset:offset + limit],
+        },
+        accept_encoding,
+    )
+
+async def _wait_while_connected(run, http_request: HTTPRequest, poll_interval: float = 1.0) -> bool:
+    """
+    Waits for the run to finish while watching the client connection.
+    Returns False if the client disconnected first.
+    """
+    service = app.state.run_service
+    service.subscribe(run)
+    try:
+        while True:
+            try:
+                await asyncio.wait_for(run.wait(), poll_interval)
+                return True
+            except asyncio.TimeoutError:
+                if await http_request.is_disconnected():
+                    logger.info(f"Client waiting for run {run.run_id} disconnected")
+                    return False
+    finally:
+        service.unsubscribe(run)
 
 @app.post("/invoke-workflow")
-async def read_root(request: Request):
-    response = await graph.ainvoke(
-            {"messages": [HumanMessage(content=request.input)],
-            "base_url": request.git_url
-            },
-            config={                
-                "callbacks": [callback_handler]
-            },
+async def read_root(
+    request: Request,
+    http_request: HTTPRequest,
+    idempotency_key: Optional[str] = Header(default=None),
+    x_tenant_id: Optional[str] = Header(default=None),
+    x_api_key: Optional[str] = Header(default=None),
+    fields: Optional[str] = Query(default=None, description=FIELDS_DESCRIPTION),
+    accept_encoding: Optional[str] = Header(default=None),
+):
+    run = _submit(request, idempotency_key, x_tenant_id, x_api_key)
+    if request.callback_url:
+        # The outcome is delivered to the webhook, so don't hold the connection open
+        return JSONResponse(status_code=202, content=run.info().model_dump())
+
+    # Concurrent identical requests attach to the same run and share its result
+    if not await _wait_while_connected(run, http_request):
+        # Nobody reads the response; the run is cancelled if no other client waits for it
+        return JSONResponse(status_code=499, content=run.info().model_dump())
+    if run.status == RunStatus.CANCELLED:
+        raise HTTPException(status_code=409, detail=run.error or "Run was cancelled")
+    if run.status == RunStatus.FAILED:
+        raise HTTPException(status_code=500, detail=run.error or "Run failed")
+    return await encoded_json_response(_result_content(run, fields), accept_encoding)
+
+STREAM_HEADERS = {
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no",
+    "Connection": "keep-alive",
+    "X-Content-Type-Options": "nosniff",
+}
+
+def _encode_line(obj: dict, sse: bool, seq: Optional[int] = None, event: Optional[str] = None) -> bytes:
+    data = json.dumps(obj, ensure_ascii=False)
+    if not sse:
+        return (data + "\n").encode("utf-8")
+    head = f"id: {seq}\n" if seq is not None else ""
+    head += f"event: {event}\n" if event else ""
+    return (head + f"data: {data}\n\n").encode("utf-8")
+
+def _split_csv(value: Optional[str]) -> Optional[set[str]]:
+    if not value:
+        return None
+    return {item.strip() for item in value.split(",") if item.strip()}
+
+def _stream_options(
+    kinds: Optional[str] = Query(default=None, description="Comma-separated event kinds to send, e.g. `on_chain_end,on_custom_event`."),
+    nodes: Optional[str] = Query(default=None, description="Comma-separated graph node names to send events for."),
+    payloads: bool = Query(default=True, description="Include `data.input`/`data.output` state payloads."),
+    coalesce_ms: int = Query(default=0, ge=0, description="Merge token chunks arriving within this many milliseconds."),
+    coalesce_chars: int = Query(default=2048, ge=1, description="Flush merged token chunks at this many characters."),
+) -> EventStreamOptions:
+    return EventStreamOptions(
+        kinds=_split_csv(kinds),
+        nodes=_split_csv(nodes),
+        include_payloads=payloads,
+        coalesce_ms=coalesce_ms,
+        coalesce_chars=coalesce_chars,
+    )
+
+async def _stream_run_events(run_id: str, event_log, start: int, sse: bool, options: EventStreamOptions):
+    """
+    Replays a run's event log from sequence number `start` and follows the live tail.
+
+    Kind/node filters are applied on the log index, so skipped events are never
+    read. Without payload stripping or coalescing, lines are forwarded straight
+    from the log file with no re-serialization.
+
+    The stream counts as a subscriber of the run while it is open; an
+    interactive run whose last stream disconnects is cancelled after a grace period.
+    """
+    service = app.state.run_service
+    run = service.get(run_id)
+    if run is not None:
+        service.subscribe(run)
+    try:
+        async for chunk in _read_run_events(event_log, start, sse, options):
+            yield chunk
+    finally:
+        if run is not None:
+            service.unsubscribe(run)
+
+    run = service.get(run_id)
+    status = {"status": run.status.value, "run_id": run_id} if run else {"status": "finished", "run_id": run_id}
+    if run and run.error:
+        status["error"] = run.error
+    yield _encode_line(status, sse, event="end")
+
+async def _read_run_events(event_log, start: int, sse: bool, options: EventStreamOptions):
+    match = options.matches if (options.kinds or options.nodes) else None
+    entries = event_log.read_lines(start, match=match)
+    if options.passthrough:
+        async for seq, line in entries:
+            if sse:
+                yield f"id: {seq}\ndata: ".encode("utf-8") + line.rstrip(b"\n") + b"\n\n"
+            else:
+                yield line
+    else:
+        async def parsed():
+            async for _, line in entries:
+                yield options.transform(json.loads(line))
+
+        events = parsed()
+        if options.coalesce_ms:
+            events = coalesce_token_chunks(events, options.coalesce_ms / 1000, options.coalesce_chars)
+        async for event in events:
+            yield _encode_line(event, sse, seq=event.get("seq"))
+
+@app.get("/runs/{run_id}/events")
+async def stream_run_events(
+    run_id: str,
+    request: HTTPRequest,
+    offset: int = Query(default=0, ge=0, description="Sequence number of the first event to send."),
+    last_event_id: Optional[str] = Header(default=None),
+    options: EventStreamOptions = Depends(_stream_options),
+):
+    """
+    Replays and tails the event log of a run. Clients that lost their connection
+    resume from `Last-Event-ID` (SSE) or `offset` (NDJSON) without re-running the workflow.
+    Query parameters select event kinds and nodes, strip state payloads and batch token chunks.
+    """
+    event_log = app.state.run_service.get_event_log(run_id)
+    if event_log is None:
+        raise HTTPException(status_code=404, detail=f"Run {run_id} not found")
+    start = offset
+    if last_event_id is not None and last_event_id.isdigit():
+        start = int(last_event_id) + 1
+    sse = "text/event-stream" in request.headers.get("accept", "")
+    return StreamingResponse(
+        _stream_run_events(run_id, event_log, start, sse, options),
+        media_type="text/event-stream; charset=utf-8" if sse else "application/x-ndjson; charset=utf-8",
+        headers={**STREAM_HEADERS, "X-Run-Id": run_id},
     )
-    return {"response": response}
 
 @app.post("/stream-workflow")
-async def stream_workflow(request: Request):
+async def stream_workflow(
+    request: Request,
+    idempotency_key: Optional[str] = Header(default=None),
+    x_tenant_id: Optional[str] = Header(default=None),
+    x_api_key: Optional[str] = Header(default=None),
+    options: EventStreamOptions = Depends(_stream_options),
+):
+    run = _submit(request, idempotency_key, x_tenant_id, x_api_key)
+    if request.callback_url:
+        return JSONResponse(status_code=202, content=run.info().model_dump())
+
     async def ndjson_stream():
         # Send an initial line to flush headers and open the stream on clients
-        yield (json.dumps({"status": "starting"}, ensure_ascii=False) + "\n").encode("utf-8")
-
-        inputs = {
-            "messages": [HumanMessage(content=request.input)],
-            "base_url": request.git_url,
-        }
-        cfg = {"callbacks": [callback_handler]}
-
-        # Choose the best available stream API, but iterate with one unified loop
-        events_iter = (
-            graph.astream_events(inputs, config=cfg, version="v1")
-            if getattr(graph, "astream_events", None)
-            else graph.astream_log(inputs, config=cfg)
-        )
+        yield _encode_line({"status": "starting", "run_id": run.run_id}, sse=False)
 
-        async for event in events_iter:
-            try:
-                if isinstance(event, (bytes, bytearray)):
-                    text = event.decode("utf-8", errors="ignore")
-                    try:
-                        obj = json.loads(text)
-                    except Exception:
-                        obj = {"message": text}
-                elif isinstance(event, (dict, list)):
-                    obj = event
-                else:
-                    text = str(event)
-                    try:
-                        obj = json.loads(text)
-                    except Exception:
-                        obj = {"message": text}
-                yield (json.dumps(obj, ensure_ascii=False) + "\n").encode("utf-8")
-            except Exception:
-                continue
+        # Subscribers of a shared run replay its events from the beginning.
+        # A client that disconnects can resume with GET /runs/{run_id}/events?offset=<seq + 1>.
+        async for line in _stream_run_events(run.run_id, run.event_log, 0, False, options):
+            yield line
 
     return StreamingResponse(
         ndjson_stream(),
         media_type="application/x-ndjson; charset=utf-8",
-        headers={
-            "Cache-Control": "no-cache",
-            "X-Accel-Buffering": "no",
-            "Connection": "keep-alive",
-            "X-Content-Type-Options": "nosniff",
-        },
-    )
\ No newline at end of file
+        headers={**STREAM_HEADERS, "X-Run-Id": run.run_id},
+    )
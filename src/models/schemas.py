@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Optional, Any
+from typing import Optional, Any, Literal
 class ArchitectAgentResult(BaseModel):
     """아키텍트 에이전트 작업의 최종 결과물인 브랜치와 베이스 URL 정보를 담는 모델입니다."""
 
@@ -17,4 +17,164 @@ class ResolverAgentResult(BaseModel):
 
     final_url: Optional[str] = Field(
         description="최종 브랜치의 전체 URL입니다."
-    )
\ No newline at end of file
+    )
+class RunInfo(BaseModel):
+    """백그라운드 워커 풀에서 실행되는 워크플로우 실행(run)의 상태 정보를 담는 모델입니다."""
+
+    run_id: str = Field(
+        description="The identifier returned when the run was submitted."
+    )
+    status: str = Field(
+        description="Current lifecycle state of the run, e.g. `queued`, `running`, `succeeded`."
+    )
+    created_at: float = Field(
+        description="Unix timestamp at which the run was submitted."
+    )
+    started_at: Optional[float] = Field(
+        default=None,
+        description="Unix timestamp at which a worker picked the run up."
+    )
+    finished_at: Optional[float] = Field(
+        default=None,
+        description="Unix timestamp at which the run reached a terminal state."
+    )
+    error: Optional[str] = Field(
+        default=None,
+        description="Error message if the run failed, was cancelled or reached its deadline."
+    )
+class RequirementsDefinition(BaseModel):
+    """요구사항 정의(define_req) 단계의 출력 스키마입니다."""
+
+    project_name: str = Field(
+        description="A short, concise title for the project."
+    )
+    project_summary: str = Field(
+        default="",
+        description="A 1-2 sentence overview of the project."
+    )
+    functional_requirements: list[str] = Field(
+        default_factory=list,
+        description="System features."
+    )
+    user_scenarios: list[str] = Field(
+        default_factory=list,
+        description="Example workflows or interactions."
+    )
+    process_flow: list[str] = Field(
+        default_factory=list,
+        description="Step-by-step outline of system behavior."
+    )
+    domain_entities: list[str] = Field(
+        default_factory=list,
+        description="Key data objects in the system."
+    )
+    non_functional_requirements: list[str] = Field(
+        default_factory=list,
+        description="Performance, scalability and security constraints."
+    )
+    not_in_scope: list[str] = Field(
+        default_factory=list,
+        description="What the system explicitly does not do."
+    )
+class StackSelection(BaseModel):
+    """프론트엔드/백엔드별로 선택한 기술 목록입니다."""
+
+    frontend: list[str] = Field(
+        default_factory=list,
+        description="Approved values chosen for the frontend; empty if not applicable."
+    )
+    backend: list[str] = Field(
+        default_factory=list,
+        description="Approved values chosen for the backend; empty if not applicable."
+    )
+class TechStack(BaseModel):
+    """개발 환경 초기화(dev_env_init) 단계의 출력 스키마입니다."""
+
+    language: StackSelection = Field(
+        description="Programming languages, from the approved languages only."
+    )
+    framework: StackSelection = Field(
+        description="Frameworks, from the approved frameworks only."
+    )
+    library: StackSelection = Field(
+        description="Libraries, from the approved libraries only and matching the chosen frameworks."
+    )
+class MainGoal(BaseModel):
+    """개발 계획의 EPIC 하나입니다."""
+
+    id: str = Field(
+        description="Goal id, e.g. `G1`; keys `sub_goals`."
+    )
+    title: str = Field(
+        description="Short title of the EPIC."
+    )
+    rationale: str = Field(
+        default="",
+        description="Why the EPIC is needed."
+    )
+    priority: Optional[str] = Field(
+        default=None,
+        description="`P1`, `P2` or `P3`."
+    )
+class SubGoal(BaseModel):
+    """EPIC을 구성하는 TASK 하나입니다."""
+
+    id: str = Field(
+        description="Task id, e.g. `G1-S1`."
+    )
+    title: str = Field(
+        description="Short title of the task."
+    )
+    owner: Literal["FE", "BE"] = Field(
+        description="`FE` for frontend work, `BE` for backend work."
+    )
+    description: str = Field(
+        default="",
+        description="What to implement, including API/model/storage or page/component/state impact."
+    )
+    dependencies: list[str] = Field(
+        default_factory=list,
+        description="Ids of the tasks this task depends on."
+    )
+    acceptance_criteria: list[str] = Field(
+        default_factory=list,
+        description="Testable conditions for the task to be complete."
+    )
+class DevelopmentPlan(BaseModel):
+    """개발 계획(dev_planning) 단계의 출력 스키마입니다."""
+
+    main_goals: list[MainGoal] = Field(
+        description="EPICs of the project."
+    )
+    sub_goals: dict[str, list[SubGoal]] = Field(
+        description="Tasks of every EPIC, keyed by the EPIC's id."
+    )
+    directory_tree: list[str] = Field(
+        default_factory=list,
+        description="Directories of the repository, one path per entry."
+    )
+class UserStory(BaseModel):
+    """코드 에이전트에게 전달되는 사용자 스토리 하나입니다."""
+
+    story: str = Field(
+        description="As a ..., I want ..., so that ..."
+    )
+    acceptance_criteria: list[str] = Field(
+        default_factory=list,
+        description="Testable conditions for the story to be complete."
+    )
+class UserStoryGroup(BaseModel):
+    """한 에이전트(컨테이너)가 맡는 사용자 스토리 묶음입니다."""
+
+    group_name: str = Field(
+        description="Name of the group."
+    )
+    user_stories: list[UserStory] = Field(
+        description="Stories of the group, at most 10."
+    )
+class UserStoryGroups(BaseModel):
+    """역할 배분(role_allocate) 단계의 출력 스키마입니다."""
+
+    user_story_groups: list[UserStoryGroup] = Field(
+        description="Groups of related user stories, at most 3."
+    )
@@ -1,10 +1,13 @@
 """Custom Prebuilt Modules."""
 
 from .custom_tool_node import ToolState, tools_condition
+from .agent_turn import AGENT_STREAMING, run_agent_turn
 
 __all__ = [
     "ToolState",
     "tools_condition",
+    "AGENT_STREAMING",
+    "run_agent_turn",
 ]
 
 
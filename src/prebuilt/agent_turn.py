@@ -0,0 +1,38 @@
+import os
+from typing import Any, Optional
+
+from langchain_core.messages import AIMessage, message_chunk_to_message
+from langchain_core.runnables import Runnable, RunnableConfig
+
+# Agent turns stream their tokens into the graph's event stream unless AGENT_STREAMING=0
+AGENT_STREAMING = os.environ.get("AGENT_STREAMING", "1") != "0"
+
+async def run_agent_turn(
+    agent_chain: Runnable,
+    state: Any,
+    config: Optional[RunnableConfig] = None,
+    streaming: bool = AGENT_STREAMING,
+) -> AIMessage:
+    """
+    Runs one model turn of a ReAct agent.
+
+    With `streaming`, the turn is streamed: text tokens and partial tool-call
+    arguments reach `astream_events` (`on_chat_model_stream`) as they arrive,
+    so `/stream-workflow` shows the agent thinking instead of going silent for
+    the length of the turn. The chunks are merged into the final `AIMessage`
+    (with parsed `tool_calls`) that `tools_condition` routes on.
+
+    Args:
+        agent_chain (Runnable): Prompt piped into the tool-bound model.
+        state: Agent state rendered by the prompt.
+        config (RunnableConfig | None): Config of the calling node.
+        streaming (bool): Stream the turn instead of waiting for the whole response.
+    """
+    if not streaming:
+        return await agent_chain.ainvoke(state, config)
+    message = None
+    async for chunk in agent_chain.astream(state, config):
+        message = chunk if message is None else message + chunk
+    if message is None:
+        raise ValueError("The model returned no output")
+    return message_chunk_to_message(message)
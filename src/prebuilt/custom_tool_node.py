@@ -3,6 +3,7 @@ from langchain_core.messages import AnyMessage, BaseMessage
 from langchain_core.agents import AgentAction
 import operator
 from langgraph.graph import add_messages
+from langgraph.managed import RemainingSteps
 from pydantic import BaseModel, Field
 from ..utils.graph_utils import convert_to_tool_use_format
 
@@ -11,6 +12,8 @@ class ToolState(TypedDict):
     messages: Annotated[List[AnyMessage], add_messages]
     intermediate_steps: Annotated[List[Tuple[AgentAction, str]], operator.add]
     chat_id: str
+    # Steps left before the recursion limit; agents wrap up instead of running into it
+    remaining_steps: RemainingSteps
 
 # Custom tools_condition function to check for function calls
 def tools_condition(state: ToolState) -> Literal["tools", "__end__"]:
@@ -0,0 +1,130 @@
+import asyncio
+import math
+from collections import deque
+from typing import Any, Optional
+
+class AdmissionRejected(Exception):
+    """
+    Raised when a run cannot be admitted right now.
+
+    Args:
+        message (str): Human readable reason.
+        retry_after (int): Suggested number of seconds before retrying.
+        status_code (int): HTTP status to answer with; 503 while the server is draining.
+    """
+
+    def __init__(self, message: str, retry_after: int, status_code: int = 429):
+        super().__init__(message)
+        self.retry_after = retry_after
+        self.status_code = status_code
+
+class FairRunQueue:
+    """
+    Weighted fair queue of pending runs, keyed by tenant.
+
+    Each tenant has its own FIFO. Items are tagged with a virtual finish time
+    (start + 1/weight) and the head with the smallest tag is served next, so a
+    burst from one tenant cannot starve the others and a tenant with weight 2
+    gets roughly twice the share of a tenant with weight 1.
+
+    Args:
+        weights (dict[str, float] | None): Per-tenant weights; unknown tenants use `default_weight`.
+        default_weight (float): Weight of tenants missing from `weights`.
+        max_queued (int): Cap on queued items across all tenants.
+        max_queued_per_tenant (int): Cap on queued items for a single tenant.
+    """
+
+    def __init__(
+        self,
+        weights: Optional[dict[str, float]] = None,
+        default_weight: float = 1.0,
+        max_queued: int = 100,
+        max_queued_per_tenant: int = 20,
+    ):
+        self.weights = weights or {}
+        self.default_weight = default_weight
+        self.max_queued = max_queued
+        self.max_queued_per_tenant = max_queued_per_tenant
+        self._queues: dict[str, deque[tuple[float, float, Any]]] = {}
+        self._last_finish: dict[str, float] = {}
+        self._virtual_time = 0.0
+        self._size = 0
+        self._not_empty = asyncio.Event()
+        self.closed = False
+
+    def weight(self, tenant: str) -> float:
+        return max(float(self.weights.get(tenant, self.default_weight)), 1e-6)
+
+    def qsize(self, tenant: Optional[str] = None) -> int:
+        if tenant is None:
+            return self._size
+        return len(self._queues.get(tenant, ()))
+
+    def rejection_reason(self, tenant: str) -> Optional[str]:
+        """Returns why a new item from `tenant` cannot be queued, or None if it can."""
+        if self.closed:
+            return "The server is shutting down and not accepting new runs"
+        if self._size >= self.max_queued:
+            return "Too many runs are queued"
+        if self.qsize(tenant) >= self.max_queued_per_tenant:
+            return f"Tenant {tenant!r} has too many queued runs"
+        return None
+
+    def put_nowait(self, tenant: str, item: Any) -> None:
+        start = max(self._virtual_time, self._last_finish.get(tenant, 0.0))
+        finish = start + 1.0 / self.weight(tenant)
+        self._last_finish[tenant] = finish
+        self._queues.setdefault(tenant, deque()).append((start, finish, item))
+        self._size += 1
+        self._not_empty.set()
+
+    async def get(self) -> Any:
+        """Wait for and pop the item with the smallest virtual finish time."""
+        while self._size == 0:
+            self._not_empty.clear()
+            await self._not_empty.wait()
+        tenant = min(self._queues, key=lambda t: self._queues[t][0][1])
+        start, _, item = self._queues[tenant].popleft()
+        if not self._queues[tenant]:
+            del self._queues[tenant]
+        self._size -= 1
+        self._virtual_time = max(self._virtual_time, start)
+        return item
+
+    def discard(self, tenant: str, item: Any) -> bool:
+        """Remove a queued item, e.g. a run cancelled before it started. Returns whether it was queued."""
+        queue = self._queues.get(tenant)
+        if not queue:
+            return False
+        for entry in queue:
+            if entry[2] is item:
+                queue.remove(entry)
+                break
+        else:
+            return False
+        if not queue:
+            del self._queues[tenant]
+        self._size -= 1
+        return True
+
+    def drain(self) -> list[Any]:
+        """Remove and return every queued item."""
+        items = [item for q in self._queues.values() for _, _, item in q]
+        self._queues.clear()
+        self._size = 0
+        return items
+
+    def stats(self) -> dict:
+        return {
+            "queued": self._size,
+            "queued_per_tenant": {t: len(q) for t, q in self._queues.items()},
+            "closed": self.closed,
+        }
+
+def estimate_retry_after(queued: int, concurrency: int, avg_run_seconds: float) -> int:
+    """
+    Rough number of seconds until a worker frees up for a new run, assuming the
+    queue ahead drains at `concurrency` runs per `avg_run_seconds`.
+    """
+    waves = (queued + 1) / max(1, concurrency)
+    return max(1, int(math.ceil(waves * avg_run_seconds)))
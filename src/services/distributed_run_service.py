@@ -0,0 +1,424 @@
+import asyncio
+import json
+import logging
+import time
+import uuid
+import warnings
+from typing import Any, AsyncIterator, Callable, Optional
+
+from fastapi.encoders import jsonable_encoder
+from langchain_core._api import LangChainBetaWarning
+from langchain_core.load import dumpd, load
+
+from ..constants.run_status import RunStatus
+from ..models.schemas import RunInfo
+from .admission_service import AdmissionRejected, estimate_retry_after
+from .run_service import IdempotencyConflictError, RunNotResumableError, WorkflowRun, WorkflowRunService
+from .run_store import RunStore
+from .webhook_service import deliver_webhook
+
+logger = logging.getLogger(__name__)
+
+class StoredEventLog:
+    """
+    Event log of a run kept in a `RunStore`, with the same interface as `RunEventLog`.
+
+    Workers append to it; front-ends on any host replay it and follow the tail
+    by polling the store until the run has finished.
+
+    Args:
+        store (RunStore): The shared run store.
+        run_id (str): Run the events belong to.
+        poll_interval (float): Seconds between polls while following the tail.
+    """
+
+    def __init__(self, store: RunStore, run_id: str, poll_interval: float = 0.5):
+        self.store = store
+        self.run_id = run_id
+        self.poll_interval = poll_interval
+
+    async def append(self, event: dict) -> int:
+        return await asyncio.to_thread(self.store.append_event, self.run_id, event)
+
+    async def close(self) -> None:
+        # Readers notice the end of the log from the run status
+        pass
+
+    async def read_lines(
+        self,
+        start: int = 0,
+        match: Optional[Callable[[Optional[str], Optional[str]], bool]] = None,
+    ) -> AsyncIterator[tuple[int, bytes]]:
+        seq = max(0, start)
+        while True:
+            # Check the status first, so events written just before the run finished are not missed
+            record = await asyncio.to_thread(self.store.get, self.run_id)
+            finished = record is None or record["status"] in {s.value for s in RunStatus.terminal_states()}
+            while True:
+                rows = await asyncio.to_thread(self.store.read_events, self.run_id, seq)
+                for current, kind, node, line in rows:
+                    if match is None or match(kind, node):
+                        yield current, line
+                    seq = current + 1
+                if not rows:
+                    break
+            if finished:
+                return
+            await asyncio.sleep(self.poll_interval)
+
+    async def read(self, start: int = 0) -> AsyncIterator[dict]:
+        async for _, line in self.read_lines(start):
+            yield json.loads(line)
+
+class StoredRun:
+    """
+    Snapshot of a run record in a `RunStore`, with the attributes of `WorkflowRun`
+    that the API reads.
+    """
+
+    def __init__(self, store: RunStore, record: dict, poll_interval: float = 0.5):
+        self.store = store
+        self.poll_interval = poll_interval
+        self.event_log = StoredEventLog(store, record["run_id"], poll_interval)
+        self._load(record)
+
+    def _load(self, record: dict) -> None:
+        self.record = record
+        self.run_id = record["run_id"]
+        self.tenant = record["tenant"]
+        self.status = RunStatus(record["status"])
+        self.created_at = record["created_at"]
+        self.started_at = record["started_at"]
+        self.finished_at = record["finished_at"]
+        self.error = record["error"]
+        self.result = record["result"]
+        self.dedup_key = record["dedup_key"]
+        self.callback_urls = record["callback_urls"]
+        self.detached = record["detached"]
+
+    @property
+    def is_finished(self) -> bool:
+        return self.status in RunStatus.terminal_states()
+
+    async def wait(self) -> None:
+        """Poll the store until the run reaches a terminal state."""
+        while not self.is_finished:
+            await asyncio.sleep(self.poll_interval)
+            record = await asyncio.to_thread(self.store.get, self.run_id)
+            if record is None:
+                return
+            self._load(record)
+
+    def info(self) -> RunInfo:
+        return RunInfo(
+            run_id=self.run_id,
+            status=self.status.value,
+            created_at=self.created_at,
+            started_at=self.started_at,
+            finished_at=self.finished_at,
+            error=self.error,
+        )
+
+class StoreRunService:
+    """
+    Stateless API front-end of the job API: runs are written to a shared
+    `RunStore` and executed by worker processes (`python -m src.worker`) on any
+    host. Has the same interface as `WorkflowRunService`, so the endpoints work
+    unchanged whether runs execute in-process or on remote workers.
+
+    Submissions are coalesced and admission-checked against the store. Store
+    lookups in `submit`/`get` are short blocking calls; reading events and
+    waiting for results poll the store without blocking the event loop.
+
+    Args:
+        store (RunStore): The shared run store.
+        run_ttl (float): Seconds finished runs are kept in the store.
+        max_queued (int): Cap on queued runs across all tenants.
+        max_queued_per_tenant (int): Cap on queued runs for a single tenant.
+        disconnect_grace (float): Seconds an interactive run survives without subscribers.
+        webhook_max_retries (int): Delivery retries for webhooks sent by the front-end.
+        poll_interval (float): Seconds between store polls while waiting or streaming.
+    """
+
+    def __init__(
+        self,
+        store: RunStore,
+        run_ttl: float = 3600.0,
+        max_queued: int = 100,
+        max_queued_per_tenant: int = 20,
+        disconnect_grace: float = 30.0,
+        webhook_max_retries: int = 5,
+        poll_interval: float = 0.5,
+    ):
+        self.store = store
+        self.run_ttl = run_ttl
+        self.max_queued = max_queued
+        self.max_queued_per_tenant = max_queued_per_tenant
+        self.disconnect_grace = disconnect_grace
+        self.webhook_max_retries = webhook_max_retries
+        self.poll_interval = poll_interval
+        self.closed = False
+        # Connected clients per run on this front-end
+        self._subscribers: dict[str, int] = {}
+        self._deliveries: set[asyncio.Task] = set()
+
+    async def start(self) -> None:
+        await asyncio.to_thread(self.store.prune, self.run_ttl)
+
+    async def drain(self, timeout: float) -> None:
+        """Stop admitting runs; the runs themselves belong to the workers."""
+        self.closed = True
+
+    async def stop(self) -> None:
+        if self._deliveries:
+            await asyncio.gather(*self._deliveries, return_exceptions=True)
+
+    def submit(
+        self,
+        inputs: dict[str, Any],
+        config: Optional[dict[str, Any]] = None,
+        callback_url: Optional[str] = None,
+        dedup_key: Optional[str] = None,
+        idempotency_key: Optional[str] = None,
+        tenant: str = "default",
+        detached: bool = False,
+    ) -> tuple[StoredRun, bool]:
+        """
+        Queue a run in the store, or attach to an equivalent existing run.
+        Same arguments and errors as `WorkflowRunService.submit`; `config` must be
+        JSON-serializable since workers on other hosts load it.
+        """
+        existing = self.store.find(dedup_key=dedup_key, idempotency_key=idempotency_key)
+        if existing is not None:
+            if (
+                idempotency_key
+                and existing["idempotency_key"] == idempotency_key
+                and dedup_key and existing["dedup_key"] and existing["dedup_key"] != dedup_key
+            ):
+                raise IdempotencyConflictError(
+                    f"Idempotency key {idempotency_key!r} was already used for a different request"
+                )
+            logger.info(f"Attaching submission to existing workflow run {existing['run_id']}")
+            self.store.attach(existing["run_id"], callback_url, detached)
+            run = StoredRun(self.store, self.store.get(existing["run_id"]), self.poll_interval)
+            if callback_url and run.is_finished and callback_url not in existing["callback_urls"]:
+                self._schedule_webhook(run, callback_url)
+            return run, False
+
+        self._admit(tenant)
+        record = {
+            "run_id": uuid.uuid4().hex,
+            "tenant": tenant,
+            "status": RunStatus.QUEUED.value,
+            "created_at": time.time(),
+            "dedup_key": dedup_key,
+            "idempotency_key": idempotency_key,
+            "inputs": dumpd(inputs),
+            "config": config or {},
+            "callback_urls": [callback_url] if callback_url else [],
+            "detached": detached or bool(callback_url),
+            "result": None,
+        }
+        self.store.create(record)
+        logger.info(f"Queued workflow run {record['run_id']} for tenant {tenant!r} in the run store")
+        return StoredRun(self.store, self.store.get(record["run_id"]), self.poll_interval), True
+
+    def _admit(self, tenant: str) -> None:
+        stats = self.store.stats()
+        reason = None
+        if self.closed:
+            reason = "The server is shutting down and not accepting new runs"
+        elif stats["queued"] >= self.max_queued:
+            reason = "Too many runs are queued"
+        elif stats["queued_per_tenant"].get(tenant, 0) >= self.max_queued_per_tenant:
+            reason = f"Tenant {tenant!r} has too many queued runs"
+        if reason:
+            retry_after = estimate_retry_after(stats["queued"], max(1, len(stats["busy_workers"])), 600.0)
+            logger.warning(f"Rejected workflow run for tenant {tenant!r}: {reason}")
+            raise AdmissionRejected(reason, retry_after, status_code=503 if self.closed else 429)
+
+    async def resume(self, run_id: str, tenant: str = "default") -> Optional[StoredRun]:
+        """
+        Queue a failed, cancelled or timed-out run again in the store. The worker that
+        claims it continues from the run's graph checkpoint if it can read it
+        (see `GRAPH_CHECKPOINT_DB`), otherwise it starts over. Same arguments and
+        errors as `WorkflowRunService.resume`.
+        """
+        record = await asyncio.to_thread(self.store.get, run_id)
+        if record is None:
+            return None
+        self._admit(record["tenant"])
+        if not await asyncio.to_thread(self.store.reopen, run_id):
+            raise RunNotResumableError(f"Run {run_id} is {record['status']}")
+        logger.info(f"Queued workflow run {run_id} for resumption in the run store")
+        return StoredRun(self.store, await asyncio.to_thread(self.store.get, run_id), self.poll_interval)
+
+    def get(self, run_id: str) -> Optional[StoredRun]:
+        record = self.store.get(run_id)
+        return StoredRun(self.store, record, self.poll_interval) if record else None
+
+    def get_event_log(self, run_id: str) -> Optional[StoredEventLog]:
+        run = self.get(run_id)
+        return run.event_log if run else None
+
+    def cancel(self, run: StoredRun, reason: str = "Run was cancelled.") -> bool:
+        """Ask the store to cancel the run; its worker stops it on the next heartbeat."""
+        return self.store.request_cancel(run.run_id, reason)
+
+    def subscribe(self, run: StoredRun) -> None:
+        self._subscribers[run.run_id] = self._subscribers.get(run.run_id, 0) + 1
+
+    def unsubscribe(self, run: StoredRun) -> None:
+        count = self._subscribers.get(run.run_id, 1) - 1
+        if count > 0:
+            self._subscribers[run.run_id] = count
+            return
+        self._subscribers.pop(run.run_id, None)
+        if not run.detached:
+            asyncio.get_running_loop().call_later(self.disconnect_grace, self._cancel_if_abandoned, run.run_id)
+
+    def _cancel_if_abandoned(self, run_id: str) -> None:
+        # Only subscribers on this front-end are known; a client reconnecting
+        # elsewhere within the grace period does not keep the run alive.
+        if self._subscribers.get(run_id):
+            return
+        run = self.get(run_id)
+        if run is not None and not run.detached and not run.is_finished:
+            self.cancel(run, "Run was cancelled because all clients disconnected.")
+
+    def stats(self) -> dict:
+        return {
+            **self.store.stats(),
+            "closed": self.closed,
+            "store": type(self.store).__name__,
+        }
+
+    def _schedule_webhook(self, run: StoredRun, url: str) -> None:
+        payload = {**run.info().model_dump(), "response": run.result}
+        task = asyncio.create_task(deliver_webhook(url, payload, max_retries=self.webhook_max_retries))
+        self._deliveries.add(task)
+        task.add_done_callback(self._deliveries.discard)
+
+class StoreWorkerService(WorkflowRunService):
+    """
+    Worker side of the shared run store: claims queued runs from the store and
+    executes them with the regular in-process worker pool.
+
+    Events are appended to the store as they happen, heartbeats keep claimed
+    runs from being handed to another worker, cancellation requests are picked
+    up on every heartbeat, and the outcome is written back before webhooks are
+    sent. On `drain`, runs that cannot finish in time go back to the store queue
+    instead of a local checkpoint file, so any worker can resume them. Runs of a
+    worker that stops sending heartbeats are requeued by the other workers; if
+    that worker was only slow, its next heartbeat tells it the runs are no
+    longer its own, and it stops them without recording their outcome.
+
+    Args:
+        graph: The compiled LangGraph graph to execute.
+        store (RunStore): The shared run store.
+        worker_id (str): Identifies this worker in the store.
+        poll_interval (float): Seconds between claim attempts while idle.
+        heartbeat_interval (float): Seconds between heartbeats.
+        stale_timeout (float): Seconds without heartbeat after which another worker's runs are requeued.
+        **kwargs: Passed to `WorkflowRunService`.
+    """
+
+    def __init__(
+        self,
+        graph,
+        store: RunStore,
+        worker_id: str,
+        poll_interval: float = 1.0,
+        heartbeat_interval: float = 10.0,
+        stale_timeout: float = 120.0,
+        **kwargs,
+    ):
+        super().__init__(graph, **kwargs)
+        self.store = store
+        self.worker_id = worker_id
+        self.poll_interval = poll_interval
+        self.heartbeat_interval = heartbeat_interval
+        self.stale_timeout = stale_timeout
+
+    def adopt(self, record: dict) -> WorkflowRun:
+        """Queue a run claimed from the store on the local worker pool."""
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", LangChainBetaWarning)
+            inputs = load(record["inputs"])
+        run = WorkflowRun(
+            inputs,
+            {**self.default_config, **(record.get("config") or {})},
+            dedup_key=record.get("dedup_key"),
+            idempotency_key=record.get("idempotency_key"),
+            tenant=record["tenant"],
+            detached=True,
+            run_id=record["run_id"],
+        )
+        run.callback_urls = list(record.get("callback_urls") or [])
+        run.created_at = record["created_at"]
+        run.event_log = StoredEventLog(self.store, run.run_id)
+        self._runs[run.run_id] = run
+        self._queue.put_nowait(run.tenant, run)
+        return run
+
+    def _active_runs(self) -> list[WorkflowRun]:
+        return [run for run in self._runs.values() if not run.is_finished]
+
+    async def serve(self, stop: asyncio.Event) -> None:
+        """
+        Claim runs while there is free local capacity, send heartbeats and
+        propagate cancellations until `stop` is set.
+        """
+        last_heartbeat = 0.0
+        while not stop.is_set():
+            # Claim only as many runs as can start right away, leaving the rest to other workers
+            while self._running + self._queue.qsize() < self.max_concurrency:
+                record = await asyncio.to_thread(self.store.claim, self.worker_id)
+                if record is None:
+                    break
+                logger.info(f"Worker {self.worker_id} claimed workflow run {record['run_id']}")
+                self.adopt(record)
+
+            if time.monotonic() - last_heartbeat >= self.heartbeat_interval:
+                last_heartbeat = time.monotonic()
+                active = self._active_runs()
+                stop = await asyncio.to_thread(self.store.heartbeat, [run.run_id for run in active], self.worker_id)
+                for run in active:
+                    if run.run_id not in stop:
+                        continue
+                    if stop[run.run_id] is None:
+                        # Requeued as stale; another worker owns it now, so neither the outcome nor webhooks are ours
+                        logger.warning(f"Worker {self.worker_id} lost workflow run {run.run_id}, stopping it")
+                        run.interrupted = True
+                        self.cancel(run, "Run was handed to another worker.")
+                    else:
+                        self.cancel(run, stop[run.run_id])
+                requeued = await asyncio.to_thread(self.store.requeue_stale, self.stale_timeout)
+                if requeued:
+                    logger.warning(f"Requeued {len(requeued)} runs of unresponsive workers: {requeued}")
+                self._prune()
+
+            try:
+                await asyncio.wait_for(stop.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _complete(self, run: WorkflowRun) -> None:
+        if not run.interrupted:
+            record = await asyncio.to_thread(self.store.get, run.run_id)
+            if record is not None:
+                # Front-ends may have attached more callback URLs since the run was claimed
+                run.callback_urls = list(record.get("callback_urls") or [])
+            result = jsonable_encoder(run.result) if run.result is not None else None
+            recorded = await asyncio.to_thread(
+                self.store.finish, run.run_id, run.status.value, result, run.error, self.worker_id
+            )
+            if not recorded:
+                logger.warning(f"Workflow run {run.run_id} was handed to another worker, dropping its outcome")
+                run.interrupted = True
+        await super()._complete(run)
+
+    def _write_checkpoint(self, runs: list[WorkflowRun]) -> None:
+        if runs:
+            self.store.requeue([run.run_id for run in runs], self.worker_id)
+            logger.info(f"Returned {len(runs)} unfinished workflow runs to the run store queue")
@@ -0,0 +1,182 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from pathlib import Path
+from typing import AsyncIterator, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+class RunEventLog:
+    """
+    Append-only, sequence-numbered event log of a single workflow run.
+
+    Every event is written as one JSON line with a `seq` field to a file on
+    disk, so readers can replay from any offset, follow the live tail, and
+    reconnect after a disconnect without re-running the workflow.
+
+    Args:
+        path (Path): Location of the JSONL file.
+        closed (bool): Open an existing, already completed log read-only.
+            An existing log opened for writing is appended to.
+    """
+
+    def __init__(self, path: Path, closed: bool = False):
+        self.path = path
+        self.closed = closed
+        # Byte offset of every line, so readers can seek straight to a sequence number
+        self._offsets: list[int] = []
+        # (event kind, node name) of every line, so filtered readers can skip lines without parsing them
+        self._index: list[tuple[Optional[str], Optional[str]]] = []
+        self._changed = asyncio.Condition()
+        if closed:
+            self._file = None
+            self._index_existing()
+        else:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            if self.path.exists():
+                # A run resumed after a restart continues its sequence numbers
+                self._index_existing()
+            self._file = open(self.path, "ab")
+            self._size = self._file.tell()
+
+    def __len__(self) -> int:
+        return len(self._offsets)
+
+    def _index_existing(self) -> None:
+        """
+        Index the complete lines of an existing log. A crash can leave the last
+        line partially written; it is skipped, and cut off when the log is
+        reopened for writing so new events start on a line of their own.
+        """
+        offset = 0
+        with open(self.path, "rb") as f:
+            for line in f:
+                try:
+                    if not line.endswith(b"\n"):
+                        raise ValueError("missing newline")
+                    entry = _index_entry(json.loads(line))
+                except ValueError as e:
+                    logger.warning(f"Ignoring the incomplete tail of event log {self.path} at byte {offset}: {e}")
+                    break
+                self._offsets.append(offset)
+                self._index.append(entry)
+                offset += len(line)
+            size = f.seek(0, os.SEEK_END)
+        if offset < size and not self.closed:
+            with open(self.path, "r+b") as f:
+                f.truncate(offset)
+
+    async def append(self, event: dict) -> int:
+        """
+        Appends an event and wakes up readers following the tail.
+
+        Returns:
+            int: The sequence number assigned to the event.
+        """
+        if self.closed:
+            raise RuntimeError(f"Event log {self.path} is closed")
+        seq = len(self._offsets)
+        line = (json.dumps({"seq": seq, **event}, ensure_ascii=False) + "\n").encode("utf-8")
+        self._file.write(line)
+        self._file.flush()
+        async with self._changed:
+            self._offsets.append(self._size)
+            self._index.append(_index_entry(event))
+            self._size += len(line)
+            self._changed.notify_all()
+        return seq
+
+    async def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        async with self._changed:
+            self.closed = True
+            self._changed.notify_all()
+
+    async def read_lines(
+        self,
+        start: int = 0,
+        match: Optional[Callable[[Optional[str], Optional[str]], bool]] = None,
+    ) -> AsyncIterator[tuple[int, bytes]]:
+        """
+        Yields `(seq, raw JSON line)` pairs starting at sequence number `start`,
+        then follows the live tail until the log is closed.
+
+        Args:
+            start (int): First sequence number to return.
+            match (Callable | None): Predicate on `(event kind, node name)`; lines
+                it rejects are skipped without being read or parsed.
+        """
+        seq = max(0, start)
+        with open(self.path, "rb") as f:
+            while True:
+                async with self._changed:
+                    while seq >= len(self._offsets) and not self.closed:
+                        await self._changed.wait()
+                    end = len(self._offsets)
+                if seq >= end:
+                    return
+                for current in range(seq, end):
+                    if match is not None and not match(*self._index[current]):
+                        continue
+                    f.seek(self._offsets[current])
+                    yield current, f.readline()
+                seq = end
+
+    async def read(self, start: int = 0) -> AsyncIterator[dict]:
+        """Same as `read_lines`, but yields parsed events."""
+        async for seq, line in self.read_lines(start):
+            try:
+                yield json.loads(line)
+            except ValueError:
+                # Only the tail of a log another process is still writing can be incomplete
+                logger.warning(f"Skipping unreadable event {seq} of {self.path}")
+
+def _index_entry(event: dict) -> tuple[Optional[str], Optional[str]]:
+    metadata = event.get("metadata") or {}
+    return event.get("event"), metadata.get("langgraph_node")
+
+class EventLogStore:
+    """
+    Creates and locates the per-run event logs under a single directory.
+
+    Args:
+        directory (str): Directory holding one `<run_id>.jsonl` file per run.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = Path(directory)
+
+    def _path(self, run_id: str) -> Path:
+        return self.directory / f"{run_id}.jsonl"
+
+    def create(self, run_id: str) -> RunEventLog:
+        return RunEventLog(self._path(run_id))
+
+    def open(self, run_id: str) -> Optional[RunEventLog]:
+        """Open the completed log of a run that is no longer held in memory."""
+        path = self._path(run_id)
+        if not path.exists():
+            return None
+        return RunEventLog(path, closed=True)
+
+    def delete(self, run_id: str) -> None:
+        try:
+            self._path(run_id).unlink(missing_ok=True)
+        except OSError as e:
+            logger.warning(f"Failed to delete event log for run {run_id}: {e}")
+
+    def prune(self, max_age: float) -> None:
+        """Delete logs that were last written more than `max_age` seconds ago."""
+        if not self.directory.exists():
+            return
+        cutoff = time.time() - max_age
+        for path in self.directory.glob("*.jsonl"):
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    path.unlink()
+            except OSError:
+                continue
@@ -0,0 +1,638 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+import uuid
+import warnings
+from pathlib import Path
+from typing import Any, AsyncIterator, Optional
+
+from fastapi.encoders import jsonable_encoder
+from langchain_core._api import LangChainBetaWarning
+from langchain_core.load import dumpd, load
+
+from ..constants.run_status import RunStatus
+from ..core.cancellation import CancelToken, set_current_token
+from ..core.deadline import Deadline, DeadlineExceeded, set_current_deadline
+from ..core.rate_limiter import set_current_lane
+from ..models.schemas import RunInfo
+from ..utils.event_utils import to_jsonable_event, is_root_end_event
+from .webhook_service import deliver_webhook
+from .admission_service import AdmissionRejected, FairRunQueue, estimate_retry_after
+from .event_log import EventLogStore, RunEventLog
+
+logger = logging.getLogger(__name__)
+
+def request_fingerprint(text: str, git_url: str) -> str:
+    """Identifies requests that would produce the same run so they can share it."""
+    raw = json.dumps({"input": text, "git_url": git_url}, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+class IdempotencyConflictError(ValueError):
+    """Raised when an idempotency key is reused for a different request."""
+
+class RunNotResumableError(ValueError):
+    """Raised when resuming a run that is still active or already succeeded."""
+
+class WorkflowRun:
+    """
+    In-process record of a single workflow run, its event stream and its eventual result.
+    """
+
+    def __init__(
+        self,
+        inputs: dict[str, Any],
+        config: Optional[dict[str, Any]] = None,
+        callback_url: Optional[str] = None,
+        dedup_key: Optional[str] = None,
+        idempotency_key: Optional[str] = None,
+        tenant: str = "default",
+        detached: bool = False,
+        run_id: Optional[str] = None,
+    ):
+        self.run_id = run_id or uuid.uuid4().hex
+        self.tenant = tenant
+        self.inputs = inputs
+        self.config = config or {}
+        self.callback_urls: list[str] = [callback_url] if callback_url else []
+        self.dedup_key = dedup_key
+        self.idempotency_key = idempotency_key
+        self.status = RunStatus.QUEUED
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.result: Optional[dict[str, Any]] = None
+        self.error: Optional[str] = None
+        # Sequence-numbered events emitted by the graph, shared by every subscriber
+        self.event_log: Optional[RunEventLog] = None
+        # Detached runs (job API, webhooks) keep running without connected clients;
+        # interactive runs are cancelled once their last subscriber is gone.
+        self.detached = detached or bool(callback_url)
+        self.subscribers = 0
+        self.cancel_token = CancelToken()
+        self._task: Optional[asyncio.Task] = None
+        # Set when a shutdown stops the run (it is checkpointed and resumed by the next process)
+        # or when another worker took the run over; either way its outcome is not recorded here
+        self.interrupted = False
+        self._done = asyncio.Event()
+
+    def reopen(self) -> None:
+        """Reset a finished run so it can be queued again under the same run id."""
+        self.status = RunStatus.QUEUED
+        self.started_at = None
+        self.finished_at = None
+        self.result = None
+        self.error = None
+        self.cancel_token = CancelToken()
+        self._task = None
+        self.interrupted = False
+        self._done = asyncio.Event()
+
+    @property
+    def is_finished(self) -> bool:
+        return self.status in RunStatus.terminal_states()
+
+    async def wait(self) -> None:
+        """Block until the run reaches a terminal state."""
+        await self._done.wait()
+
+    async def iter_events(self, start: int = 0) -> AsyncIterator[dict]:
+        """
+        Replays the events recorded from sequence number `start` and then
+        follows live events until the run finishes.
+        """
+        async for event in self.event_log.read(start):
+            yield event
+
+    async def _finish(self) -> None:
+        self.finished_at = time.time()
+        self._done.set()
+        # Closing the log lets subscribers following the tail observe the end of the run
+        await self.event_log.close()
+
+    def info(self) -> RunInfo:
+        return RunInfo(
+            run_id=self.run_id,
+            status=self.status.value,
+            created_at=self.created_at,
+            started_at=self.started_at,
+            finished_at=self.finished_at,
+            error=self.error,
+        )
+
+class WorkflowRunService:
+    """
+    Runs workflow graphs in the background on a bounded pool of asyncio workers.
+
+    Submitted runs are placed on a queue and picked up by at most
+    `max_concurrency` workers, so HTTP handlers can return a run id immediately
+    instead of holding the connection open for the whole pipeline.
+
+    Identical submissions are coalesced: while a run with the same `dedup_key`
+    is queued or running, new submissions attach to it instead of starting a
+    second run. An `idempotency_key` additionally pins a submission to its run
+    for as long as the run is retained, so client retries get the same run back.
+
+    Runs can be cancelled explicitly with `cancel`. Interactive runs are also
+    cancelled when their last connected client has been gone for
+    `disconnect_grace` seconds; the grace period lets clients reconnect and
+    resume the event stream. Cancellation stops the graph task and signals the
+    run's `CancelToken`, which kills shell commands and containers started by it.
+
+    New runs pass through admission control: they wait in a weighted fair queue
+    per tenant, and are rejected with `AdmissionRejected` when the tenant or the
+    whole queue is full.
+
+    On shutdown, `drain` stops admitting runs and gives running ones time to
+    finish. Runs that are still queued or running at the deadline are written to
+    `checkpoint_path` and queued again, under the same run ids, on the next `start`.
+
+    The run id doubles as the LangGraph `thread_id`. If the graph was compiled
+    with a checkpointer, a run that finds an unfinished checkpoint of its
+    thread continues from the last finished node instead of starting over;
+    `resume` queues failed, cancelled or timed-out runs again for exactly that.
+
+    A run gets `run_deadline` seconds from the moment it starts, or the
+    `deadline_seconds` of its `configurable` config. The graph splits it into
+    stage budgets; a run stopped by its deadline ends as `DEADLINE_EXCEEDED`,
+    keeping the state it reached as its partial result.
+
+    Args:
+        graph: The compiled LangGraph graph to execute.
+        max_concurrency (int): Number of runs allowed to execute at the same time.
+        run_ttl (float): Seconds a finished run is kept around for status/result lookups.
+        webhook_max_retries (int): Delivery retries for completion webhooks.
+        queue (FairRunQueue | None): Admission queue; a default unweighted one is used if omitted.
+        event_logs (EventLogStore | None): Where per-run event logs are written.
+        disconnect_grace (float): Seconds an interactive run survives without subscribers.
+        checkpoint_path (str | None): File unfinished runs are saved to on shutdown.
+        default_config (dict[str, Any] | None): RunnableConfig entries applied to every run,
+            e.g. callbacks, which cannot be checkpointed.
+        run_deadline (float | None): Default seconds a run may take once started; None for no limit.
+    """
+
+    def __init__(
+        self,
+        graph,
+        max_concurrency: int = 4,
+        run_ttl: float = 3600.0,
+        webhook_max_retries: int = 5,
+        queue: Optional[FairRunQueue] = None,
+        event_logs: Optional[EventLogStore] = None,
+        disconnect_grace: float = 30.0,
+        checkpoint_path: Optional[str] = None,
+        default_config: Optional[dict[str, Any]] = None,
+        run_deadline: Optional[float] = None,
+    ):
+        self.graph = graph
+        self.max_concurrency = max(1, max_concurrency)
+        self.run_ttl = run_ttl
+        self.webhook_max_retries = webhook_max_retries
+        self._runs: dict[str, WorkflowRun] = {}
+        self._inflight: dict[str, WorkflowRun] = {}
+        self._idempotency: dict[str, WorkflowRun] = {}
+        self._queue = queue or FairRunQueue()
+        self.event_logs = event_logs or EventLogStore("logs/runs")
+        self.disconnect_grace = disconnect_grace
+        self.checkpoint_path = Path(checkpoint_path) if checkpoint_path else None
+        self.default_config = default_config or {}
+        self.run_deadline = run_deadline
+        self._running = 0
+        # Moving average of run durations, used to estimate Retry-After
+        self._avg_run_seconds = 600.0
+        self._workers: list[asyncio.Task] = []
+        # Keep references to in-flight webhook deliveries so they are not garbage collected
+        self._deliveries: set[asyncio.Task] = set()
+        # Deletions of expired runs' event logs and checkpoints running off the event loop
+        self._cleanups: set[asyncio.Task] = set()
+
+    async def start(self) -> None:
+        """Spawn the worker tasks. Safe to call more than once."""
+        if self._workers:
+            return
+        # Logs and graph checkpoints of runs that expired while the process was down
+        self.event_logs.prune(self.run_ttl)
+        if hasattr(self._checkpointer, "prune"):
+            await asyncio.to_thread(self._checkpointer.prune, self.run_ttl)
+        self._restore_checkpoint()
+        for idx in range(self.max_concurrency):
+            self._workers.append(asyncio.create_task(self._worker(idx), name=f"workflow-worker-{idx}"))
+        logger.info(f"Started {self.max_concurrency} workflow workers")
+
+    async def stop(self) -> None:
+        """Cancel the worker tasks."""
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        # Give pending webhook deliveries a chance to finish
+        if self._deliveries:
+            await asyncio.gather(*self._deliveries, return_exceptions=True)
+
+    async def drain(self, timeout: float) -> None:
+        """
+        Stop admitting runs and wait up to `timeout` seconds for running runs to
+        finish. Queued runs and runs still going at the deadline are interrupted
+        and checkpointed so the next process picks them up again.
+        """
+        self._queue.closed = True
+        reason = "Run was interrupted by a server shutdown and will be resumed after restart."
+        queued = self._queue.drain()
+        for run in queued:
+            run.interrupted = True
+            run.status = RunStatus.CANCELLED
+            run.error = reason
+            await self._complete(run)
+
+        running = [run for run in self._runs.values() if run.status == RunStatus.RUNNING]
+        if running:
+            logger.info(f"Draining {len(running)} running workflow runs (timeout: {timeout}s)")
+            await asyncio.wait([asyncio.create_task(run.wait()) for run in running], timeout=timeout)
+        unfinished = [run for run in running if not run.is_finished]
+        for run in unfinished:
+            run.interrupted = True
+            self.cancel(run, reason)
+        if unfinished:
+            await asyncio.wait([asyncio.create_task(run.wait()) for run in unfinished], timeout=30)
+
+        self._write_checkpoint(queued + unfinished)
+        logger.info(
+            f"Drained workflow runs: {len(running) - len(unfinished)} finished, "
+            f"{len(unfinished)} interrupted, {len(queued)} queued runs checkpointed"
+        )
+
+    def _write_checkpoint(self, runs: list[WorkflowRun]) -> None:
+        if not runs or self.checkpoint_path is None:
+            return
+        records = [
+            {
+                "run_id": run.run_id,
+                "tenant": run.tenant,
+                "inputs": dumpd(run.inputs),
+                # Callbacks and other live objects come back from `default_config`
+                "config": {k: v for k, v in run.config.items() if k not in self.default_config},
+                "callback_urls": run.callback_urls,
+                "dedup_key": run.dedup_key,
+                "idempotency_key": run.idempotency_key,
+                "detached": run.detached,
+                "created_at": run.created_at,
+            }
+            for run in runs
+        ]
+        self.checkpoint_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.checkpoint_path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(records, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp_path, self.checkpoint_path)
+        logger.info(f"Checkpointed {len(records)} unfinished workflow runs to {self.checkpoint_path}")
+
+    def _restore_checkpoint(self) -> None:
+        """Queue the runs checkpointed by the previous process, bypassing the admission caps."""
+        if self.checkpoint_path is None or not self.checkpoint_path.exists():
+            return
+        try:
+            records = json.loads(self.checkpoint_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError) as e:
+            logger.error(f"Failed to read run checkpoint {self.checkpoint_path}: {e}")
+            return
+        for record in records:
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore", LangChainBetaWarning)
+                inputs = load(record["inputs"])
+            run = WorkflowRun(
+                inputs,
+                {**self.default_config, **record.get("config", {})},
+                dedup_key=record.get("dedup_key"),
+                idempotency_key=record.get("idempotency_key"),
+                tenant=record.get("tenant", "default"),
+                detached=record.get("detached", False),
+                run_id=record["run_id"],
+            )
+            run.callback_urls = record.get("callback_urls", [])
+            run.created_at = record.get("created_at", run.created_at)
+            run.event_log = self.event_logs.create(run.run_id)
+            self._runs[run.run_id] = run
+            if run.dedup_key:
+                self._inflight[run.dedup_key] = run
+            if run.idempotency_key:
+                self._idempotency[run.idempotency_key] = run
+            self._queue.put_nowait(run.tenant, run)
+        self.checkpoint_path.unlink(missing_ok=True)
+        logger.info(f"Resumed {len(records)} workflow runs from {self.checkpoint_path}")
+
+    def submit(
+        self,
+        inputs: dict[str, Any],
+        config: Optional[dict[str, Any]] = None,
+        callback_url: Optional[str] = None,
+        dedup_key: Optional[str] = None,
+        idempotency_key: Optional[str] = None,
+        tenant: str = "default",
+        detached: bool = False,
+    ) -> tuple[WorkflowRun, bool]:
+        """
+        Queue a new run of the graph, or attach to an equivalent existing run.
+
+        Args:
+            inputs (dict[str, Any]): The initial graph state.
+            config (dict[str, Any] | None): RunnableConfig passed to the graph.
+            callback_url (str | None): URL to POST the outcome to once the run finishes.
+            dedup_key (str | None): Fingerprint of the request; concurrent submissions
+                with the same fingerprint share one run.
+            idempotency_key (str | None): Client-supplied key; retries with the same key
+                return the same run for as long as it is retained.
+            tenant (str): Tenant the run is accounted to for fair scheduling.
+            detached (bool): Keep the run going even when no client is connected.
+
+        Returns:
+            tuple[WorkflowRun, bool]: The run and whether a new run was created.
+
+        Raises:
+            IdempotencyConflictError: If the idempotency key was used for a different request.
+            AdmissionRejected: If the run cannot be queued right now.
+        """
+        self._prune()
+
+        existing = None
+        if idempotency_key and idempotency_key in self._idempotency:
+            existing = self._idempotency[idempotency_key]
+            if dedup_key and existing.dedup_key and existing.dedup_key != dedup_key:
+                raise IdempotencyConflictError(
+                    f"Idempotency key {idempotency_key!r} was already used for a different request"
+                )
+        elif dedup_key and dedup_key in self._inflight:
+            existing = self._inflight[dedup_key]
+
+        if existing is not None:
+            logger.info(f"Attaching submission to existing workflow run {existing.run_id}")
+            if idempotency_key:
+                self._idempotency.setdefault(idempotency_key, existing)
+            if detached or callback_url:
+                existing.detached = True
+            if callback_url and callback_url not in existing.callback_urls:
+                existing.callback_urls.append(callback_url)
+                if existing.is_finished:
+                    self._schedule_webhook(existing, callback_url)
+            return existing, False
+
+        self._admit(tenant)
+        run = WorkflowRun(
+            inputs,
+            {**self.default_config, **(config or {})},
+            callback_url=callback_url,
+            dedup_key=dedup_key,
+            idempotency_key=idempotency_key,
+            tenant=tenant,
+            detached=detached,
+        )
+        run.event_log = self.event_logs.create(run.run_id)
+        self._runs[run.run_id] = run
+        if dedup_key:
+            self._inflight[dedup_key] = run
+        if idempotency_key:
+            self._idempotency[idempotency_key] = run
+        self._queue.put_nowait(tenant, run)
+        logger.info(f"Queued workflow run {run.run_id} for tenant {tenant!r} (queue size: {self._queue.qsize()})")
+        return run, True
+
+    def _admit(self, tenant: str) -> None:
+        reason = self._queue.rejection_reason(tenant)
+        if reason:
+            retry_after = estimate_retry_after(self._queue.qsize(), self.max_concurrency, self._avg_run_seconds)
+            logger.warning(f"Rejected workflow run for tenant {tenant!r}: {reason}")
+            raise AdmissionRejected(reason, retry_after, status_code=503 if self._queue.closed else 429)
+
+    @property
+    def _checkpointer(self):
+        return getattr(self.graph, "checkpointer", None)
+
+    async def _pending_nodes(self, run_id: str) -> tuple[str, ...]:
+        """Nodes the latest graph checkpoint of a run would execute next; empty if there is none."""
+        if not self._checkpointer:
+            return ()
+        snapshot = await self.graph.aget_state({"configurable": {"thread_id": run_id}})
+        return snapshot.next
+
+    async def _checkpointed_state(self, run_id: str) -> Optional[dict[str, Any]]:
+        """State of a run as of its latest graph checkpoint."""
+        if not self._checkpointer:
+            return None
+        snapshot = await self.graph.aget_state({"configurable": {"thread_id": run_id}})
+        return snapshot.values or None
+
+    async def resume(self, run_id: str, tenant: str = "default") -> Optional[WorkflowRun]:
+        """
+        Queue a failed, cancelled or timed-out run again under the same run id. With a graph
+        checkpointer it continues from the last node that finished; the nodes
+        before it are not executed again. Runs no longer held in memory, e.g.
+        after a restart, are resumed from their checkpoint alone.
+
+        Args:
+            run_id (str): The run to resume.
+            tenant (str): Tenant a run that is no longer in memory is accounted to.
+
+        Returns:
+            WorkflowRun | None: The queued run, or None if neither the run nor a checkpoint of it exists.
+
+        Raises:
+            RunNotResumableError: If the run is still active or already succeeded.
+            AdmissionRejected: If the run cannot be queued right now.
+        """
+        run = self._runs.get(run_id)
+        if run is not None and (not run.is_finished or run.status == RunStatus.SUCCEEDED):
+            raise RunNotResumableError(f"Run {run_id} is {run.status.value}")
+        if run is None and not await self._pending_nodes(run_id):
+            return None
+
+        self._admit(run.tenant if run else tenant)
+        if run is None:
+            # The original inputs are gone, but the checkpoint holds the whole state
+            run = WorkflowRun(None, dict(self.default_config), tenant=tenant, detached=True, run_id=run_id)
+            self._runs[run_id] = run
+        else:
+            run.reopen()
+        if run.dedup_key:
+            self._inflight.setdefault(run.dedup_key, run)
+        # Continues the sequence numbers of the existing log
+        run.event_log = self.event_logs.create(run_id)
+        self._queue.put_nowait(run.tenant, run)
+        logger.info(f"Queued workflow run {run_id} for resumption")
+        return run
+
+    def get(self, run_id: str) -> Optional[WorkflowRun]:
+        return self._runs.get(run_id)
+
+    def get_event_log(self, run_id: str) -> Optional[RunEventLog]:
+        """Event log of a run, falling back to logs left on disk by earlier processes."""
+        run = self._runs.get(run_id)
+        if run is not None:
+            return run.event_log
+        return self.event_logs.open(run_id)
+
+    def cancel(self, run: WorkflowRun, reason: str = "Run was cancelled.") -> bool:
+        """
+        Cancel a queued or running run. Returns False if it had already finished.
+        """
+        if run.is_finished:
+            return False
+        logger.info(f"Cancelling workflow run {run.run_id}: {reason}")
+        run.cancel_token.cancel(reason)
+        if run._task is not None:
+            run._task.cancel()
+        elif self._queue.discard(run.tenant, run):
+            # Never started, so finish it here instead of in a worker
+            run.status = RunStatus.CANCELLED
+            run.error = reason
+            task = asyncio.create_task(self._complete(run))
+            self._deliveries.add(task)
+            task.add_done_callback(self._deliveries.discard)
+        return True
+
+    def subscribe(self, run: WorkflowRun) -> None:
+        """Register a connected client (a waiting or streaming request) of the run."""
+        run.subscribers += 1
+
+    def unsubscribe(self, run: WorkflowRun) -> None:
+        """
+        Unregister a client. Interactive runs left without clients are cancelled
+        after `disconnect_grace` seconds unless someone subscribes again.
+        """
+        run.subscribers = max(0, run.subscribers - 1)
+        if run.subscribers or run.detached or run.is_finished:
+            return
+        asyncio.get_running_loop().call_later(self.disconnect_grace, self._cancel_if_abandoned, run)
+
+    def _cancel_if_abandoned(self, run: WorkflowRun) -> None:
+        if run.subscribers == 0 and not run.detached and not run.is_finished:
+            self.cancel(run, "Run was cancelled because all clients disconnected.")
+
+    def stats(self) -> dict:
+        return {
+            **self._queue.stats(),
+            "running": self._running,
+            "max_concurrency": self.max_concurrency,
+            "avg_run_seconds": round(self._avg_run_seconds, 1),
+        }
+
+    async def _worker(self, idx: int) -> None:
+        while True:
+            run = await self._queue.get()
+            self._running += 1
+            try:
+                await self._execute(run)
+            finally:
+                self._running -= 1
+
+    async def _stream_graph(self, run: WorkflowRun) -> None:
+        # Blocking work started by this run (threads, tools, containers) finds its token here
+        set_current_token(run.cancel_token)
+        configurable = run.config.get("configurable", {})
+        # Nodes, tools and threads clamp their timeouts to this deadline
+        set_current_deadline(Deadline.after(configurable.get("deadline_seconds") or self.run_deadline))
+        # Bedrock calls of the run queue in this priority lane of the shared rate limiter
+        set_current_lane(configurable.get("priority"))
+        # Nodes that share results between runs (the semantic cache) keep them per tenant
+        config = {**run.config, "configurable": {**configurable, "thread_id": run.run_id, "tenant": run.tenant}}
+        inputs = run.inputs
+        pending = await self._pending_nodes(run.run_id)
+        if pending:
+            # A `None` input makes LangGraph continue from the checkpoint instead of starting over
+            logger.info(f"Workflow run {run.run_id} resumes from its checkpoint at {', '.join(pending)}")
+            inputs = None
+        # Every run is executed through the event API so that streaming
+        # subscribers and plain result waiters can share the same execution.
+        # Only the v2 schema reports the full final state on the root end event.
+        async for event in self.graph.astream_events(inputs, config=config, version="v2"):
+            if is_root_end_event(event):
+                run.result = event.get("data", {}).get("output")
+            await run.event_log.append(to_jsonable_event(event))
+
+    async def _execute(self, run: WorkflowRun) -> None:
+        run.status = RunStatus.RUNNING
+        run.started_at = time.time()
+        logger.info(f"Workflow run {run.run_id} started")
+        # The graph runs in its own task so a single run can be cancelled without stopping the worker
+        run._task = asyncio.create_task(self._stream_graph(run), name=f"workflow-run-{run.run_id}")
+        try:
+            await run._task
+            run.status = RunStatus.SUCCEEDED
+        except DeadlineExceeded as e:
+            logger.warning(f"Workflow run {run.run_id} stopped at its deadline: {e}")
+            run.error = str(e)
+            run.status = RunStatus.DEADLINE_EXCEEDED
+            # Whatever the finished stages produced is still worth returning
+            run.result = await self._checkpointed_state(run.run_id)
+        except asyncio.CancelledError:
+            if asyncio.current_task().cancelling():
+                # The worker itself is being stopped
+                run.cancel_token.cancel("Run was cancelled.")
+                run._task.cancel()
+                run.error = "Run was cancelled."
+                run.status = RunStatus.FAILED
+                raise
+            run.error = run.cancel_token.reason or "Run was cancelled."
+            run.status = RunStatus.CANCELLED
+        except Exception as e:
+            if run.cancel_token.cancelled:
+                # Blocking work noticed the cancellation before the task was cancelled
+                run.error = run.cancel_token.reason
+                run.status = RunStatus.CANCELLED
+            else:
+                logger.exception(f"Workflow run {run.run_id} failed")
+                run.error = str(e)
+                run.status = RunStatus.FAILED
+        finally:
+            await self._complete(run)
+            if not run.interrupted:
+                self._avg_run_seconds = 0.8 * self._avg_run_seconds + 0.2 * (run.finished_at - run.started_at)
+
+    async def _complete(self, run: WorkflowRun) -> None:
+        if run.dedup_key and self._inflight.get(run.dedup_key) is run:
+            del self._inflight[run.dedup_key]
+        await run._finish()
+        logger.info(f"Workflow run {run.run_id} finished with status {run.status.value}")
+        if run.interrupted:
+            # The run is resumed after the restart; its callbacks fire when it really finishes
+            return
+        for url in run.callback_urls:
+            self._schedule_webhook(run, url)
+
+    def _schedule_webhook(self, run: WorkflowRun, url: str) -> None:
+        """Deliver the run outcome to a callback URL without blocking the worker."""
+        payload = {
+            **run.info().model_dump(),
+            "response": jsonable_encoder(run.result) if run.result is not None else None,
+        }
+        task = asyncio.create_task(
+            deliver_webhook(url, payload, max_retries=self.webhook_max_retries)
+        )
+        self._deliveries.add(task)
+        task.add_done_callback(self._deliveries.discard)
+
+    def _prune(self) -> None:
+        """Drop finished runs older than `run_ttl`."""
+        now = time.time()
+        expired = [
+            run for run in self._runs.values()
+            if run.is_finished and run.finished_at and now - run.finished_at > self.run_ttl
+        ]
+        for run in expired:
+            del self._runs[run.run_id]
+            if run.idempotency_key and self._idempotency.get(run.idempotency_key) is run:
+                del self._idempotency[run.idempotency_key]
+        if expired:
+            # File and SQLite deletes block, and pruning runs on the request path of `submit`
+            task = asyncio.create_task(asyncio.to_thread(self._delete_run_data, [run.run_id for run in expired]))
+            self._cleanups.add(task)
+            task.add_done_callback(self._cleanups.discard)
+
+    def _delete_run_data(self, run_ids: list[str]) -> None:
+        """Delete the event logs and graph checkpoints of pruned runs."""
+        for run_id in run_ids:
+            self.event_logs.delete(run_id)
+            if hasattr(self._checkpointer, "delete_thread"):
+                try:
+                    self._checkpointer.delete_thread(run_id)
+                except Exception as e:
+                    logger.warning(f"Failed to delete the checkpoints of run {run_id}: {e}")
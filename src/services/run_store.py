@@ -0,0 +1,751 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Any, Optional
+
+from ..constants.run_status import RunStatus
+
+try:
+    import redis
+except ImportError:  # optional dependency, see the `redis` extra
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+# Columns every run record has; everything else is kept in the JSON `data` blob
+RECORD_FIELDS = (
+    "run_id", "tenant", "status", "created_at", "started_at", "finished_at", "worker_id",
+    "heartbeat_at", "dedup_key", "idempotency_key", "cancel_reason", "error",
+)
+# Fields of the JSON blob
+DATA_FIELDS = ("inputs", "config", "callback_urls", "detached", "result")
+
+class RunStore(ABC):
+    """
+    Shared state of workflow runs for API front-ends and worker processes.
+
+    A front-end creates queued run records and reads their status and events;
+    workers on any host claim queued runs, report heartbeats and events, and
+    record the outcome. Records are plain dicts with the keys in
+    `RECORD_FIELDS` and `DATA_FIELDS`; `inputs` are LangChain-serialized
+    (`dumpd`) and `result` is JSON-encoded.
+
+    All methods are blocking; async callers run them with `asyncio.to_thread`.
+    """
+
+    @abstractmethod
+    def create(self, record: dict) -> None:
+        """Store a new queued run."""
+
+    @abstractmethod
+    def get(self, run_id: str) -> Optional[dict]:
+        ...
+
+    @abstractmethod
+    def find(self, dedup_key: Optional[str] = None, idempotency_key: Optional[str] = None) -> Optional[dict]:
+        """
+        The run an idempotency key is pinned to, or else the queued/running run
+        with the same dedup key.
+        """
+
+    @abstractmethod
+    def attach(self, run_id: str, callback_url: Optional[str], detached: bool) -> None:
+        """Register another submission of an existing run."""
+
+    @abstractmethod
+    def claim(self, worker_id: str) -> Optional[dict]:
+        """Atomically move the next queued run to running and assign it to `worker_id`."""
+
+    @abstractmethod
+    def heartbeat(self, run_ids: list[str], worker_id: str) -> dict[str, Optional[str]]:
+        """
+        Mark the runs `worker_id` still owns as alive. Returns the runs the
+        worker must stop: `{run_id: reason}` for the ones that were asked to be
+        cancelled, and `{run_id: None}` for the ones it no longer owns (they were
+        requeued as stale and may already run on another worker).
+        """
+
+    @abstractmethod
+    def finish(self, run_id: str, status: str, result: Any, error: Optional[str], worker_id: Optional[str] = None) -> bool:
+        """
+        Record the outcome of a run. With `worker_id`, only if that worker still
+        owns the run; returns whether the outcome was recorded.
+        """
+
+    @abstractmethod
+    def requeue(self, run_ids: list[str], worker_id: Optional[str] = None) -> None:
+        """
+        Put running runs a worker could not finish (e.g. on shutdown) back on the
+        queue; with `worker_id`, only the ones that worker still owns.
+        """
+
+    @abstractmethod
+    def reopen(self, run_id: str) -> bool:
+        """
+        Queue a failed, cancelled or timed-out run again under the same run id, so
+        a worker resumes it. Returns False if the run is unknown, active or succeeded.
+        """
+
+    @abstractmethod
+    def requeue_stale(self, timeout: float) -> list[str]:
+        """Requeue running runs whose worker has not sent a heartbeat for `timeout` seconds."""
+
+    @abstractmethod
+    def request_cancel(self, run_id: str, reason: str) -> bool:
+        """
+        Ask for a run to be cancelled. Queued runs are cancelled right away,
+        running ones by their worker on its next heartbeat. Returns False if the
+        run had already finished.
+        """
+
+    @abstractmethod
+    def append_event(self, run_id: str, event: dict) -> int:
+        """Append an event to the run's log and return its sequence number."""
+
+    @abstractmethod
+    def read_events(self, run_id: str, start: int, limit: int = 500) -> list[tuple[int, Optional[str], Optional[str], bytes]]:
+        """`(seq, event kind, node name, raw JSON line)` of the events from `start` on."""
+
+    @abstractmethod
+    def stats(self) -> dict:
+        ...
+
+    @abstractmethod
+    def prune(self, max_age: float) -> None:
+        """Delete finished runs and their events older than `max_age` seconds."""
+
+def _event_line(seq: int, event: dict) -> bytes:
+    return (json.dumps({"seq": seq, **event}, ensure_ascii=False) + "\n").encode("utf-8")
+
+def _event_index(event: dict) -> tuple[Optional[str], Optional[str]]:
+    metadata = event.get("metadata") or {}
+    return event.get("event"), metadata.get("langgraph_node")
+
+_ACTIVE = (RunStatus.QUEUED.value, RunStatus.RUNNING.value)
+
+class SQLiteRunStore(RunStore):
+    """
+    Run store in a SQLite database file.
+
+    Lets several API and worker processes on one host (or on hosts sharing the
+    file over a filesystem with working locks) coordinate through WAL mode and
+    short `BEGIN IMMEDIATE` transactions.
+
+    Args:
+        path (str): Database file.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._local = threading.local()
+        self._connection().executescript(
+            """
+            CREATE TABLE IF NOT EXISTS runs (
+                run_id TEXT PRIMARY KEY,
+                tenant TEXT NOT NULL,
+                status TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                started_at REAL,
+                finished_at REAL,
+                worker_id TEXT,
+                heartbeat_at REAL,
+                dedup_key TEXT,
+                idempotency_key TEXT,
+                cancel_reason TEXT,
+                error TEXT,
+                data TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS runs_status ON runs (status, created_at);
+            CREATE INDEX IF NOT EXISTS runs_dedup ON runs (dedup_key);
+            CREATE INDEX IF NOT EXISTS runs_idempotency ON runs (idempotency_key);
+            CREATE TABLE IF NOT EXISTS run_events (
+                run_id TEXT NOT NULL,
+                seq INTEGER NOT NULL,
+                kind TEXT,
+                node TEXT,
+                line BLOB NOT NULL,
+                PRIMARY KEY (run_id, seq)
+            );
+            """
+        )
+
+    def _connection(self) -> sqlite3.Connection:
+        # sqlite3 connections must not be shared across threads
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            db.row_factory = sqlite3.Row
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    @contextmanager
+    def _transaction(self):
+        db = self._connection()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            yield db
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        db.execute("COMMIT")
+
+    @staticmethod
+    def _to_record(row: Optional[sqlite3.Row]) -> Optional[dict]:
+        if row is None:
+            return None
+        record = {field: row[field] for field in RECORD_FIELDS}
+        record.update(json.loads(row["data"]))
+        return record
+
+    def create(self, record: dict) -> None:
+        data = json.dumps({field: record.get(field) for field in DATA_FIELDS}, ensure_ascii=False)
+        with self._transaction() as db:
+            db.execute(
+                f"INSERT INTO runs ({', '.join(RECORD_FIELDS)}, data) VALUES ({', '.join('?' * (len(RECORD_FIELDS) + 1))})",
+                [record.get(field) for field in RECORD_FIELDS] + [data],
+            )
+
+    def get(self, run_id: str) -> Optional[dict]:
+        row = self._connection().execute("SELECT * FROM runs WHERE run_id = ?", (run_id,)).fetchone()
+        return self._to_record(row)
+
+    def find(self, dedup_key: Optional[str] = None, idempotency_key: Optional[str] = None) -> Optional[dict]:
+        db = self._connection()
+        if idempotency_key:
+            row = db.execute(
+                "SELECT * FROM runs WHERE idempotency_key = ? ORDER BY created_at DESC LIMIT 1", (idempotency_key,)
+            ).fetchone()
+            if row is not None:
+                return self._to_record(row)
+        if dedup_key:
+            row = db.execute(
+                "SELECT * FROM runs WHERE dedup_key = ? AND status IN (?, ?) ORDER BY created_at LIMIT 1",
+                (dedup_key, *_ACTIVE),
+            ).fetchone()
+            return self._to_record(row)
+        return None
+
+    def _update_data(self, db: sqlite3.Connection, run_id: str, **fields) -> None:
+        row = db.execute("SELECT data FROM runs WHERE run_id = ?", (run_id,)).fetchone()
+        if row is None:
+            return
+        data = json.loads(row["data"])
+        data.update(fields)
+        db.execute("UPDATE runs SET data = ? WHERE run_id = ?", (json.dumps(data, ensure_ascii=False), run_id))
+
+    def attach(self, run_id: str, callback_url: Optional[str], detached: bool) -> None:
+        with self._transaction() as db:
+            row = db.execute("SELECT data FROM runs WHERE run_id = ?", (run_id,)).fetchone()
+            if row is None:
+                return
+            data = json.loads(row["data"])
+            if callback_url and callback_url not in data["callback_urls"]:
+                data["callback_urls"].append(callback_url)
+            data["detached"] = data["detached"] or detached or bool(callback_url)
+            db.execute("UPDATE runs SET data = ? WHERE run_id = ?", (json.dumps(data, ensure_ascii=False), run_id))
+
+    def claim(self, worker_id: str) -> Optional[dict]:
+        now = time.time()
+        with self._transaction() as db:
+            # Tenants with the fewest running runs go first, so one tenant's burst cannot starve the others
+            row = db.execute(
+                """
+                SELECT * FROM runs AS r WHERE r.status = ?
+                ORDER BY (SELECT COUNT(*) FROM runs AS x WHERE x.tenant = r.tenant AND x.status = ?), r.created_at
+                LIMIT 1
+                """,
+                (RunStatus.QUEUED.value, RunStatus.RUNNING.value),
+            ).fetchone()
+            if row is None:
+                return None
+            db.execute(
+                "UPDATE runs SET status = ?, worker_id = ?, started_at = ?, heartbeat_at = ? WHERE run_id = ?",
+                (RunStatus.RUNNING.value, worker_id, now, now, row["run_id"]),
+            )
+            record = self._to_record(row)
+        record.update(status=RunStatus.RUNNING.value, worker_id=worker_id, started_at=now, heartbeat_at=now)
+        return record
+
+    def heartbeat(self, run_ids: list[str], worker_id: str) -> dict[str, Optional[str]]:
+        if not run_ids:
+            return {}
+        marks = ", ".join("?" * len(run_ids))
+        with self._transaction() as db:
+            db.execute(
+                f"UPDATE runs SET heartbeat_at = ? WHERE worker_id = ? AND status = ? AND run_id IN ({marks})",
+                (time.time(), worker_id, RunStatus.RUNNING.value, *run_ids),
+            )
+            rows = db.execute(
+                f"SELECT run_id, status, worker_id, cancel_reason FROM runs WHERE run_id IN ({marks})", run_ids
+            ).fetchall()
+        owned = {row["run_id"]: row for row in rows if row["worker_id"] == worker_id and row["status"] == RunStatus.RUNNING.value}
+        stop: dict[str, Optional[str]] = {run_id: None for run_id in run_ids if run_id not in owned}
+        stop.update({run_id: row["cancel_reason"] for run_id, row in owned.items() if row["cancel_reason"] is not None})
+        return stop
+
+    def finish(self, run_id: str, status: str, result: Any, error: Optional[str], worker_id: Optional[str] = None) -> bool:
+        fence, params = ("", ()) if worker_id is None else (" AND worker_id = ? AND status = ?", (worker_id, RunStatus.RUNNING.value))
+        with self._transaction() as db:
+            updated = db.execute(
+                f"UPDATE runs SET status = ?, error = ?, finished_at = ? WHERE run_id = ?{fence}",
+                (status, error, time.time(), run_id, *params),
+            ).rowcount
+            if updated:
+                self._update_data(db, run_id, result=result)
+        return bool(updated)
+
+    def requeue(self, run_ids: list[str], worker_id: Optional[str] = None) -> None:
+        if not run_ids:
+            return
+        fence, params = ("", ()) if worker_id is None else (" AND worker_id = ?", (worker_id,))
+        with self._transaction() as db:
+            db.execute(
+                "UPDATE runs SET status = ?, worker_id = NULL, heartbeat_at = NULL "
+                f"WHERE status = ? AND run_id IN ({', '.join('?' * len(run_ids))}){fence}",
+                (RunStatus.QUEUED.value, RunStatus.RUNNING.value, *run_ids, *params),
+            )
+
+    def reopen(self, run_id: str) -> bool:
+        resumable = sorted(status.value for status in RunStatus.resumable_states())
+        with self._transaction() as db:
+            updated = db.execute(
+                "UPDATE runs SET status = ?, started_at = NULL, finished_at = NULL, worker_id = NULL, "
+                "heartbeat_at = NULL, cancel_reason = NULL, error = NULL "
+                f"WHERE run_id = ? AND status IN ({', '.join('?' * len(resumable))})",
+                (RunStatus.QUEUED.value, run_id, *resumable),
+            ).rowcount
+            if updated:
+                self._update_data(db, run_id, result=None)
+        return bool(updated)
+
+    def requeue_stale(self, timeout: float) -> list[str]:
+        with self._transaction() as db:
+            rows = db.execute(
+                "SELECT run_id FROM runs WHERE status = ? AND heartbeat_at < ?",
+                (RunStatus.RUNNING.value, time.time() - timeout),
+            ).fetchall()
+            run_ids = [row["run_id"] for row in rows]
+            if run_ids:
+                db.execute(
+                    f"UPDATE runs SET status = ?, worker_id = NULL, heartbeat_at = NULL WHERE run_id IN ({', '.join('?' * len(run_ids))})",
+                    (RunStatus.QUEUED.value, *run_ids),
+                )
+        return run_ids
+
+    def request_cancel(self, run_id: str, reason: str) -> bool:
+        with self._transaction() as db:
+            row = db.execute("SELECT status FROM runs WHERE run_id = ?", (run_id,)).fetchone()
+            if row is None or row["status"] not in _ACTIVE:
+                return False
+            if row["status"] == RunStatus.QUEUED.value:
+                db.execute(
+                    "UPDATE runs SET status = ?, error = ?, cancel_reason = ?, finished_at = ? WHERE run_id = ?",
+                    (RunStatus.CANCELLED.value, reason, reason, time.time(), run_id),
+                )
+            else:
+                db.execute("UPDATE runs SET cancel_reason = ? WHERE run_id = ?", (reason, run_id))
+        return True
+
+    def append_event(self, run_id: str, event: dict) -> int:
+        kind, node = _event_index(event)
+        with self._transaction() as db:
+            seq = db.execute("SELECT COALESCE(MAX(seq) + 1, 0) FROM run_events WHERE run_id = ?", (run_id,)).fetchone()[0]
+            db.execute(
+                "INSERT INTO run_events (run_id, seq, kind, node, line) VALUES (?, ?, ?, ?, ?)",
+                (run_id, seq, kind, node, _event_line(seq, event)),
+            )
+        return seq
+
+    def read_events(self, run_id: str, start: int, limit: int = 500) -> list[tuple[int, Optional[str], Optional[str], bytes]]:
+        rows = self._connection().execute(
+            "SELECT seq, kind, node, line FROM run_events WHERE run_id = ? AND seq >= ? ORDER BY seq LIMIT ?",
+            (run_id, start, limit),
+        ).fetchall()
+        return [(row["seq"], row["kind"], row["node"], bytes(row["line"])) for row in rows]
+
+    def stats(self) -> dict:
+        db = self._connection()
+        by_status = {row[0]: row[1] for row in db.execute("SELECT status, COUNT(*) FROM runs GROUP BY status")}
+        per_tenant = {
+            row[0]: row[1]
+            for row in db.execute("SELECT tenant, COUNT(*) FROM runs WHERE status = ? GROUP BY tenant", (RunStatus.QUEUED.value,))
+        }
+        workers = [row[0] for row in db.execute("SELECT DISTINCT worker_id FROM runs WHERE status = ?", (RunStatus.RUNNING.value,))]
+        return {
+            "queued": by_status.get(RunStatus.QUEUED.value, 0),
+            "queued_per_tenant": per_tenant,
+            "running": by_status.get(RunStatus.RUNNING.value, 0),
+            "busy_workers": workers,
+        }
+
+    def prune(self, max_age: float) -> None:
+        cutoff = time.time() - max_age
+        with self._transaction() as db:
+            db.execute(
+                "DELETE FROM run_events WHERE run_id IN (SELECT run_id FROM runs WHERE finished_at < ?)", (cutoff,)
+            )
+            db.execute("DELETE FROM runs WHERE finished_at < ?", (cutoff,))
+
+# Lua scripts of `RedisRunStore`. Each runs atomically on the server, so claiming,
+# finishing, requeueing and cancelling a run cannot interleave. ARGV[1] is the
+# key prefix; empty strings stand for None.
+_CLAIM_SCRIPT = """
+local prefix, worker_id, now, running = ARGV[1], ARGV[2], ARGV[3], ARGV[4]
+local best, best_tenant, best_load, best_score
+for _, tenant in ipairs(redis.call('SMEMBERS', prefix .. ':tenants')) do
+    local head = redis.call('ZRANGE', prefix .. ':queued:' .. tenant, 0, 0, 'WITHSCORES')
+    if #head == 0 then
+        redis.call('SREM', prefix .. ':tenants', tenant)
+    else
+        -- Tenants with the fewest running runs go first, then the oldest run
+        local load = redis.call('SCARD', prefix .. ':running:' .. tenant)
+        local score = tonumber(head[2])
+        if best == nil or load < best_load or (load == best_load and score < best_score) then
+            best, best_tenant, best_load, best_score = head[1], tenant, load, score
+        end
+    end
+end
+if best == nil then
+    return false
+end
+redis.call('ZREM', prefix .. ':queued:' .. best_tenant, best)
+redis.call('SADD', prefix .. ':running:' .. best_tenant, best)
+redis.call('ZADD', prefix .. ':running', now, best)
+redis.call('HSET', prefix .. ':run:' .. best, 'status', running, 'worker_id', worker_id, 'started_at', now, 'heartbeat_at', now)
+return best
+"""
+
+_HEARTBEAT_SCRIPT = """
+local prefix, worker_id, now, running = ARGV[1], ARGV[2], ARGV[3], ARGV[4]
+local stop = {}
+for i = 5, #ARGV do
+    local run_id = ARGV[i]
+    local key = prefix .. ':run:' .. run_id
+    local fields = redis.call('HMGET', key, 'status', 'worker_id', 'cancel_reason')
+    if fields[1] ~= running or fields[2] ~= worker_id then
+        table.insert(stop, run_id)
+        table.insert(stop, '')
+    else
+        redis.call('HSET', key, 'heartbeat_at', now)
+        redis.call('ZADD', prefix .. ':running', now, run_id)
+        if fields[3] and fields[3] ~= '' then
+            table.insert(stop, run_id)
+            table.insert(stop, fields[3])
+        end
+    end
+end
+return stop
+"""
+
+_FINISH_SCRIPT = """
+local prefix, run_id, worker_id, running = ARGV[1], ARGV[2], ARGV[3], ARGV[4]
+local key = prefix .. ':run:' .. run_id
+local fields = redis.call('HMGET', key, 'status', 'worker_id', 'tenant')
+if not fields[3] then
+    return 0
+end
+if worker_id ~= '' and (fields[1] ~= running or fields[2] ~= worker_id) then
+    return 0
+end
+redis.call('HSET', key, 'status', ARGV[5], 'error', ARGV[6], 'finished_at', ARGV[7], 'result', ARGV[8])
+redis.call('ZREM', prefix .. ':running', run_id)
+redis.call('SREM', prefix .. ':running:' .. fields[3], run_id)
+redis.call('ZREM', prefix .. ':queued:' .. fields[3], run_id)
+return 1
+"""
+
+_REQUEUE_SCRIPT = """
+local prefix, worker_id, cutoff, running, queued = ARGV[1], ARGV[2], ARGV[3], ARGV[4], ARGV[5]
+local requeued = {}
+for i = 6, #ARGV do
+    local run_id = ARGV[i]
+    local key = prefix .. ':run:' .. run_id
+    local fields = redis.call('HMGET', key, 'status', 'worker_id', 'tenant', 'created_at', 'heartbeat_at')
+    local owned = fields[1] == running and (worker_id == '' or fields[2] == worker_id)
+    -- A heartbeat that arrived after the caller listed the run keeps it alive
+    local stale = cutoff == '' or tonumber(fields[5] or '') == nil or tonumber(fields[5]) < tonumber(cutoff)
+    if owned and stale then
+        redis.call('HSET', key, 'status', queued, 'worker_id', '', 'heartbeat_at', '')
+        redis.call('ZREM', prefix .. ':running', run_id)
+        redis.call('SREM', prefix .. ':running:' .. fields[3], run_id)
+        redis.call('ZADD', prefix .. ':queued:' .. fields[3], fields[4], run_id)
+        redis.call('SADD', prefix .. ':tenants', fields[3])
+        table.insert(requeued, run_id)
+    end
+end
+return requeued
+"""
+
+_REOPEN_SCRIPT = """
+local prefix, run_id, queued = ARGV[1], ARGV[2], ARGV[3]
+local key = prefix .. ':run:' .. run_id
+local fields = redis.call('HMGET', key, 'status', 'tenant', 'created_at')
+-- ARGV[4..] are the statuses a run can be resumed from
+local resumable = false
+for i = 4, #ARGV do
+    if fields[1] == ARGV[i] then
+        resumable = true
+    end
+end
+if not resumable then
+    return 0
+end
+redis.call(
+    'HSET', key, 'status', queued, 'started_at', '', 'finished_at', '', 'worker_id', '',
+    'heartbeat_at', '', 'cancel_reason', '', 'error', '', 'result', 'null'
+)
+redis.call('ZADD', prefix .. ':queued:' .. fields[2], fields[3], run_id)
+redis.call('SADD', prefix .. ':tenants', fields[2])
+return 1
+"""
+
+_CANCEL_SCRIPT = """
+local prefix, run_id, reason, now, queued, running = ARGV[1], ARGV[2], ARGV[3], ARGV[4], ARGV[5], ARGV[6]
+local key = prefix .. ':run:' .. run_id
+local fields = redis.call('HMGET', key, 'status', 'tenant')
+if fields[1] == queued then
+    redis.call('ZREM', prefix .. ':queued:' .. fields[2], run_id)
+    redis.call('HSET', key, 'status', ARGV[7], 'error', reason, 'cancel_reason', reason, 'finished_at', now)
+    return 1
+end
+if fields[1] == running then
+    -- Its worker stops it on the next heartbeat
+    redis.call('HSET', key, 'cancel_reason', reason)
+    return 1
+end
+return 0
+"""
+
+class RedisRunStore(RunStore):
+    """
+    Run store in Redis (or a Redis-compatible server such as Valkey or KeyDB),
+    for API front-ends and workers spread over several hosts.
+
+    Records are hashes with one field per record and data field. Queued runs
+    are one sorted set per tenant, claimed with the same tenant-fair order as
+    `SQLiteRunStore` (fewest running runs first, then oldest). Every state
+    change that depends on the current record runs as a Lua script, and the
+    others write only the fields they change, so concurrent front-ends and
+    workers cannot overwrite each other. Events are one list per run, so
+    sequence numbering (`RPUSH`) is atomic too.
+
+    The scripts address keys by prefix, so the store needs a single Redis node
+    (not Redis Cluster).
+
+    Args:
+        url (str): Connection URL, e.g. `redis://localhost:6379/0`.
+        prefix (str): Key prefix, so several deployments can share a server.
+        client (Optional[redis.Redis]): Existing client to use instead of connecting to `url`.
+    """
+
+    def __init__(self, url: str, prefix: str = "agentic-coding", client: Any = None):
+        if client is None:
+            if redis is None:
+                raise RuntimeError("RedisRunStore requires the `redis` package (pip install .[redis])")
+            client = redis.Redis.from_url(url)
+        self._redis = client
+        self.prefix = prefix
+        self._claim = client.register_script(_CLAIM_SCRIPT)
+        self._heartbeat = client.register_script(_HEARTBEAT_SCRIPT)
+        self._finish = client.register_script(_FINISH_SCRIPT)
+        self._requeue = client.register_script(_REQUEUE_SCRIPT)
+        self._reopen = client.register_script(_REOPEN_SCRIPT)
+        self._cancel = client.register_script(_CANCEL_SCRIPT)
+
+    def _key(self, *parts: str) -> str:
+        return ":".join((self.prefix, *parts))
+
+    def _to_record(self, raw: dict) -> Optional[dict]:
+        if not raw:
+            return None
+        raw = {k.decode(): v.decode() for k, v in raw.items()}
+        record: dict[str, Any] = {field: None for field in RECORD_FIELDS}
+        for field in RECORD_FIELDS:
+            if raw.get(field) not in (None, ""):
+                record[field] = raw[field]
+        for field in ("created_at", "started_at", "finished_at", "heartbeat_at"):
+            if record[field] is not None:
+                record[field] = float(record[field])
+        for field in DATA_FIELDS:
+            record[field] = json.loads(raw[field]) if field in raw else None
+        return record
+
+    @staticmethod
+    def _fields(**fields) -> dict:
+        """Hash fields of record and data fields, for `HSET` of only what changed."""
+        return {
+            field: json.dumps(value, ensure_ascii=False) if field in DATA_FIELDS else "" if value is None else str(value)
+            for field, value in fields.items()
+        }
+
+    def create(self, record: dict) -> None:
+        pipe = self._redis.pipeline()
+        pipe.hset(
+            self._key("run", record["run_id"]),
+            mapping=self._fields(**{field: record.get(field) for field in RECORD_FIELDS + DATA_FIELDS}),
+        )
+        pipe.zadd(self._key("queued", record["tenant"]), {record["run_id"]: record["created_at"]})
+        pipe.sadd(self._key("tenants"), record["tenant"])
+        if record.get("dedup_key"):
+            pipe.set(self._key("dedup", record["dedup_key"]), record["run_id"])
+        if record.get("idempotency_key"):
+            pipe.set(self._key("idempotency", record["idempotency_key"]), record["run_id"])
+        pipe.execute()
+
+    def get(self, run_id: str) -> Optional[dict]:
+        return self._to_record(self._redis.hgetall(self._key("run", run_id)))
+
+    def find(self, dedup_key: Optional[str] = None, idempotency_key: Optional[str] = None) -> Optional[dict]:
+        if idempotency_key:
+            run_id = self._redis.get(self._key("idempotency", idempotency_key))
+            record = self.get(run_id.decode()) if run_id else None
+            if record is not None:
+                return record
+        if dedup_key:
+            run_id = self._redis.get(self._key("dedup", dedup_key))
+            record = self.get(run_id.decode()) if run_id else None
+            if record is not None and record["status"] in _ACTIVE:
+                return record
+        return None
+
+    def attach(self, run_id: str, callback_url: Optional[str], detached: bool) -> None:
+        key = self._key("run", run_id)
+
+        def update(pipe) -> None:
+            # WATCH makes the transaction retry if the record changed since it was read
+            urls_raw, detached_raw = pipe.hmget(key, "callback_urls", "detached")
+            if urls_raw is None:
+                return
+            urls = json.loads(urls_raw) or []
+            if callback_url and callback_url not in urls:
+                urls.append(callback_url)
+            pipe.multi()
+            pipe.hset(key, mapping=self._fields(
+                callback_urls=urls,
+                detached=bool(json.loads(detached_raw or "false")) or detached or bool(callback_url),
+            ))
+
+        self._redis.transaction(update, key)
+
+    def claim(self, worker_id: str) -> Optional[dict]:
+        run_id = self._claim(args=[self.prefix, worker_id, time.time(), RunStatus.RUNNING.value])
+        return self.get(run_id.decode()) if run_id else None
+
+    def heartbeat(self, run_ids: list[str], worker_id: str) -> dict[str, Optional[str]]:
+        if not run_ids:
+            return {}
+        stop = self._heartbeat(args=[self.prefix, worker_id, time.time(), RunStatus.RUNNING.value, *run_ids])
+        return {
+            run_id.decode(): reason.decode() or None
+            for run_id, reason in zip(stop[::2], stop[1::2])
+        }
+
+    def finish(self, run_id: str, status: str, result: Any, error: Optional[str], worker_id: Optional[str] = None) -> bool:
+        return bool(self._finish(args=[
+            self.prefix, run_id, worker_id or "", RunStatus.RUNNING.value,
+            status, error or "", time.time(), json.dumps(result, ensure_ascii=False),
+        ]))
+
+    def _requeue_runs(self, run_ids: list[str], worker_id: Optional[str], cutoff: Optional[float]) -> list[str]:
+        if not run_ids:
+            return []
+        requeued = self._requeue(args=[
+            self.prefix, worker_id or "", "" if cutoff is None else cutoff,
+            RunStatus.RUNNING.value, RunStatus.QUEUED.value, *run_ids,
+        ])
+        return [run_id.decode() for run_id in requeued]
+
+    def requeue(self, run_ids: list[str], worker_id: Optional[str] = None) -> None:
+        self._requeue_runs(run_ids, worker_id, None)
+
+    def reopen(self, run_id: str) -> bool:
+        return bool(self._reopen(args=[
+            self.prefix, run_id, RunStatus.QUEUED.value, *sorted(status.value for status in RunStatus.resumable_states()),
+        ]))
+
+    def requeue_stale(self, timeout: float) -> list[str]:
+        cutoff = time.time() - timeout
+        stale = [raw.decode() for raw in self._redis.zrangebyscore(self._key("running"), 0, cutoff)]
+        return self._requeue_runs(stale, None, cutoff)
+
+    def request_cancel(self, run_id: str, reason: str) -> bool:
+        return bool(self._cancel(args=[
+            self.prefix, run_id, reason, time.time(),
+            RunStatus.QUEUED.value, RunStatus.RUNNING.value, RunStatus.CANCELLED.value,
+        ]))
+
+    def append_event(self, run_id: str, event: dict) -> int:
+        # The list index is the sequence number; the index is stored next to the
+        # event so filtered readers need not parse it
+        kind, node = _event_index(event)
+        entry = json.dumps([kind, node, json.dumps(event, ensure_ascii=False)], ensure_ascii=False)
+        return self._redis.rpush(self._key("events", run_id), entry) - 1
+
+    def read_events(self, run_id: str, start: int, limit: int = 500) -> list[tuple[int, Optional[str], Optional[str], bytes]]:
+        items = self._redis.lrange(self._key("events", run_id), start, start + limit - 1)
+        events = []
+        for offset, raw in enumerate(items):
+            kind, node, event_json = json.loads(raw)
+            seq = start + offset
+            # Splice the sequence number into the stored object instead of re-encoding it
+            line = f'{{"seq": {seq}, {event_json[1:]}\n'.encode("utf-8")
+            events.append((seq, kind, node, line))
+        return events
+
+    def stats(self) -> dict:
+        per_tenant = {}
+        for raw in self._redis.smembers(self._key("tenants")):
+            queued = self._redis.zcard(self._key("queued", raw.decode()))
+            if queued:
+                per_tenant[raw.decode()] = queued
+        running = [raw.decode() for raw in self._redis.zrange(self._key("running"), 0, -1)]
+        workers = {
+            worker.decode()
+            for worker in (self._redis.hget(self._key("run", run_id), "worker_id") for run_id in running)
+            if worker
+        }
+        return {
+            "queued": sum(per_tenant.values()),
+            "queued_per_tenant": per_tenant,
+            "running": len(running),
+            "busy_workers": sorted(workers),
+        }
+
+    def prune(self, max_age: float) -> None:
+        cutoff = time.time() - max_age
+        for key in self._redis.scan_iter(self._key("run", "*")):
+            run_id, finished_at, dedup, idempotency = self._redis.hmget(
+                key, "run_id", "finished_at", "dedup_key", "idempotency_key"
+            )
+            if not finished_at or float(finished_at) >= cutoff:
+                continue
+            pipe = self._redis.pipeline()
+            pipe.delete(key, self._key("events", run_id.decode()))
+            if idempotency:
+                pipe.delete(self._key("idempotency", idempotency.decode()))
+            pipe.execute()
+            if dedup:
+                dedup_key = self._key("dedup", dedup.decode())
+                if self._redis.get(dedup_key) == run_id:
+                    self._redis.delete(dedup_key)
+
+def create_run_store(url: str) -> RunStore:
+    """
+    Create a run store from a URL: `sqlite:///path/to/runs.db` or `redis://host:port/db`.
+
+    Raises:
+        ValueError: If the URL scheme is not supported.
+    """
+    if url.startswith("sqlite:///"):
+        return SQLiteRunStore(url[len("sqlite:///"):])
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisRunStore(url)
+    raise ValueError(f"Unsupported run store URL: {url!r}")
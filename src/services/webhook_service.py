@@ -0,0 +1,57 @@
+import asyncio
+import logging
+import random
+from typing import Any
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+# Status codes worth retrying: the receiver may succeed on a later attempt
+RETRYABLE_STATUS_CODES = {408, 425, 429, 500, 502, 503, 504}
+
+async def deliver_webhook(
+    url: str,
+    payload: dict[str, Any],
+    max_retries: int = 5,
+    base_delay: float = 1.0,
+    timeout: float = 10.0,
+) -> bool:
+    """
+    POSTs a JSON payload to a callback URL, retrying with exponential backoff (+jitter).
+
+    Connection errors and retryable status codes (429, 5xx, ...) are retried up to
+    `max_retries` times. A `Retry-After` header sent by the receiver is honored.
+
+    Args:
+        url (str): The callback URL registered with the run.
+        payload (dict[str, Any]): JSON-serializable body to send.
+        max_retries (int): Number of retries after the first attempt.
+        base_delay (float): Base delay in seconds for the backoff.
+        timeout (float): Per-attempt request timeout in seconds.
+
+    Returns:
+        bool: True if the receiver acknowledged the webhook with a 2xx response.
+    """
+    for attempt in range(max_retries + 1):
+        delay = base_delay * (2 ** attempt) + random.uniform(0, 0.3)
+        try:
+            response = await asyncio.to_thread(requests.post, url, json=payload, timeout=timeout)
+            if 200 <= response.status_code < 300:
+                logger.info(f"Delivered webhook to {url} (attempt {attempt + 1})")
+                return True
+            if response.status_code not in RETRYABLE_STATUS_CODES:
+                logger.error(f"Webhook to {url} rejected with status {response.status_code}; giving up")
+                return False
+            retry_after = response.headers.get("Retry-After")
+            if retry_after and retry_after.isdigit():
+                delay = max(delay, float(retry_after))
+            logger.warning(f"Webhook to {url} returned {response.status_code} (attempt {attempt + 1})")
+        except requests.RequestException as e:
+            logger.warning(f"Webhook to {url} failed (attempt {attempt + 1}): {e}")
+
+        if attempt < max_retries:
+            await asyncio.sleep(delay)
+
+    logger.error(f"Giving up on webhook to {url} after {max_retries + 1} attempts")
+    return False
@@ -1,12 +1,20 @@
 import subprocess
 import logging
+import signal
 from typing import Type
 from pydantic import BaseModel, Field
 from langchain_core.tools import BaseTool
+from ..core.cancellation import current_token
+from ..core.deadline import current_deadline
 import os
 # 로깅 설정
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+CANCELLED_OUTPUT = "Error: Command was cancelled because the workflow run was cancelled."
+DEADLINE_OUTPUT = "Error: Command was not run because the time budget of this stage is used up."
+# Upper bound for a single command; shortened to the time left before the stage deadline
+COMMAND_TIMEOUT_SECONDS = 300
+
 class ShellCommandInput(BaseModel):
     """Input for the execute_shell_command tool."""
     command: str = Field(description="The shell command to be executed in the interactive terminal.")
@@ -29,33 +37,52 @@ class ExecuteShellCommandTool(BaseTool):
     def _run(self, command: str) -> str:
         """Use the tool."""
         logging.info(f"Executing command: {command}")
+        token = current_token()
+        if token.cancelled:
+            return CANCELLED_OUTPUT
+        timeout = current_deadline().clamp(COMMAND_TIMEOUT_SECONDS)
+        if timeout <= 0:
+            return DEADLINE_OUTPUT
 
         try:
             # shell=True를 사용하여 파이프(|)나 리디렉션(>) 같은 쉘 기능을 사용할 수 있도록 합니다.
             # 이 기능은 프롬프트의 curl | grep | cut 과 같은 복잡한 명령어 실행에 필수적입니다.
-            # capture_output=True는 stdout과 stderr를 캡처하기 위함입니다.
+            # stdout/stderr=PIPE는 stdout과 stderr를 캡처하기 위함입니다.
             # text=True는 결과를 문자열로 디코딩합니다.
             # timeout을 설정하여 무한정 실행되는 것을 방지합니다.
-            process = subprocess.run(
+            # start_new_session=True로 명령어를 별도 프로세스 그룹에서 실행하여,
+            # 타임아웃이나 실행 취소 시 셸이 띄운 자식 프로세스까지 한 번에 종료할 수 있도록 합니다.
+            process = subprocess.Popen(
                 command,
                 shell=True,
-                capture_output=True,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
                 text=True,
-                check=False,  # check=False로 설정하여 0이 아닌 종료 코드에서도 예외를 발생시키지 않도록 합니다.
-                timeout=300,  # 5분 타임아웃
-                env=os.environ.copy()
+                env=os.environ.copy(),
+                start_new_session=True,
             )
+            # 워크플로우 실행이 취소되면 즉시 프로세스 그룹을 종료합니다.
+            with token.on_cancel(lambda: _kill_process_group(process)):
+                try:
+                    stdout, stderr = process.communicate(timeout=timeout)  # 최대 5분, 단계 마감 시각까지
+                except subprocess.TimeoutExpired:
+                    _kill_process_group(process)
+                    process.communicate()
+                    raise
+            if token.cancelled:
+                logging.info(f"Command '{command}' was cancelled.")
+                return CANCELLED_OUTPUT
 
             # AI 에이전트가 결과를 명확히 이해할 수 있도록 포맷팅합니다.
             output = f"Exit Code: {process.returncode}\n"
 
-            if process.stdout:
-                output += f"--- STDOUT ---\n{process.stdout.strip()}\n"
+            if stdout:
+                output += f"--- STDOUT ---\n{stdout.strip()}\n"
             else:
                 output += "--- STDOUT ---\n[No output]\n"
 
-            if process.stderr:
-                output += f"--- STDERR ---\n{process.stderr.strip()}\n"
+            if stderr:
+                output += f"--- STDERR ---\n{stderr.strip()}\n"
             else:
                 output += "--- STDERR ---\n[No output]\n"
 
@@ -64,11 +91,18 @@ class ExecuteShellCommandTool(BaseTool):
 
         except subprocess.TimeoutExpired:
             logging.error(f"Command '{command}' timed out.")
-            return "Error: Command timed out after 300 seconds."
+            return f"Error: Command timed out after {timeout:.0f} seconds."
         except Exception as e:
             logging.error(f"An unexpected error occurred while executing command '{command}': {e}")
             return f"An unexpected error occurred: {str(e)}"
 
+def _kill_process_group(process: subprocess.Popen) -> None:
+    """Kill the shell and every process it started."""
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        pass
+
 # 사용 예시 (LangChain 에이전트에 이 도구를 전달할 수 있습니다)
 cli_tool = ExecuteShellCommandTool()
 
@@ -6,8 +6,15 @@ from ..constants.aws_model import AWSModel
 from ..prompts.se_agent_prompts import se_agent_prompts_v1
 import json
 import uuid
-import time
+import socket
+import threading
 from ..logging_config import setup_logging
+from ..core.brownout import brownout
+from ..core.capacity import container_slots
+from ..core.cancellation import RunCancelled, current_token
+from ..core.deadline import current_deadline
+from ..utils.progress import ProgressCallback
+from typing import Optional
 import logging
 
 load_dotenv()
@@ -16,15 +23,32 @@ setup_logging()
 logger = logging.getLogger(__name__)
 
 TIME_OUT = "1000"
+# Jobs are not started with less time than this left before the stage deadline
+MIN_CONTAINER_SECONDS = 120
 
-# Docker client and image will be initialized lazily
+# Containers and volumes are labelled with the instance that started them, so an
+# instance can tear down everything it owns on shutdown or after a crash.
+OWNER_LABEL = "agentic-coding.owner"
+INSTANCE_ID = os.environ.get("INSTANCE_ID") or socket.gethostname()
+
+# Docker client and image will be initialized lazily.
+# Several runs spawn containers from worker threads at the same time, so
+# initialization is guarded by a lock (docker-py clients are thread-safe).
 _client = None
 _image = None
+_init_lock = threading.Lock()
 
 def _get_docker_client():
     """
     Get Docker client with proper error handling for Rancher Desktop and other Docker environments.
     """
+    global _client
+    if _client is not None:
+        return _client
+    with _init_lock:
+        return _connect_docker_client()
+
+def _connect_docker_client():
     global _client
     if _client is None:
         try:
@@ -77,9 +101,16 @@ def _get_or_build_image():
     """
     Get or build the SE agent Docker image.
     """
+    global _image
+    if _image is not None:
+        return _image
+    client = _get_docker_client()
+    with _init_lock:
+        return _load_or_build_image(client)
+
+def _load_or_build_image(client):
     global _image
     if _image is None:
-        client = _get_docker_client()
         
         # Construct the absolute path to the docker build context directory
         script_dir = os.path.dirname(os.path.abspath(__file__))
@@ -114,7 +145,11 @@ def _spawn_containers(git_url:str, branch_names:dict[str, str], jobs: list[dict]
     """
     client = _get_docker_client()
     image = _get_or_build_image()
-    
+    # The agent inside the container stops on its own by the stage deadline
+    time_out = str(int(current_deadline().clamp(int(TIME_OUT))))
+    # Containers started while the service is browned out write and think less
+    max_output_tokens, max_thinking_tokens = brownout.container_token_limits(9136, 1024)
+
     container_ids = []
     for job in jobs:
         volume_name = f"se-agent-volume-{uuid.uuid4()}"
@@ -127,7 +162,7 @@ def _spawn_containers(git_url:str, branch_names:dict[str, str], jobs: list[dict]
             "be_branch_name": branch_names.get("be_branch_name")
         }).messages[0].content
         
-        volume = client.volumes.create(name=volume_name)
+        volume = client.volumes.create(name=volume_name, labels={OWNER_LABEL: INSTANCE_ID})
         container = client.containers.run(
             image,            
             mem_limit="8g",
@@ -135,6 +170,7 @@ def _spawn_containers(git_url:str, branch_names:dict[str, str], jobs: list[dict]
             cpu_period=100000,
             network_mode="host",
             detach=True,
+            labels={OWNER_LABEL: INSTANCE_ID},
             environment={
                 "GIT_URL": git_url,
                 "AWS_REGION": os.environ["AWS_DEFAULT_REGION"],
@@ -142,14 +178,14 @@ def _spawn_containers(git_url:str, branch_names:dict[str, str], jobs: list[dict]
                 "ANTHROPIC_MODEL": AWSModel.ANTHROPIC_CLAUDE_4_SONNET_SEOUL_CROSS_REGION.value,
                 "SYSTEM_PROMPT": system_prompt,
                 "USER_INPUT": user_input,
-                "TIME_OUT": TIME_OUT,
+                "TIME_OUT": time_out,
                 "AWS_ACCESS_KEY_ID": os.environ["AWS_ACCESS_KEY"],
                 "AWS_SECRET_ACCESS_KEY": os.environ["AWS_SECRET_KEY"],
                 "GITHUB_TOKEN": os.environ.get("GH_APP_TOKEN"),
                 "JOB_NAME": job.get("group_name"),
                 "INSTALLATION_ID": os.environ.get("INSTALLATION_ID"),
-                "CLAUDE_CODE_MAX_OUTPUT_TOKENS": 9136,
-                "MAX_THINKING_TOKENS": 1024
+                "CLAUDE_CODE_MAX_OUTPUT_TOKENS": max_output_tokens,
+                "MAX_THINKING_TOKENS": max_thinking_tokens
             },
             volumes={volume.name: {"bind": "/app", "mode": "rw"}},
         )
@@ -198,7 +234,7 @@ def _get_container_results(container_ids: list[str]) -> list[dict]:
             container = client.containers.get(container_id)
             
             # Wait for the container to finish, with a timeout
-            container.wait(timeout=1060) # Slightly more than the internal timeout
+            container.wait(timeout=max(1, current_deadline().clamp(1060))) # Slightly more than the internal timeout
 
             # Get logs
             logs = container.logs().decode('utf-8').strip().split('\n')
@@ -283,31 +319,140 @@ def _remove_containers(container_ids: list[str]) -> None:
         except Exception as e:
             logging.error(f"Error removing container {container_id}: {e}")
 
-def spawn_engineers(git_url: str, branch_names: dict[str, str], jobs: list[dict]) -> list[dict]:
+def remove_owned_containers(owner: str = INSTANCE_ID) -> int:
+    """
+    Remove every `se-agent` container and volume labelled as owned by `owner`.
+
+    Args:
+        owner (str): Instance id the containers were started by.
+
+    Returns:
+        int: The number of containers removed.
+    """
+    client = _get_docker_client()
+    label_filter = {"label": f"{OWNER_LABEL}={owner}"}
+    container_ids = [c.id for c in client.containers.list(all=True, filters=label_filter)]
+    if container_ids:
+        logger.info(f"Removing {len(container_ids)} containers owned by {owner}")
+        _remove_containers(container_ids)
+    # Volumes of containers that failed to start are not attached to any container
+    for volume in client.volumes.list(filters=label_filter):
+        try:
+            volume.remove(force=True)
+        except Exception as e:
+            logger.warning(f"Error removing volume {volume.name}: {e}")
+    return len(container_ids)
+
+def spawn_engineers(
+    git_url: str,
+    branch_names: dict[str, str],
+    jobs: list[dict],
+    on_progress: Optional[ProgressCallback] = None,
+) -> list[dict]:
     """
     Spawn a container for each job and clean up the containers after the job is done.
     The container will implement the job using the claude-code.
 
+    Containers are started only while a slot in the process-wide `container_slots`
+    cap is free, so concurrent runs cannot oversubscribe the host. Jobs without a
+    slot wait until one of the running containers exits.
+
+    If the workflow run is cancelled, polling stops immediately, the running
+    containers are removed and their slots are released.
+
+    Containers get no more time than is left of the stage deadline. Once it is
+    reached, jobs that have not started are skipped, running containers are
+    stopped, and the results collected so far are returned, with an error
+    entry for every job that did not finish.
+
     Args:
         git_url (str): The URL of the repository to clone.
         branch_names (dict[str, str]): A dictionary of branch names for frontend and backend.
         jobs (list[dict]): A list of jobs to spawn.
+        on_progress (ProgressCallback | None): Called with `(event name, data)` when a
+            container starts or exits and on every polling round.
 
     Returns:
         list[dict]: A list of dictionaries, each containing code and cost.
+
+    Raises:
+        RunCancelled: If the workflow run was cancelled.
     """
-    container_ids = []
+    token = current_token()
+    deadline = current_deadline()
+
+    def _report(name: str, data: dict) -> None:
+        if on_progress is not None:
+            on_progress(name, data)
+
+    pending = list(jobs)
+    running: list[str] = []
+    job_names: dict[str, str] = {}
+    results = []
     try:
-        container_ids = _spawn_containers(git_url, branch_names, jobs)
-        while _is_container_running(container_ids):
-            print("Waiting for containers to finish...")
-            time.sleep(10)
-        results = _get_container_results(container_ids)
+        while pending or running:
+            token.raise_if_cancelled()
+            remaining = deadline.remaining()
+            if remaining is not None and (remaining <= 0 or (pending and not running and remaining < MIN_CONTAINER_SECONDS)):
+                logger.warning(f"Stage deadline reached, stopping {len(running)} containers and skipping {len(pending)} jobs")
+                _report("containers_deadline", {"running": len(running), "pending": len(pending), "completed": len(results)})
+                results.extend(
+                    {'container_id': container_id, 'code': None, 'cost_usd': None, 'error': 'Stopped at the stage deadline.'}
+                    for container_id in running
+                )
+                results.extend(
+                    {'container_id': None, 'code': None, 'cost_usd': None, 'error': f"Job {job.get('group_name')} was not started before the stage deadline."}
+                    for job in pending
+                )
+                return results
+            # Start as many jobs as there are free container slots and time for
+            while pending and (remaining is None or remaining >= MIN_CONTAINER_SECONDS) and container_slots.try_acquire():
+                job = pending.pop(0)
+                try:
+                    new_ids = _spawn_containers(git_url, branch_names, [job])
+                except Exception:
+                    container_slots.release()
+                    raise
+                for container_id in new_ids:
+                    job_names[container_id] = job.get("group_name")
+                    _report("container_started", {"container_id": container_id, "job_name": job.get("group_name")})
+                running.extend(new_ids)
+
+            finished = [container_id for container_id in running if not _is_container_running([container_id])]
+            if finished:
+                finished_results = _get_container_results(finished)
+                results.extend(finished_results)
+                _remove_containers(finished)
+                for container_id in finished:
+                    running.remove(container_id)
+                    container_slots.release()
+                for result in finished_results:
+                    _report("container_exited", {
+                        "container_id": result["container_id"],
+                        "job_name": job_names.get(result["container_id"]),
+                        "cost_usd": result.get("cost_usd"),
+                        "error": result.get("error"),
+                    })
+                continue
+
+            logger.info(f"Waiting for containers to finish... ({len(running)} running, {len(pending)} waiting for a slot)")
+            _report("containers_waiting", {
+                "running": len(running),
+                "pending": len(pending),
+                "completed": len(results),
+                "total_cost_usd": sum(r["cost_usd"] for r in results if isinstance(r.get("cost_usd"), (int, float))),
+            })
+            # Wakes up early when the run is cancelled
+            token.wait(deadline.clamp(10))
         return results
+    except RunCancelled:
+        logger.info(f"Run cancelled, removing {len(running)} running containers")
+        raise
     except Exception as e:
         logger.error(f"An error occurred while spawning containers: {e}")
-        return []
+        return results
     finally:
-        if container_ids:
-            _remove_containers(container_ids)
-    
+        if running:
+            _remove_containers(running)
+            for _ in running:
+                container_slots.release()
@@ -0,0 +1,165 @@
+import asyncio
+import json
+from typing import Any
+
+from fastapi.encoders import jsonable_encoder
+
+def to_jsonable_event(event: Any) -> dict:
+    """
+    Converts a graph stream event into a JSON-serializable dict.
+
+    Events from `astream_events` carry LangChain message objects and other
+    pydantic models in their payloads. They are encoded once here so every
+    subscriber of a run can reuse the same representation.
+
+    Args:
+        event: The raw event (dict, bytes or any other object).
+
+    Returns:
+        dict: A JSON-serializable representation of the event.
+    """
+    if isinstance(event, (bytes, bytearray)):
+        text = event.decode("utf-8", errors="ignore")
+        try:
+            return json.loads(text)
+        except Exception:
+            return {"message": text}
+    try:
+        encoded = jsonable_encoder(event)
+    except Exception:
+        return {"message": str(event)}
+    return encoded if isinstance(encoded, dict) else {"message": encoded}
+
+def is_root_end_event(event: dict) -> bool:
+    """Returns True for the `on_chain_end` event of the top-level graph run (v2 schema)."""
+    return event.get("event") == "on_chain_end" and not event.get("parent_ids")
+
+# Event kinds whose payloads are per-token model output and can be merged
+TOKEN_CHUNK_EVENTS = {"on_chat_model_stream", "on_llm_stream"}
+
+class EventStreamOptions:
+    """
+    Per-subscriber filtering and batching of a run's event stream.
+
+    Args:
+        kinds (set[str] | None): Event kinds to keep, e.g. {"on_chain_end"}; None keeps all.
+        nodes (set[str] | None): Graph node names to keep; None keeps all.
+        include_payloads (bool): Keep `data.input`/`data.output` (large state snapshots).
+        coalesce_ms (int): Merge consecutive token chunks arriving within this window.
+        coalesce_chars (int): Flush a merged chunk once it holds this many characters.
+    """
+
+    def __init__(
+        self,
+        kinds: set[str] | None = None,
+        nodes: set[str] | None = None,
+        include_payloads: bool = True,
+        coalesce_ms: int = 0,
+        coalesce_chars: int = 2048,
+    ):
+        self.kinds = kinds or None
+        self.nodes = nodes or None
+        self.include_payloads = include_payloads
+        self.coalesce_ms = max(0, coalesce_ms)
+        self.coalesce_chars = max(1, coalesce_chars)
+
+    @property
+    def passthrough(self) -> bool:
+        """True if raw log lines can be forwarded without parsing them."""
+        return self.include_payloads and not self.coalesce_ms
+
+    def matches(self, kind: str | None, node: str | None) -> bool:
+        if self.kinds is not None and kind not in self.kinds:
+            return False
+        if self.nodes is not None and node not in self.nodes:
+            return False
+        return True
+
+    def transform(self, event: dict) -> dict:
+        if self.include_payloads or "data" not in event:
+            return event
+        data = {k: v for k, v in event["data"].items() if k not in ("input", "output")}
+        return {**event, "data": data}
+
+def _chunk_text(chunk: dict) -> str:
+    content = chunk.get("content", "")
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        return "".join(block.get("text", "") for block in content if isinstance(block, dict))
+    return ""
+
+def _merge_chunks(batch: list[dict]) -> dict:
+    """Merges consecutive token-chunk events of one model call into a single event."""
+    first, last = batch[0], batch[-1]
+    chunks = [event.get("data", {}).get("chunk") or {} for event in batch]
+    merged = {
+        "content": "".join(_chunk_text(chunk) for chunk in chunks),
+        "tool_call_chunks": [tc for chunk in chunks for tc in (chunk.get("tool_call_chunks") or [])],
+    }
+    return {
+        **last,
+        "data": {"chunk": merged},
+        "seq_start": first.get("seq"),
+        "chunk_count": len(batch),
+    }
+
+async def coalesce_token_chunks(events, max_delay: float, max_chars: int):
+    """
+    Batches consecutive token-chunk events from the same model call.
+
+    A batch is flushed when a different event arrives, when it holds
+    `max_chars` characters, or when `max_delay` seconds pass without it being
+    flushed. Events are pulled by a background task so the time limit also
+    applies while the source is idle.
+    """
+    queue: asyncio.Queue = asyncio.Queue(maxsize=256)
+    done = object()
+
+    async def pump():
+        try:
+            async for event in events:
+                await queue.put(event)
+        finally:
+            await queue.put(done)
+
+    task = asyncio.create_task(pump())
+    batch: list[dict] = []
+    size = 0
+    deadline = None
+    try:
+        while True:
+            timeout = None if deadline is None else max(0.0, deadline - asyncio.get_running_loop().time())
+            try:
+                event = await asyncio.wait_for(queue.get(), timeout)
+            except asyncio.TimeoutError:
+                yield _merge_chunks(batch)
+                batch, size, deadline = [], 0, None
+                continue
+
+            if event is done:
+                if batch:
+                    yield _merge_chunks(batch)
+                # Re-raises an error of the source, so a failed stream does not end like a finished one
+                await task
+                return
+
+            if event.get("event") in TOKEN_CHUNK_EVENTS:
+                if batch and batch[-1].get("run_id") != event.get("run_id"):
+                    yield _merge_chunks(batch)
+                    batch, size, deadline = [], 0, None
+                batch.append(event)
+                size += len(_chunk_text(event.get("data", {}).get("chunk") or {}))
+                if deadline is None:
+                    deadline = asyncio.get_running_loop().time() + max_delay
+                if size >= max_chars:
+                    yield _merge_chunks(batch)
+                    batch, size, deadline = [], 0, None
+                continue
+
+            if batch:
+                yield _merge_chunks(batch)
+                batch, size, deadline = [], 0, None
+            yield event
+    finally:
+        task.cancel()
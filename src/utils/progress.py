@@ -0,0 +1,86 @@
+import asyncio
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Optional
+
+from langchain_core.callbacks.manager import adispatch_custom_event
+from langchain_core.runnables import RunnableConfig
+
+logger = logging.getLogger(__name__)
+
+HEARTBEAT_SECONDS = float(os.environ.get("PROGRESS_HEARTBEAT_SECONDS", "15"))
+
+# Signature of the thread-safe `report(name, data)` callable handed to blocking code
+ProgressCallback = Callable[[str, dict[str, Any]], None]
+
+async def emit_progress(name: str, data: dict[str, Any], config: Optional[RunnableConfig] = None) -> None:
+    """
+    Emits a structured custom event into the graph's event stream.
+
+    Shows up as an `on_custom_event` event in `astream_events` (v2). Failures,
+    e.g. when called outside of a running graph, are logged and ignored so that
+    progress reporting never breaks the work it reports on.
+    """
+    try:
+        await adispatch_custom_event(name, data, config=config)
+    except Exception as e:
+        logger.debug(f"Could not emit progress event {name!r}: {e}")
+
+@asynccontextmanager
+async def progress_reporter(
+    config: Optional[RunnableConfig],
+    heartbeat: Optional[dict[str, Any]] = None,
+    interval: float = HEARTBEAT_SECONDS,
+):
+    """
+    Bridges progress reports from worker threads into the graph's event stream.
+
+    Yields a thread-safe `report(name, data)` callable that can be handed to
+    blocking code running in `asyncio.to_thread`. While the block is active, a
+    `heartbeat` event carrying `heartbeat` data and the elapsed time is emitted
+    every `interval` seconds, so long stages never go silent.
+
+    Args:
+        config (RunnableConfig | None): Config of the node emitting the events.
+        heartbeat (dict[str, Any] | None): Extra fields for heartbeat events; None disables heartbeats.
+        interval (float): Seconds between heartbeats.
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+    started = time.perf_counter()
+
+    def report(name: str, data: dict[str, Any]) -> None:
+        try:
+            loop.call_soon_threadsafe(queue.put_nowait, (name, data))
+        except RuntimeError:
+            # The event loop is gone (e.g. during shutdown); drop the report
+            pass
+
+    async def pump():
+        next_beat = time.perf_counter() + interval
+        while True:
+            timeout = max(0.0, next_beat - time.perf_counter()) if heartbeat is not None else None
+            try:
+                item = await asyncio.wait_for(queue.get(), timeout)
+            except asyncio.TimeoutError:
+                elapsed = round(time.perf_counter() - started, 1)
+                await emit_progress("heartbeat", {**heartbeat, "elapsed_seconds": elapsed}, config)
+                next_beat = time.perf_counter() + interval
+                continue
+            if item is None:
+                return
+            await emit_progress(*item, config)
+
+    task = asyncio.create_task(pump())
+    try:
+        yield report
+    finally:
+        # The sentinel is queued behind reports sent before the block ended, so they all reach the stream
+        queue.put_nowait(None)
+        try:
+            await task
+        except asyncio.CancelledError:
+            task.cancel()
+            raise
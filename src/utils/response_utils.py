@@ -0,0 +1,126 @@
+import asyncio
+import gzip
+import json
+from typing import Any, Iterable, Optional
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import Response
+
+try:
+    import zstandard
+except ImportError:  # optional dependency, see the `compression` extra
+    zstandard = None
+
+# Bodies smaller than this are not worth compressing
+MIN_COMPRESS_BYTES = 1024
+# Bodies at least this large are compressed in a worker thread instead of on the event loop
+THREAD_COMPRESS_BYTES = 64 * 1024
+
+def parse_fields(fields: Optional[str]) -> Optional[list[list[str]]]:
+    """
+    Parses a comma-separated field selection such as
+    `response,fe_branch_name,agent_results.cost_usd` into dotted paths.
+    """
+    if not fields:
+        return None
+    return [f.strip().split(".") for f in fields.split(",") if f.strip()]
+
+def _select(value: Any, path: list[str]) -> Any:
+    if not path:
+        return value
+    if isinstance(value, list):
+        return [_select(item, path) for item in value]
+    if isinstance(value, dict):
+        key, rest = path[0], path[1:]
+        if key not in value:
+            return None
+        return {key: _select(value[key], rest)}
+    return None
+
+def _merge(target: dict, selected: dict) -> None:
+    for key, value in selected.items():
+        if isinstance(value, dict) and isinstance(target.get(key), dict):
+            _merge(target[key], value)
+        elif isinstance(value, list) and isinstance(target.get(key), list):
+            for existing, new in zip(target[key], value):
+                if isinstance(existing, dict) and isinstance(new, dict):
+                    _merge(existing, new)
+        else:
+            target[key] = value
+
+def project_state(state: Optional[dict], fields: Optional[Iterable[list[str]]]) -> Optional[dict]:
+    """
+    Keeps only the selected (possibly nested) fields of a workflow state.
+    Dotted paths descend into dicts and apply to every item of a list, e.g.
+    `agent_results.cost_usd` keeps just the cost of each container result.
+
+    Args:
+        state (dict | None): The final workflow state.
+        fields (Iterable[list[str]] | None): Paths from `parse_fields`; None keeps everything.
+
+    Returns:
+        dict | None: The projected state.
+    """
+    if state is None or fields is None:
+        return state
+    projected: dict = {}
+    for path in fields:
+        selected = _select(state, path)
+        if isinstance(selected, dict):
+            _merge(projected, selected)
+    return projected
+
+def _accepted_encodings(accept_encoding: Optional[str]) -> dict[str, float]:
+    """Quality value of every coding listed in an `Accept-Encoding` header, e.g. `gzip;q=0.5`."""
+    accepted: dict[str, float] = {}
+    for token in (accept_encoding or "").split(","):
+        coding, *params = [part.strip() for part in token.split(";")]
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[coding.lower()] = quality
+    return accepted
+
+def choose_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """
+    The supported encoding the client prefers: the highest quality value wins,
+    ties go to zstd (if installed) over gzip. Codings with `q=0`, also through
+    `*;q=0`, are refused. Returns None for an uncompressed response.
+    """
+    accepted = _accepted_encodings(accept_encoding)
+    supported = (["zstd"] if zstandard is not None else []) + ["gzip"]
+    best, best_quality = None, 0.0
+    for coding in supported:
+        quality = accepted.get(coding, accepted.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = coding, quality
+    return best
+
+def _compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=3).compress(body)
+    return gzip.compress(body, compresslevel=6)
+
+async def encoded_json_response(content: Any, accept_encoding: Optional[str], status_code: int = 200) -> Response:
+    """
+    Serializes `content` to JSON and compresses it with the encoding the
+    client prefers (see `choose_encoding`). Large bodies are compressed in a
+    worker thread so a big final state does not stall the event loop.
+    """
+    body = json.dumps(jsonable_encoder(content), ensure_ascii=False).encode("utf-8")
+    headers = {"Vary": "Accept-Encoding"}
+    encoding = choose_encoding(accept_encoding) if len(body) >= MIN_COMPRESS_BYTES else None
+    if encoding is not None:
+        if len(body) >= THREAD_COMPRESS_BYTES:
+            body = await asyncio.to_thread(_compress, body, encoding)
+        else:
+            body = _compress(body, encoding)
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, status_code=status_code, media_type="application/json", headers=headers)
@@ -0,0 +1,201 @@
+import json
+import logging
+import os
+import re
+import threading
+from typing import Any, Optional
+
+from langchain_core.language_models import LanguageModelLike
+from langchain_core.messages import BaseMessage
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.prompts.base import BasePromptTemplate
+from langchain_core.runnables import Runnable, RunnableConfig, RunnableLambda
+from pydantic import BaseModel, ValidationError
+
+logger = logging.getLogger(__name__)
+
+# Correction calls made for an output that is still invalid after local repair
+STRUCTURED_OUTPUT_CORRECTIONS = int(os.environ.get("STRUCTURED_OUTPUT_CORRECTIONS", "1"))
+
+# Only the invalid output and the validation errors are sent back, not the stage's prompt
+CORRECTION_PROMPT = ChatPromptTemplate([
+    ("system", (
+        "You correct structured output that failed validation against the `{schema_name}` schema. "
+        "Call the `{schema_name}` tool exactly once with the corrected output. Keep every valid value "
+        "as it is and change only what the validation errors require."
+    )),
+    ("human", "<output>\n{output}\n</output>\n\n<validation_errors>\n{errors}\n</validation_errors>"),
+])
+
+class StructuredOutputError(Exception):
+    """Raised when a stage's output does not match its schema even after repair and correction."""
+
+class StructuredOutputStats:
+    """
+    How the outputs of each schema were obtained: valid as returned, repaired
+    locally, fixed by a correction call, or failed.
+    """
+
+    OUTCOMES = ("valid", "repaired", "corrected", "failed")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics: dict[str, dict[str, int]] = {}
+
+    def record(self, schema_name: str, outcome: str) -> None:
+        with self._lock:
+            metrics = self._metrics.setdefault(schema_name, dict.fromkeys(self.OUTCOMES, 0))
+            metrics[outcome] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {name: dict(metrics) for name, metrics in self._metrics.items()}
+
+structured_output_stats = StructuredOutputStats()
+
+def _loads_json(text: str) -> Any:
+    """JSON value in `text`, tolerating code fences, surrounding prose and trailing commas."""
+    text = re.sub(r"^```(?:json)?\s*|\s*```$", "", text.strip())
+    start, end = text.find("{"), text.rfind("}")
+    candidates = [text] + ([text[start:end + 1]] if 0 <= start < end else [])
+    for candidate in candidates:
+        for attempt in (candidate, re.sub(r",\s*([}\]])", r"\1", candidate)):
+            try:
+                return json.loads(attempt)
+            except ValueError:
+                continue
+    return None
+
+def _message_text(message: BaseMessage) -> str:
+    content = message.content
+    if isinstance(content, str):
+        return content
+    return "".join(block.get("text", "") if isinstance(block, dict) else str(block) for block in content)
+
+def _candidate(message: BaseMessage) -> Any:
+    """What the model meant to return: its tool call arguments, or JSON in its text."""
+    tool_calls = getattr(message, "tool_calls", None)
+    if tool_calls:
+        return tool_calls[0]["args"]
+    for invalid in getattr(message, "invalid_tool_calls", None) or []:
+        if invalid.get("args"):
+            value = _loads_json(invalid["args"])
+            if value is not None:
+                return value
+    return _loads_json(_message_text(message))
+
+def _set(data: Any, loc: tuple, value: Any) -> bool:
+    for key in loc[:-1]:
+        try:
+            data = data[key]
+        except (KeyError, IndexError, TypeError):
+            return False
+    try:
+        data[loc[-1]] = value
+    except (KeyError, IndexError, TypeError):
+        return False
+    return True
+
+def _coerce(data: Any, error: ValidationError) -> bool:
+    """Fix the shapes models commonly get wrong; returns whether anything changed."""
+    changed = False
+    for detail in error.errors():
+        kind, value, loc = detail["type"], detail.get("input"), detail["loc"]
+        if not loc:
+            continue
+        if kind in ("list_type", "dict_type", "model_type") and isinstance(value, str):
+            # Nested objects sent as JSON strings, or a single item instead of a list
+            decoded = _loads_json(value)
+            if decoded is None and kind == "list_type":
+                decoded = [value]
+            if decoded is not None:
+                changed |= _set(data, loc, decoded)
+        elif kind == "list_type" and value is None:
+            changed |= _set(data, loc, [])
+    return changed
+
+def _describe(error: ValidationError) -> str:
+    """Validation errors one per line, without the documentation links, to keep correction calls small."""
+    return "\n".join(
+        f"{'.'.join(str(part) for part in detail['loc']) or '(root)'}: {detail['msg']} (got {detail.get('input')!r:.200})"
+        for detail in error.errors()
+    )
+
+def repair(message: BaseMessage, schema: type[BaseModel]) -> tuple[Optional[BaseModel], Any, str]:
+    """
+    Validates the model output in `message` against `schema` after cheap local
+    fixes (JSON in prose or code fences, trailing commas, a wrapper object,
+    JSON strings and single values where objects or lists belong).
+
+    Returns:
+        tuple: The validated output or None, the best candidate data, and the remaining errors.
+    """
+    data = _candidate(message)
+    if data is None:
+        return None, _message_text(message), "The output contains no JSON object."
+    if isinstance(data, dict) and len(data) == 1:
+        (key, inner), = data.items()
+        # e.g. {"TechStack": {...}} or {"properties": {...}}
+        if key not in schema.model_fields and isinstance(inner, dict):
+            data = inner
+    error = None
+    for _ in range(4):
+        try:
+            return schema.model_validate(data), data, ""
+        except ValidationError as e:
+            error = e
+            if not _coerce(data, e):
+                break
+    return None, data, _describe(error)
+
+def structured_chain(
+    prompt: BasePromptTemplate,
+    model: LanguageModelLike,
+    schema: type[BaseModel],
+    corrections: int = STRUCTURED_OUTPUT_CORRECTIONS,
+) -> Runnable:
+    """
+    `prompt | model` whose output is forced into `schema` through tool calling.
+
+    An output that does not validate is first repaired locally; if that fails,
+    up to `corrections` small calls send only the invalid output and the
+    validation errors back to the model, instead of rerunning the stage.
+
+    Returns:
+        Runnable: Async runnable returning the validated output as a dict.
+
+    Raises:
+        StructuredOutputError: If the output is still invalid after all corrections.
+    """
+    name = schema.__name__
+    extract = model.with_structured_output(schema, include_raw=True)
+    generate = prompt | extract
+    correct = CORRECTION_PROMPT | extract
+
+    async def run(inputs: dict, config: RunnableConfig) -> dict:
+        result = await generate.ainvoke(inputs, config)
+        if result["parsed"] is not None:
+            structured_output_stats.record(name, "valid")
+            return result["parsed"].model_dump()
+        parsed, candidate, errors = repair(result["raw"], schema)
+        if parsed is not None:
+            structured_output_stats.record(name, "repaired")
+            return parsed.model_dump()
+        for attempt in range(corrections):
+            logger.warning(f"{name} output failed validation, asking for a correction ({attempt + 1}/{corrections}): {errors}")
+            output = candidate if isinstance(candidate, str) else json.dumps(candidate, ensure_ascii=False)
+            result = await correct.ainvoke({"schema_name": name, "output": output, "errors": errors}, config)
+            if result["parsed"] is not None:
+                structured_output_stats.record(name, "corrected")
+                return result["parsed"].model_dump()
+            parsed, retried, retried_errors = repair(result["raw"], schema)
+            if parsed is not None:
+                structured_output_stats.record(name, "corrected")
+                return parsed.model_dump()
+            # A correction without any JSON is no better than the output it was asked to fix
+            if not isinstance(retried, str):
+                candidate, errors = retried, retried_errors
+        structured_output_stats.record(name, "failed")
+        raise StructuredOutputError(f"{name} output is invalid after {corrections} correction(s): {errors}")
+
+    return RunnableLambda(run, name=f"{name}Output")
@@ -0,0 +1,92 @@
+"""
+Worker process for the shared run store.
+
+Usage:
+    RUN_STORE_URL=sqlite:///logs/runs.db python -m src.worker -c 4
+
+Claims queued runs from the store that API front-ends (started with the same
+`RUN_STORE_URL`) write to, executes them and reports events and results back.
+Start any number of workers on any number of hosts; give every worker process
+its own `INSTANCE_ID` so it only tears down its own containers.
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import signal
+import sys
+from typing import Optional
+
+from dotenv import load_dotenv
+
+from .logging_config import setup_logging
+from .workflow.graph import graph
+from .callbacks.logging_callback_handler import LoggingCallbackHandler
+from .core.brownout import RUN_QUEUE_THRESHOLD, brownout
+from .core.config import SHUTDOWN_DRAIN_TIMEOUT, cleanup_owned_containers, load_github_config
+from .services.run_store import create_run_store
+from .services.distributed_run_service import StoreWorkerService
+from .tools.spawn_container import INSTANCE_ID
+
+setup_logging()
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+async def run_worker(store_url: str, concurrency: int, worker_id: str) -> None:
+    load_github_config()
+    await cleanup_owned_containers()
+
+    service = StoreWorkerService(
+        graph,
+        create_run_store(store_url),
+        worker_id,
+        max_concurrency=concurrency,
+        run_ttl=float(os.environ.get("WORKFLOW_RUN_TTL", "3600")),
+        webhook_max_retries=int(os.environ.get("WEBHOOK_MAX_RETRIES", "5")),
+        heartbeat_interval=float(os.environ.get("WORKER_HEARTBEAT_SECONDS", "10")),
+        stale_timeout=float(os.environ.get("WORKER_STALE_SECONDS", "120")),
+        default_config={"callbacks": [LoggingCallbackHandler(logger, worker_id)]},
+        run_deadline=float(os.environ.get("RUN_DEADLINE_SECONDS", "0")) or None,
+    )
+    # Runs queued in the shared store, including those waiting for other workers
+    brownout.add_signal("run_queue", lambda: service.store.stats()["queued"], RUN_QUEUE_THRESHOLD)
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    await service.start()
+    logger.info(f"Worker {worker_id} serving runs from {store_url} with concurrency {concurrency}")
+    try:
+        await service.serve(stop)
+    finally:
+        logger.info(f"Worker {worker_id} shutting down")
+        # Let running runs finish and hand the rest back to the store for other workers
+        await service.drain(SHUTDOWN_DRAIN_TIMEOUT)
+        await service.stop()
+        await cleanup_owned_containers()
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Execute workflow runs from a shared run store.")
+    parser.add_argument(
+        "--store",
+        default=os.environ.get("RUN_STORE_URL"),
+        help="Run store URL, e.g. sqlite:///logs/runs.db or redis://localhost:6379/0 (default: RUN_STORE_URL).",
+    )
+    parser.add_argument(
+        "-c", "--concurrency",
+        type=int,
+        default=int(os.environ.get("WORKFLOW_MAX_CONCURRENCY", "4")),
+        help="Number of runs this worker executes at the same time.",
+    )
+    parser.add_argument("--worker-id", default=INSTANCE_ID, help="Worker id recorded in the store (default: INSTANCE_ID).")
+    args = parser.parse_args(argv)
+    if not args.store:
+        parser.error("a run store URL is required (--store or RUN_STORE_URL)")
+    asyncio.run(run_worker(args.store, args.concurrency, args.worker_id))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
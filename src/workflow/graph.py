@@ -4,13 +4,11 @@ import asyncio
 from collections import defaultdict
 from langgraph.graph import StateGraph, START, END, add_messages
 from langgraph.types import Send
-from langchain_aws import ChatBedrockConverse
 import boto3
 from botocore.config import Config
 from langchain_core.messages import AnyMessage, AIMessage
 from langchain_core.runnables import RunnableConfig
 from typing import List, Dict, Any, TypedDict, Annotated, Tuple, Union
-from botocore.exceptions import ClientError
 import random
 from ..tools.final_answer_tools import FinalAnswerTool
 from ..prompts import (
@@ -24,13 +22,25 @@ from ..prompts import (
 import os
 from dotenv import load_dotenv
 import operator
-from langchain_core.output_parsers import JsonOutputParser
 from ..tools.cli_tools import ExecuteShellCommandTool
 from ..tools.resolver_tools import CodeConflictResolverTool
 from ..constants.aws_model import AWSModel
+from ..core.bedrock_model import ManagedChatBedrockConverse
+from ..core.bedrock_pool import create_bedrock_pool
+from ..core.model_router import ModelRouter, load_model_routes
+from ..core.rate_limiter import is_throttling_error, retry_after_seconds
+from ..core.brownout import brownout
+from ..core.cancellation import RunCancelled
+from ..core.deadline import DeadlineExceeded, budgeted
+from ..core.llm_cache import create_llm_cache
+from ..core.semantic_cache import create_semantic_cache
+from ..core.checkpointer import create_checkpointer
 from ..tools.spawn_container import spawn_engineers as spawn_engineers_tool
 from ..agents.resolver_agent_graph import create_resolver_agent
 from ..agents.architect_agent_graph import create_architect_agent
+from ..utils.progress import emit_progress, progress_reporter
+from ..utils.structured_output import structured_chain
+from ..models.schemas import RequirementsDefinition, TechStack, DevelopmentPlan, UserStoryGroups
 import re
 
 load_dotenv()
@@ -177,9 +187,11 @@ class OverallState(TypedDict):
 config = Config(
     read_timeout=900,
     connect_timeout=120,
+    # 스로틀링 재시도는 프로세스 전체가 공유하는 bedrock_limiter가 맡는다.
+    # 클라이언트별 adaptive 재시도는 다른 실행을 알지 못해 재시도 폭주를 일으킨다.
     retries={
-        "max_attempts": 8,
-        "mode": "adaptive"
+        "max_attempts": 1,
+        "mode": "standard"
     },
 )
 
@@ -189,62 +201,76 @@ bedrock_client = boto3.client(
     config=config,
 )
 
-llm = ChatBedrockConverse(
-    model=AWSModel.ANTHROPIC_CLAUDE_4_SONNET_SEOUL_CROSS_REGION,
-    client=bedrock_client,
+# BEDROCK_ENDPOINTS가 있으면 여러 리전/추론 프로파일로 호출을 나누고, 장애가 난 엔드포인트는 자동으로 뺀다
+bedrock_pool = create_bedrock_pool(bedrock_client, AWSModel.ANTHROPIC_CLAUDE_4_SONNET_SEOUL_CROSS_REGION.value, config)
+
+llm = ManagedChatBedrockConverse(
+    model=bedrock_pool.primary.model_id,
+    client=bedrock_pool.primary.client,
+    endpoint_pool=bedrock_pool,
     temperature=0,
     max_tokens=None,
     region_name=os.environ["AWS_DEFAULT_REGION"],
+    # 에이전트 루프가 반복해서 보내는 시스템 프롬프트와 대화 접두부를 Bedrock 프롬프트 캐시에서 재사용한다
+    prompt_caching=os.environ.get("BEDROCK_PROMPT_CACHING", "1") != "0",
 )
 
-async def _retry_async(func, *args, max_retries: int = 6, base_delay: float = 0.5, **kwargs):
+async def _retry_async(func, *args, max_retries: int = 2, base_delay: float = 0.5, **kwargs):
     """
     지수 백오프(+지터)로 비동기 함수를 재시도하는 헬퍼.
     주로 AWS/네트워크 스로틀링(Throttling/TooManyRequests) 계열 오류에 한 번 더
     기회를 주기 위해 사용한다. 지정 횟수만큼 시도하며, 마지막에 한 번 더 최종 실행한다.
+    모델 호출 자체도 공용 rate limiter를 거쳐 재시도되므로, 여기서는 그마저 실패한 경우만 다룬다.
+    그래서 기본값은 2회이며, 호출부(architect 포함)도 따로 늘리지 않는다.
     """
     for attempt in range(max_retries):
         try:
             return await func(*args, **kwargs)
-        except ClientError as e:
-            code = e.response.get("Error", {}).get("Code", "")
-            msg = str(e)
-            if "Throttling" in code or "TooManyRequests" in code or "Rate exceeded" in msg:
-                delay = base_delay * (2 ** attempt) + random.uniform(0, 0.3)
-                await asyncio.sleep(delay)
-                continue
-            raise
         except Exception as e:
-            # Some SDKs surface throttling as generic errors with message only
-            txt = str(e)
-            if any(x in txt for x in ["Throttling", "TooManyRequests", "Rate exceeded"]):
-                delay = base_delay * (2 ** attempt) + random.uniform(0, 0.3)
-                await asyncio.sleep(delay)
-                continue
-            raise
+            if not is_throttling_error(e):
+                raise
+            delay = base_delay * (2 ** attempt) + random.uniform(0, 0.3)
+            # Retry-After가 있으면 그보다 먼저 다시 시도하지 않는다
+            await asyncio.sleep(max(delay, retry_after_seconds(e) or 0))
     # Final try
     return await func(*args, **kwargs)
 
-req_def_chain = req_def_prompts.prompt | llm | JsonOutputParser()
-dev_env_init_chain = dev_env_init_prompts.prompt | llm
-dev_planning_chain = dev_planning_prompts_v2.prompt | llm | JsonOutputParser()
-role_allocate_chain = allocate_role_v1.prompt | llm | JsonOutputParser()
+# MODEL_ROUTES가 있으면 노드/에이전트마다 지정한 모델(과 폴백 순서)을 쓰고, 없으면 모두 llm을 쓴다.
+# BROWNOUT_MODEL_ROUTES에 있는 노드는 과부하(brownout) 동안 더 저렴한 모델로 바뀐다.
+model_router = ModelRouter(llm, load_model_routes(), config, brownout_routes=load_model_routes("BROWNOUT_MODEL_ROUTES"))
+
+# The single-shot chains are deterministic (temperature=0), so identical prompts share one response.
+# The agents are not cached: their turns depend on tool results and have side effects.
+llm_cache = create_llm_cache(os.environ.get("LLM_CACHE_DB", "logs/llm_cache.db"))
+
+def _chain_model(name: str):
+    # A one-shot chain never resends its prompt, so cache points would only add cache-write cost
+    update = {"prompt_caching": False, **({"cache": llm_cache} if llm_cache else {})}
+    return model_router.model_for(name, **update)
+# Paraphrased requests reuse the requirement definition of an earlier, near-identical request
+semantic_cache = create_semantic_cache(os.environ.get("SEMANTIC_CACHE_DB", "logs/semantic_cache.db"))
+
+# 각 단계의 출력은 tool calling으로 스키마에 맞춰 받고, 어긋나면 로컬 보정 후 오류만 돌려보내 한 번 더 고친다.
+req_def_chain = structured_chain(req_def_prompts.prompt, _chain_model("define_req"), RequirementsDefinition)
+dev_env_init_chain = structured_chain(dev_env_init_prompts.prompt, _chain_model("dev_env_init"), TechStack)
+dev_planning_chain = structured_chain(dev_planning_prompts_v2.prompt, _chain_model("dev_planning"), DevelopmentPlan)
+role_allocate_chain = structured_chain(allocate_role_v1.prompt, _chain_model("role_allocate"), UserStoryGroups)
 
 architect_agent = create_architect_agent(
-    model=llm,
+    model=model_router.model_for("architect_agent"),
     tools=[ExecuteShellCommandTool(), FinalAnswerTool()],
     prompt=architect_agent_prompts.prompt,
     name="architect_agent"
 )
 
 resolver_agent = create_resolver_agent(
-    model=llm,
+    model=model_router.model_for("resolver_agent"),
     tools=[ExecuteShellCommandTool(),CodeConflictResolverTool(llm=llm)],
     prompt=resolver_prompts.prompt,
     name="resolver_agent"
 )
 
-async def define_req(state: OverallState):
+async def define_req(state: OverallState, config: RunnableConfig):
     """Processes the initial user input to define project requirements.
 
     This node invokes a language model chain (`req_def_chain`) to analyze the
@@ -253,13 +279,25 @@ async def define_req(state: OverallState):
 
     Args:
         state (InputState): The initial state containing the 'messages' from the user.
+        config (RunnableConfig): Run configuration; its `tenant` scopes the semantic cache.
 
     Returns:
         DefineReqState: An updated state dictionary containing the response from
             the LLM chain under 'messages' and the extracted 'requirements' as a
             list of strings.
     """
-    result = await req_def_chain.ainvoke({'messages': state['messages']})
+    request_text = "\n".join(
+        msg.content for msg in state['messages'] if msg.type == "human" and isinstance(msg.content, str)
+    )
+    tenant = config.get("configurable", {}).get("tenant", "default")
+    result = None
+    if semantic_cache and request_text:
+        # Both the MinHash lookup and the SQLite write run off the event loop
+        result = await asyncio.to_thread(semantic_cache.lookup, request_text, tenant)
+    if result is None:
+        result = await req_def_chain.ainvoke({'messages': state['messages']})
+        if semantic_cache and request_text and isinstance(result, dict):
+            await asyncio.to_thread(semantic_cache.add, request_text, result, tenant)
 
     # result is now a parsed JSON dict
     return {
@@ -299,17 +337,8 @@ async def dev_env_init(state: OverallState):
         "non_functional_reqs": "\n".join(state.get("non_functional_reqs", [])),
     }
 
-    result = await dev_env_init_chain.ainvoke(payload)
-    raw = getattr(result, "content", result)
-    # print("dev_env_init raw:", raw)
-
-    # 1) JSON 파싱
-    try:
-        parsed = json.loads(raw)
-    except Exception:
-        # 안전장치: 파싱 실패 시 빈값 반환
-        parsed = {"language": {}, "framework": {}, "library": {}}
-
+    # 1) TechStack 스키마로 검증된 dict
+    parsed = await dev_env_init_chain.ainvoke(payload)
 
     # 2) 스키마 정규화
     lang_fe = _ensure_list(parsed.get("language", {}).get("frontend"))
@@ -333,7 +362,7 @@ async def dev_env_init(state: OverallState):
     library   = _dedup(lib_fe + lib_be)
 
     return {
-        "messages": [result],
+        "messages": [AIMessage(content=json.dumps(parsed))],
         "language": language,
         "framework": framework,
         "library": library,
@@ -378,7 +407,7 @@ async def dev_planning(state: OverallState):
         "directory_tree": parsed.get("directory_tree", [])
     }
 
-async def architect(state: OverallState):
+async def architect(state: OverallState, config: RunnableConfig):
     """Acts as the software architect to implement the main goals.
 
     This node invokes the `architect_agent_chain` to review and potentially
@@ -501,8 +530,8 @@ async def architect(state: OverallState):
         task = _retry_async(
             architect_agent.ainvoke,
             plan,
-            config={"recursion_limit": 100},
-            max_retries=7,
+            # 과부하 중에는 에이전트 단계 예산을 줄인다
+            config={"recursion_limit": brownout.recursion_limit(100)},
             base_delay=0.6,
         )
 
@@ -510,7 +539,11 @@ async def architect(state: OverallState):
 
     results = []
     if tasks:
-        results = await asyncio.gather(*tasks)
+        owners = [owner for owner, builder in plan_builders.items() if builder["sub_goals"]]
+        await emit_progress("architect_started", {"owners": owners}, config)
+        # Heartbeats keep the stream alive while the architect agents work
+        async with progress_reporter(config, heartbeat={"node": "architect", "owners": owners}):
+            results = await asyncio.gather(*tasks)
 
     merged_messages = []
     for result in results:
@@ -533,6 +566,7 @@ async def architect(state: OverallState):
     elapsed_time = end_time - start_time
 
     print(f"\n작업에 총 {elapsed_time:.4f}초가 걸렸습니다.")
+    await emit_progress("architect_finished", {"elapsed_seconds": round(elapsed_time, 1)}, config)
 
     return {
         "messages": merged_messages,
@@ -574,7 +608,7 @@ async def role_allocate(state: OverallState):
     })
     return {"messages": [AIMessage(content=json.dumps(result))], "user_story_groups": result.get("user_story_groups", [])}
 
-async def spawn_engineers(state: OverallState):
+async def spawn_engineers(state: OverallState, config: RunnableConfig):
     """A placeholder node for the software engineer agents' work.
 
     In a complete implementation, this node would likely be replaced by a
@@ -605,17 +639,22 @@ async def spawn_engineers(state: OverallState):
     if len(user_story_groups) == 0:
         return {}
 
-    # Run container spawning in a background thread and wait for completion
+    # Run container spawning in a background thread and wait for completion.
+    # Container lifecycle events and heartbeats are forwarded to the event stream.
     try:
-        results = await asyncio.to_thread(
-            spawn_engineers_tool,
-            state['base_url'],
-            {
-                "fe_branch_name": state['fe_branch_name'],
-                "be_branch_name": state['be_branch_name']
-            },
-            user_story_groups,
-        )
+        async with progress_reporter(config, heartbeat={"node": "spawn_engineers"}) as report:
+            results = await asyncio.to_thread(
+                spawn_engineers_tool,
+                state['base_url'],
+                {
+                    "fe_branch_name": state['fe_branch_name'],
+                    "be_branch_name": state['be_branch_name']
+                },
+                user_story_groups,
+                report,
+            )
+    except (RunCancelled, DeadlineExceeded):
+        raise
     except Exception:
         # Swallow errors here to avoid crashing the graph; downstream resolver can proceed
         results = []
@@ -644,7 +683,7 @@ async def resolver(state: OverallState):
             'project_dir': state['branch_name'],
             'base_branch': state['branch_name']
         },
-        config={"recursion_limit": 100}
+        config={"recursion_limit": brownout.recursion_limit(100)}
     )
     # agent_results = {}
     # for agent_name, agent_result in state["agent_state"]:
@@ -654,14 +693,25 @@ async def resolver(state: OverallState):
     # result = await resolver_chain.ainvoke({'messages': state['messages']})
     return {"messages": result['messages'], "response": result['resolver_result']}
 
+# Relative share of the run deadline each stage gets, in execution order.
+# Time left over by a stage is shared among the stages after it.
+STAGE_BUDGET_WEIGHTS = json.loads(os.environ.get("STAGE_BUDGET_WEIGHTS", "null")) or {
+    "define_req": 1,
+    "dev_env_init": 1,
+    "dev_planning": 2,
+    "architect": 12,
+    "role_allocate": 1,
+    "spawn_engineers": 24,
+}
+
 graph_builder = StateGraph(state_schema=OverallState)
-graph_builder.add_node("define_req", define_req)
-graph_builder.add_node("dev_env_init", dev_env_init)
-graph_builder.add_node("dev_planning", dev_planning)
-graph_builder.add_node("architect", architect)
-graph_builder.add_node("role_allocate", role_allocate)
-graph_builder.add_node("spawn_engineers", spawn_engineers)
-graph_builder.add_node("resolver", resolver)
+graph_builder.add_node("define_req", budgeted("define_req", define_req, STAGE_BUDGET_WEIGHTS))
+graph_builder.add_node("dev_env_init", budgeted("dev_env_init", dev_env_init, STAGE_BUDGET_WEIGHTS))
+graph_builder.add_node("dev_planning", budgeted("dev_planning", dev_planning, STAGE_BUDGET_WEIGHTS))
+graph_builder.add_node("architect", budgeted("architect", architect, STAGE_BUDGET_WEIGHTS))
+graph_builder.add_node("role_allocate", budgeted("role_allocate", role_allocate, STAGE_BUDGET_WEIGHTS))
+graph_builder.add_node("spawn_engineers", budgeted("spawn_engineers", spawn_engineers, STAGE_BUDGET_WEIGHTS))
+graph_builder.add_node("resolver", budgeted("resolver", resolver, STAGE_BUDGET_WEIGHTS))
 
 graph_builder.add_edge(START, "define_req")
 graph_builder.add_edge("define_req", END)
@@ -674,5 +724,6 @@ graph_builder.add_edge("architect", "role_allocate")
 graph_builder.add_edge("role_allocate", "spawn_engineers")
 graph_builder.add_edge("resolver", END)
 
-graph = graph_builder.compile()
+# Checkpoints after every node, keyed by run id, let failed or interrupted runs resume from the last finished node
+graph = graph_builder.compile(checkpointer=create_checkpointer(os.environ.get("GRAPH_CHECKPOINT_DB", "logs/checkpoints.db")))
 graph.name = "agentic-coding-graph"
@@ -0,0 +1,43 @@
+import os
+import tempfile
+from contextlib import asynccontextmanager
+
+import pytest
+
+# src.main builds the real graph, caches and checkpointer at import time; keep their files out of the tree
+_STATE_DIR = tempfile.mkdtemp(prefix="agentic-coding-tests-")
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+os.environ.setdefault("LLM_CACHE_DB", os.path.join(_STATE_DIR, "llm_cache.db"))
+os.environ.setdefault("SEMANTIC_CACHE_DB", os.path.join(_STATE_DIR, "semantic_cache.db"))
+os.environ.setdefault("GRAPH_CHECKPOINT_DB", os.path.join(_STATE_DIR, "checkpoints.db"))
+os.environ.setdefault("EVENT_LOG_DIR", os.path.join(_STATE_DIR, "runs"))
+os.environ.setdefault("RUN_CHECKPOINT_FILE", os.path.join(_STATE_DIR, "pending_runs.json"))
+
+@pytest.fixture
+def api(tmp_path, monkeypatch):
+    """
+    Serves the FastAPI app with a `WorkflowRunService` running `graph`.
+
+    Usage: `async with api(graph, **service_kwargs) as (client, service): ...`.
+    The app's lifespan (GitHub token, container cleanup) is not run.
+    """
+    import httpx
+
+    from src import main
+    from src.services.event_log import EventLogStore
+    from src.services.run_service import WorkflowRunService
+
+    @asynccontextmanager
+    async def serve(graph, **kwargs):
+        kwargs.setdefault("event_logs", EventLogStore(str(tmp_path / "runs")))
+        service = WorkflowRunService(graph, **kwargs)
+        monkeypatch.setattr(main.app.state, "run_service", service)
+        await service.start()
+        try:
+            transport = httpx.ASGITransport(app=main.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                yield client, service
+        finally:
+            await service.stop()
+
+    return serve
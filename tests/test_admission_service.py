@@ -0,0 +1,110 @@
+import asyncio
+
+import pytest
+
+from src.services.admission_service import AdmissionRejected, FairRunQueue, estimate_retry_after
+from src.services.event_log import EventLogStore
+from src.services.run_service import WorkflowRunService
+from test_run_api import body, echo_graph
+
+def drain_order(queue: FairRunQueue) -> list:
+    async def pop_all():
+        return [await queue.get() for _ in range(queue.qsize())]
+    return asyncio.run(pop_all())
+
+def test_burst_from_one_tenant_does_not_starve_another():
+    queue = FairRunQueue()
+    for i in range(5):
+        queue.put_nowait("a", f"a{i}")
+    queue.put_nowait("b", "b0")
+    queue.put_nowait("b", "b1")
+
+    order = drain_order(queue)
+
+    assert order[:4] == ["a0", "b0", "a1", "b1"]
+    assert order[4:] == ["a2", "a3", "a4"]
+
+def test_weights_give_proportional_shares():
+    queue = FairRunQueue(weights={"gold": 2.0})
+    for i in range(6):
+        queue.put_nowait("gold", f"g{i}")
+        queue.put_nowait("free", f"f{i}")
+
+    first_six = drain_order(queue)[:6]
+
+    assert sum(item.startswith("g") for item in first_six) == 4
+
+def test_fifo_within_a_tenant_and_discard():
+    queue = FairRunQueue()
+    items = [object() for _ in range(3)]
+    for item in items:
+        queue.put_nowait("a", item)
+
+    assert queue.discard("a", items[1])
+    assert not queue.discard("a", items[1])
+    assert not queue.discard("b", items[0])
+    assert drain_order(queue) == [items[0], items[2]]
+
+def test_rejection_reasons():
+    queue = FairRunQueue(max_queued=3, max_queued_per_tenant=2)
+    queue.put_nowait("a", 1)
+    queue.put_nowait("a", 2)
+
+    assert "Tenant 'a'" in queue.rejection_reason("a")
+    assert queue.rejection_reason("b") is None
+
+    queue.put_nowait("b", 3)
+    assert queue.rejection_reason("c") == "Too many runs are queued"
+
+    queue.closed = True
+    assert "shutting down" in queue.rejection_reason("c")
+
+@pytest.mark.parametrize(
+    ("queued", "concurrency", "avg_run_seconds", "expected"),
+    [
+        (0, 4, 600.0, 150),
+        (7, 4, 600.0, 1200),
+        (0, 1, 0.1, 1),
+        (3, 0, 10.0, 40),
+    ],
+)
+def test_estimate_retry_after(queued, concurrency, avg_run_seconds, expected):
+    assert estimate_retry_after(queued, concurrency, avg_run_seconds) == expected
+
+def test_submit_rejects_with_retry_after(tmp_path):
+    service = WorkflowRunService(
+        graph=None,
+        max_concurrency=2,
+        queue=FairRunQueue(max_queued=1),
+        event_logs=EventLogStore(str(tmp_path)),
+    )
+    service.submit({"user_request": "first"}, tenant="a")
+
+    with pytest.raises(AdmissionRejected) as rejected:
+        service.submit({"user_request": "second"}, tenant="b")
+    assert rejected.value.status_code == 429
+    # One run ahead, two workers, 600 s per run
+    assert rejected.value.retry_after == 600
+
+    service._queue.closed = True
+    with pytest.raises(AdmissionRejected) as rejected:
+        service.submit({"user_request": "third"}, tenant="b")
+    assert rejected.value.status_code == 503
+
+def test_api_answers_429_with_retry_after(api):
+    async def scenario():
+        release = asyncio.Event()
+        queue = FairRunQueue(max_queued=1, max_queued_per_tenant=1)
+        async with api(echo_graph(release), max_concurrency=1, queue=queue) as (client, _):
+            # One run occupies the worker and one waits in the queue
+            for text in ("first", "second"):
+                assert (await client.post("/runs", json=body(text), headers={"X-Tenant-ID": "a"})).status_code == 202
+                await asyncio.sleep(0.05)
+
+            rejected = await client.post("/runs", json=body("third"), headers={"X-Tenant-ID": "b"})
+            assert rejected.status_code == 429
+            assert int(rejected.headers["Retry-After"]) >= 1
+            assert rejected.json()["detail"] == "Too many runs are queued"
+            release.set()
+
+    asyncio.run(scenario())
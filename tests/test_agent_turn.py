@@ -0,0 +1,126 @@
+import asyncio
+from typing import Any, Iterator
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+from langchain_core.runnables import RunnableLambda
+from langchain_core.tools import tool
+
+from src.agents.resolver_agent_graph import create_resolver_agent
+from src.prebuilt import run_agent_turn
+
+@tool
+def shell(command: str) -> str:
+    """Run a shell command."""
+    return f"ran {command}"
+
+class ScriptedChatModel(BaseChatModel):
+    """Answers with the scripted turns in order, streaming text word by word and tool arguments in pieces."""
+
+    turns: list[dict]
+    calls: list[str] = []
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted"
+
+    def bind_tools(self, tools: Any, **kwargs: Any):
+        return self
+
+    def _next_turn(self, mode: str) -> dict:
+        self.calls.append(mode)
+        return self.turns[len(self.calls) - 1]
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        turn = self._next_turn("generate")
+        message = AIMessage(content=turn.get("text", ""), tool_calls=[
+            {"id": call["id"], "name": call["name"], "args": call["args"]} for call in turn.get("tool_calls", [])
+        ])
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs) -> Iterator[ChatGenerationChunk]:
+        turn = self._next_turn("stream")
+        for word in turn.get("text", "").split(" "):
+            yield ChatGenerationChunk(message=AIMessageChunk(content=word + " "))
+        for index, call in enumerate(turn.get("tool_calls", [])):
+            yield ChatGenerationChunk(message=AIMessageChunk(
+                content="", tool_call_chunks=[{"id": call["id"], "name": call["name"], "args": "", "index": index}]
+            ))
+            for piece in call["raw_args"]:
+                yield ChatGenerationChunk(message=AIMessageChunk(
+                    content="", tool_call_chunks=[{"args": piece, "index": index}]
+                ))
+
+PROMPT = ChatPromptTemplate.from_messages([("system", "You resolve merge conflicts."), MessagesPlaceholder("messages")])
+
+LIST_FILES = {
+    "text": "Let me look around.",
+    "tool_calls": [{"id": "call-1", "name": "shell", "args": {"command": "ls"}, "raw_args": ['{"comm', 'and": "l', 's"}']}],
+}
+FINISH = {"text": '{"final_url": "https://example.com/pr/1"}'}
+
+def test_streamed_turn_emits_tokens_and_returns_the_whole_message():
+    chain = PROMPT | ScriptedChatModel(turns=[LIST_FILES])
+
+    async def turn(state, config):
+        return await run_agent_turn(chain, state, config)
+
+    async def scenario():
+        chunks, message = [], None
+        async for event in RunnableLambda(turn, name="turn").astream_events({"messages": []}, version="v2"):
+            if event["event"] == "on_chat_model_stream":
+                chunks.append(event["data"]["chunk"])
+            if event["event"] == "on_chain_end" and event["name"] == "turn":
+                message = event["data"]["output"]
+        return chunks, message
+
+    chunks, message = asyncio.run(scenario())
+
+    assert [chunk.content for chunk in chunks if chunk.content] == ["Let ", "me ", "look ", "around. "]
+    assert "".join(piece["args"] for chunk in chunks for piece in chunk.tool_call_chunks) == '{"command": "ls"}'
+    assert type(message) is AIMessage
+    assert message.content == "Let me look around. "
+    assert message.tool_calls == [{"id": "call-1", "name": "shell", "args": {"command": "ls"}, "type": "tool_call"}]
+
+def test_turn_without_streaming_waits_for_the_whole_response():
+    model = ScriptedChatModel(turns=[LIST_FILES])
+
+    message = asyncio.run(run_agent_turn(PROMPT | model, {"messages": []}, streaming=False))
+
+    assert model.calls == ["generate"]
+    assert message.tool_calls[0]["args"] == {"command": "ls"}
+
+def resolve(streaming: bool) -> tuple[list, dict, list[str]]:
+    model = ScriptedChatModel(turns=[LIST_FILES, FINISH])
+    agent = create_resolver_agent(model, [shell], PROMPT, streaming=streaming)
+
+    async def scenario():
+        tokens, state = [], None
+        inputs = {"messages": [], "base_branch": "main", "project_dir": "/repo"}
+        async for event in agent.astream_events(inputs, version="v2"):
+            if event["event"] == "on_chat_model_stream":
+                tokens.append(event["data"]["chunk"].content)
+            if event["event"] == "on_chain_end" and event["name"] == agent.name:
+                state = event["data"]["output"]
+        return tokens, state
+
+    tokens, state = asyncio.run(scenario())
+    return tokens, state, model.calls
+
+def test_agent_streams_its_turns_into_the_event_stream():
+    tokens, state, calls = resolve(streaming=True)
+
+    assert calls == ["stream", "stream"]
+    assert "".join(tokens).split() == ["Let", "me", "look", "around.", '{"final_url":', '"https://example.com/pr/1"}']
+    # The streamed tool call was run before the second turn
+    assert state["messages"][-2].content == "ran ls"
+    assert state["resolver_result"].final_url == "https://example.com/pr/1"
+
+def test_agent_without_streaming_sends_whole_turns():
+    tokens, state, calls = resolve(streaming=False)
+
+    assert calls == ["generate", "generate"]
+    assert tokens == []
+    assert state["resolver_result"].final_url == "https://example.com/pr/1"
@@ -0,0 +1,99 @@
+import json
+
+import pytest
+from langgraph.graph import END, START, StateGraph
+
+from src import batch
+from test_run_api import State
+
+def job_graph(executions: list[str]):
+    """Answers every job, except jobs asking to fail."""
+    async def answer(state: State) -> dict:
+        text = state["messages"][-1].content
+        executions.append(text)
+        if "fail" in text:
+            raise ValueError(f"cannot do {text}")
+        return {"response": f"done: {text}", "steps": ["answer"]}
+
+    builder = StateGraph(State)
+    builder.add_node("answer", answer)
+    builder.add_edge(START, "answer")
+    builder.add_edge("answer", END)
+    return builder.compile()
+
+@pytest.fixture
+def executions(monkeypatch, tmp_path):
+    executions = []
+    monkeypatch.setattr(batch, "graph", job_graph(executions))
+    monkeypatch.setattr(batch, "load_github_config", lambda: None)
+    monkeypatch.setenv("EVENT_LOG_DIR", str(tmp_path / "runs"))
+    return executions
+
+def write_jobs(path, *jobs, blank_lines: bool = False) -> str:
+    lines = [json.dumps(job) for job in jobs]
+    path.write_text(("\n\n" if blank_lines else "\n").join(lines) + "\n", encoding="utf-8")
+    return str(path)
+
+def read_results(path) -> dict[str, dict]:
+    return {record["id"]: record for record in map(json.loads, path.read_text(encoding="utf-8").splitlines())}
+
+def test_read_jobs_numbers_jobs_by_line(tmp_path):
+    path = write_jobs(
+        tmp_path / "jobs.jsonl",
+        {"input": "a", "git_url": "g"},
+        {"id": "named", "input": "b", "git_url": "g"},
+        blank_lines=True,
+    )
+
+    assert [job["id"] for job in batch.read_jobs(path)] == ["1", "named"]
+
+def test_read_jobs_rejects_incomplete_jobs(tmp_path):
+    path = write_jobs(tmp_path / "jobs.jsonl", {"input": "a"})
+
+    with pytest.raises(ValueError, match="jobs.jsonl:1"):
+        batch.read_jobs(path)
+
+def test_batch_runs_every_job_and_reports_failures(executions, tmp_path):
+    jobs = write_jobs(
+        tmp_path / "jobs.jsonl",
+        {"id": "a", "input": "todo app", "git_url": "g"},
+        {"id": "b", "input": "todo app", "git_url": "g"},
+        {"id": "c", "input": "please fail", "git_url": "g"},
+    )
+    output = tmp_path / "results.jsonl"
+
+    exit_code = batch.main([jobs, "-o", str(output), "-c", "2", "--fields", "response"])
+
+    assert exit_code == 1
+    results = read_results(output)
+    assert {job: record["status"] for job, record in results.items()} == {"a": "succeeded", "b": "succeeded", "c": "failed"}
+    assert results["a"]["response"] == {"response": "done: todo app"}
+    # Identical jobs share one run
+    assert results["a"]["run_id"] == results["b"]["run_id"]
+    assert sorted(executions) == ["please fail", "todo app"]
+    assert results["c"]["error"] == "cannot do please fail"
+
+def test_resume_skips_jobs_that_already_succeeded(executions, tmp_path):
+    jobs = write_jobs(
+        tmp_path / "jobs.jsonl",
+        {"id": "a", "input": "first", "git_url": "g"},
+        {"id": "b", "input": "please fail", "git_url": "g"},
+    )
+    output = tmp_path / "results.jsonl"
+    assert batch.main([jobs, "-o", str(output)]) == 1
+    assert batch.completed_job_ids(str(output)) == {"a"}
+
+    executions.clear()
+    assert batch.main([jobs, "-o", str(output), "--resume"]) == 1
+
+    assert executions == ["please fail"]
+    lines = output.read_text(encoding="utf-8").splitlines()
+    assert [json.loads(line)["id"] for line in lines].count("b") == 2
+
+def test_nothing_to_run(executions, tmp_path):
+    jobs = write_jobs(tmp_path / "jobs.jsonl", {"id": "a", "input": "first", "git_url": "g"})
+    output = tmp_path / "results.jsonl"
+    batch.main([jobs, "-o", str(output)])
+
+    assert batch.main([jobs, "-o", str(output), "--resume"]) == 0
+    assert len(output.read_text(encoding="utf-8").splitlines()) == 1
@@ -0,0 +1,164 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from botocore.exceptions import ClientError
+
+from src.core import bedrock_model
+from src.core.bedrock_model import ManagedChatBedrockConverse
+from src.core.bedrock_pool import BedrockEndpoint, BedrockEndpointPool, StubBedrockClient
+from src.core.capacity import CapacityGate
+from src.core.hedging import HedgePolicy
+from src.core.rate_limiter import AdaptiveRateLimiter
+
+MODEL_ID = "us.anthropic.claude-sonnet-4-20250514-v1:0"
+
+class TrackingClient(StubBedrockClient):
+    """Stub client that records the threads and the number of requests in flight."""
+    def __init__(self, latency: float = 0.0):
+        super().__init__(latency=latency)
+        self.threads = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def converse(self, **request) -> dict:
+        with self._lock:
+            self.threads.append(threading.current_thread().name)
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            return super().converse(**request)
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+@pytest.fixture
+def limiter(monkeypatch):
+    """A fresh limiter of four slots in place of the process-wide one."""
+    limiter = AdaptiveRateLimiter(CapacityGate("bedrock_calls", 4))
+    monkeypatch.setattr(bedrock_model, "bedrock_limiter", limiter)
+    return limiter
+
+def model(client) -> ManagedChatBedrockConverse:
+    return ManagedChatBedrockConverse(model=MODEL_ID, client=client, region_name="us-east-1", temperature=0)
+
+def test_async_calls_run_on_the_bedrock_executor(limiter):
+    client = TrackingClient(latency=0.2)
+
+    async def scenario():
+        # With a single default thread, calls going through it would run one after another
+        asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(1))
+        started = time.monotonic()
+        answers = await asyncio.gather(*(model(client).ainvoke(f"question {i}") for i in range(4)))
+        return answers, time.monotonic() - started
+
+    answers, elapsed = asyncio.run(scenario())
+
+    assert [answer.content for answer in answers] == [f"question {i}" for i in range(4)]
+    assert elapsed < 0.6
+    assert all(name.startswith("bedrock") for name in client.threads)
+
+def test_calls_waiting_for_a_slot_hold_no_thread(limiter):
+    client = TrackingClient(latency=0.1)
+    limiter.gate.set_limit(2)
+    limiter.max_concurrency = 2
+
+    async def scenario():
+        calls = [asyncio.ensure_future(model(client).ainvoke(f"question {i}")) for i in range(6)]
+        await asyncio.sleep(0.05)
+        waiting = limiter.stats()["queue_depth"]
+        await asyncio.gather(*calls)
+        return waiting
+
+    waiting = asyncio.run(scenario())
+
+    # Four calls wait on the event loop while two are sent
+    assert waiting == 4
+    assert client.max_in_flight == 2
+    assert limiter.gate.stats()["in_use"] == 0
+
+class SlowClient(TrackingClient):
+    """Tracking client whose requests block until `release` is set."""
+    def __init__(self):
+        super().__init__()
+        self.release = threading.Event()
+        self.returned = threading.Event()
+
+    def converse(self, **request) -> dict:
+        try:
+            self.release.wait(5)
+            return super().converse(**request)
+        finally:
+            self.returned.set()
+
+def wait_until(predicate, timeout: float = 2.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+@pytest.fixture
+def hedging(monkeypatch):
+    """Hedges every call that has not answered after 50 ms."""
+    policy = HedgePolicy(percentile=50, min_samples=1, max_fraction=1.0)
+    policy.observe("default:response", 0.05, 1, False, False)
+    monkeypatch.setattr(bedrock_model, "hedge_policy", policy)
+    return policy
+
+def test_losing_hedge_keeps_its_slot_until_its_thread_returns(limiter, hedging):
+    slow, fast = SlowClient(), TrackingClient()
+    endpoints = BedrockEndpointPool([
+        BedrockEndpoint("slow", slow, MODEL_ID, weight=1000),
+        BedrockEndpoint("fast", fast, MODEL_ID),
+    ])
+    endpoints._random.seed(0)
+    hedged = ManagedChatBedrockConverse(
+        model=MODEL_ID, client=slow, endpoint_pool=endpoints, region_name="us-east-1", temperature=0,
+    )
+
+    answer = asyncio.run(hedged.ainvoke("question"))
+
+    assert answer.content == "question"
+    assert hedging.stats()["hedge_wins"] == 1
+    # The cancelled request is still waiting for Bedrock on its thread, and still holds its slot
+    assert not slow.returned.is_set()
+    assert limiter.gate.stats()["in_use"] == 1
+
+    slow.release.set()
+    wait_until(slow.returned.is_set)
+    wait_until(lambda: limiter.gate.stats()["in_use"] == 0)
+
+def test_cancelled_call_keeps_its_slot_until_its_thread_returns(limiter):
+    client = SlowClient()
+
+    async def scenario():
+        call = asyncio.ensure_future(model(client).ainvoke("question"))
+        await asyncio.sleep(0.1)
+        call.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await call
+        return limiter.gate.stats()["in_use"]
+
+    in_use = asyncio.run(scenario())
+
+    assert in_use == 1
+    client.release.set()
+    wait_until(lambda: limiter.gate.stats()["in_use"] == 0)
+
+def test_slots_of_finished_and_failed_calls_are_released(limiter):
+    invalid = StubBedrockClient()
+    invalid.converse = lambda **request: (_ for _ in ()).throw(
+        ClientError({"Error": {"Code": "ValidationException", "Message": "bad"}}, "Converse")
+    )
+
+    async def scenario():
+        await model(TrackingClient()).ainvoke("question")
+        with pytest.raises(ClientError):
+            await model(invalid).ainvoke("question")
+        return "".join([chunk.text() async for chunk in model(TrackingClient()).astream("streamed")])
+
+    assert asyncio.run(scenario()) == "streamed"
+    assert limiter.gate.stats()["in_use"] == 0
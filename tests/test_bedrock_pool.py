@@ -0,0 +1,137 @@
+import asyncio
+import json
+import time
+
+import pytest
+from botocore.exceptions import ClientError, EndpointConnectionError
+
+from src.core import bedrock_model, bedrock_pool
+from src.core.bedrock_model import ManagedChatBedrockConverse
+from src.core.bedrock_pool import (
+    BedrockEndpoint,
+    BedrockEndpointPool,
+    StubBedrockClient,
+    create_bedrock_pool,
+    is_endpoint_failure,
+)
+from src.core.capacity import CapacityGate
+from src.core.rate_limiter import AdaptiveRateLimiter
+
+MODEL_ID = "us.anthropic.claude-sonnet-4-20250514-v1:0"
+
+def client_error(code: str, status: int, headers: dict | None = None) -> ClientError:
+    return ClientError(
+        {"Error": {"Code": code, "Message": code}, "ResponseMetadata": {"HTTPStatusCode": status, "HTTPHeaders": headers or {}}},
+        "Converse",
+    )
+
+UNAVAILABLE = client_error("ServiceUnavailableException", 503)
+
+def test_endpoint_failures_are_told_apart_from_bad_requests():
+    assert is_endpoint_failure(client_error("ThrottlingException", 429))
+    assert is_endpoint_failure(UNAVAILABLE)
+    assert is_endpoint_failure(EndpointConnectionError(endpoint_url="https://bedrock"))
+    assert not is_endpoint_failure(client_error("ValidationException", 400))
+    assert not is_endpoint_failure(ValueError("bad prompt"))
+
+def pool(*weights: float) -> BedrockEndpointPool:
+    return BedrockEndpointPool(
+        BedrockEndpoint(f"e{i}", StubBedrockClient(), MODEL_ID, weight) for i, weight in enumerate(weights)
+    )
+
+def test_circuit_opens_after_consecutive_failures_and_drains_the_endpoint():
+    endpoints = pool(1, 1)
+    failing, healthy = endpoints.endpoints
+
+    for _ in range(bedrock_pool.BREAKER_FAILURES - 1):
+        endpoints.report_failure(failing, UNAVAILABLE)
+    assert failing.state(time.monotonic()) == "closed"
+    endpoints.report_failure(failing, client_error("ValidationException", 400))
+    assert failing.consecutive_failures == bedrock_pool.BREAKER_FAILURES - 1
+    endpoints.report_failure(failing, UNAVAILABLE)
+
+    assert failing.state(time.monotonic()) == "open"
+    assert {endpoints.choose().name for _ in range(20)} == {"e1"}
+    assert not endpoints.has_alternative(healthy)
+    assert endpoints.stats()[0]["circuit_opens"] == 1
+
+def test_retry_after_opens_the_circuit_at_once_for_at_least_that_long():
+    endpoints = pool(1, 1)
+    endpoint = endpoints.primary
+
+    endpoints.report_failure(endpoint, client_error("ThrottlingException", 429, {"retry-after": "120"}))
+
+    assert endpoint.open_until - time.monotonic() > 100
+
+def test_half_open_endpoint_gets_a_single_probe():
+    endpoints = pool(1, 0.000001)
+    endpoint = endpoints.primary
+    endpoint.open_until = time.monotonic() - 1
+
+    assert endpoints.choose() is endpoint
+    # The probe is in flight, so the other endpoint takes the calls
+    assert {endpoints.choose().name for _ in range(10)} == {"e1"}
+
+    endpoints.report_failure(endpoint, UNAVAILABLE)
+    assert endpoint.cooldown == 2 * bedrock_pool.BREAKER_COOLDOWN_SECONDS
+    assert endpoint.state(time.monotonic()) == "open"
+
+    endpoint.open_until = time.monotonic() - 1
+    assert endpoints.choose(exclude=[endpoints.endpoints[1]]) is endpoint
+    endpoints.report_success(endpoint, 0.5)
+    assert endpoint.state(time.monotonic()) == "closed"
+    assert endpoint.cooldown == bedrock_pool.BREAKER_COOLDOWN_SECONDS
+
+def test_fully_drained_pool_still_tries_the_endpoint_that_recovers_first():
+    endpoints = pool(1, 1)
+    now = time.monotonic()
+    endpoints.endpoints[0].open_until = now + 60
+    endpoints.endpoints[1].open_until = now + 10
+
+    assert endpoints.choose().name == "e1"
+    assert endpoints.choose(exclude=[endpoints.endpoints[1]]).name == "e0"
+
+def test_pool_is_built_from_bedrock_endpoints(monkeypatch):
+    monkeypatch.setenv("BEDROCK_ENDPOINTS", json.dumps([
+        {"name": "local", "stub": {"latency": 0.1}, "weight": 2},
+        {"region": "us-east-1", "model": "ANTHROPIC_CLAUDE_4_SONNET_CROSS_REGION"},
+    ]))
+
+    endpoints = create_bedrock_pool(object(), MODEL_ID)
+
+    assert [endpoint.name for endpoint in endpoints.endpoints] == ["local", "us-east-1"]
+    assert isinstance(endpoints.primary.client, StubBedrockClient)
+    assert endpoints.primary.client.latency == 0.1
+    assert endpoints.primary.weight == 2
+
+@pytest.fixture
+def failover_model(monkeypatch):
+    """A model routed mostly to an endpoint that always fails, and to one that answers."""
+    monkeypatch.setattr(bedrock_model, "bedrock_limiter", AdaptiveRateLimiter(CapacityGate("bedrock_calls", 4)))
+    monkeypatch.setattr(bedrock_model, "_backoff", lambda attempt: 0.0)
+    endpoints = BedrockEndpointPool([
+        BedrockEndpoint("down", StubBedrockClient(error_rate=1.0), MODEL_ID, weight=1000),
+        BedrockEndpoint("up", StubBedrockClient(), MODEL_ID),
+    ])
+    endpoints._random.seed(0)
+    model = ManagedChatBedrockConverse(
+        model=MODEL_ID, client=endpoints.primary.client, endpoint_pool=endpoints, region_name="us-east-1", temperature=0,
+    )
+    return model, endpoints
+
+def test_failed_calls_move_to_another_endpoint(failover_model):
+    model, endpoints = failover_model
+
+    async def ask():
+        return [(await model.ainvoke(f"question {i}")).content for i in range(5)]
+
+    answers = [model.invoke("question sync").content, *asyncio.run(ask())]
+    streamed = "".join(chunk.text() for chunk in model.stream("streamed question"))
+
+    assert answers == ["question sync", *(f"question {i}" for i in range(5))]
+    assert streamed == "streamed question"
+    down, up = endpoints.stats()
+    # Every call sent to the failing endpoint was retried on the other one until its circuit opened
+    assert down["requests"] == down["failures"] == bedrock_pool.BREAKER_FAILURES
+    assert down["state"] == "open"
+    assert up["failures"] == 0 and up["state"] == "closed"
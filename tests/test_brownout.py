@@ -0,0 +1,111 @@
+import time
+
+import pytest
+
+from src.core import bedrock_model
+from src.core.bedrock_model import ManagedChatBedrockConverse
+from src.core.bedrock_pool import StubBedrockClient
+from src.core.brownout import BrownoutController
+from src.core.capacity import CapacityGate
+from src.core.rate_limiter import AdaptiveRateLimiter
+
+class Signal:
+    def __init__(self, value: float = 0.0):
+        self.value = value
+        self.reads = 0
+
+    def __call__(self) -> float:
+        self.reads += 1
+        return self.value
+
+def controller(signal: Signal, threshold: float = 10, **options) -> BrownoutController:
+    brownout = BrownoutController(enabled=True, interval=0, min_seconds=0.1, **options)
+    brownout.add_signal("queue", signal, threshold)
+    return brownout
+
+def test_brownout_starts_at_the_threshold_and_degrades_work():
+    queue = Signal(9)
+    brownout = controller(queue)
+    assert not brownout.active
+    assert brownout.recursion_limit(100) == 100
+    assert brownout.container_token_limits(9136, 1024) == (9136, 1024)
+
+    queue.value = 10
+
+    assert brownout.active
+    assert brownout.recursion_limit(100) == 50
+    assert brownout.recursion_limit(12) == 10
+    assert brownout.container_token_limits(9136, 1024) == (4096, 0)
+    assert brownout.stats()["activations"] == 1
+
+def test_brownout_ends_only_after_load_stays_low():
+    queue = Signal(20)
+    brownout = controller(queue)
+    assert brownout.active
+
+    # Below the threshold but above exit_ratio of it
+    queue.value = 6
+    time.sleep(0.15)
+    assert brownout.active
+
+    queue.value = 4
+    assert brownout.active
+    time.sleep(0.15)
+    assert not brownout.active
+    assert brownout.stats()["brownout_seconds"] >= 0.3
+
+def test_signals_are_sampled_once_per_interval():
+    queue = Signal(20)
+    brownout = controller(queue)
+    brownout.interval = 60
+
+    for _ in range(5):
+        assert brownout.active
+    queue.value = 0
+
+    assert brownout.active
+    assert queue.reads == 1
+
+def test_disabled_controller_ignores_every_signal():
+    queue = Signal(100)
+    brownout = BrownoutController(enabled=False, interval=0)
+    brownout.add_signal("queue", queue, 10)
+
+    assert not brownout.active
+    assert queue.reads == 0
+
+def test_unreadable_and_disabled_signals_are_left_out():
+    def broken():
+        raise RuntimeError("store is down")
+
+    brownout = BrownoutController(enabled=True, interval=0)
+    brownout.add_signal("broken", broken, 1)
+    brownout.add_signal("off", Signal(100), 0)
+
+    assert not brownout.active
+    assert set(brownout.stats()["signals"]) == {"broken"}
+
+@pytest.fixture
+def brownout(monkeypatch):
+    queue = Signal()
+    brownout = controller(queue)
+    monkeypatch.setattr(bedrock_model, "brownout", brownout)
+    monkeypatch.setattr(bedrock_model, "bedrock_limiter", AdaptiveRateLimiter(CapacityGate("bedrock_calls", 4)))
+    return queue
+
+def test_models_switch_to_their_brownout_model_while_it_lasts(brownout):
+    model_id = "us.anthropic.claude-sonnet-4-20250514-v1:0"
+    cheap = ManagedChatBedrockConverse(
+        model="anthropic.claude-3-haiku-20240307-v1:0", client=StubBedrockClient(response="cheap"), region_name="us-east-1",
+    )
+    model = ManagedChatBedrockConverse(
+        model=model_id, client=StubBedrockClient(response="full"), region_name="us-east-1", brownout_model=cheap,
+    )
+    normal_key = model._get_llm_string()
+
+    assert model.invoke("question").content == "full"
+    brownout.value = 10
+    assert model.invoke("question").content == "cheap"
+    assert "".join(chunk.text() for chunk in model.stream("question")) == "cheap"
+    # Cached answers of the brownout model are kept apart from those of the full model
+    assert model._get_llm_string() != normal_key
@@ -0,0 +1,150 @@
+import asyncio
+import threading
+import time
+
+import pytest
+from langgraph.graph import END, START, StateGraph
+
+from src.core.capacity import CapacityGate
+from src.core.cancellation import CancelToken, RunCancelled, current_token, set_current_token
+from src.tools import spawn_container
+from src.tools.cli_tools import CANCELLED_OUTPUT, ExecuteShellCommandTool
+from test_run_api import State, body, wait_for_status
+
+def test_token_runs_callbacks_once():
+    token = CancelToken()
+    calls = []
+
+    with token.on_cancel(lambda: calls.append("a")):
+        token.cancel("first")
+        token.cancel("second")
+
+    assert calls == ["a"]
+    assert token.reason == "first"
+    with pytest.raises(RunCancelled, match="first"):
+        token.raise_if_cancelled()
+
+def test_callbacks_run_immediately_on_a_cancelled_token_and_unregister_after_the_block():
+    token = CancelToken()
+    calls = []
+    with token.on_cancel(lambda: calls.append("inside")):
+        pass
+    token.cancel()
+    with token.on_cancel(lambda: calls.append("late")):
+        pass
+
+    assert calls == ["late"]
+
+def test_code_outside_a_run_is_never_cancelled():
+    assert not current_token().cancelled
+
+def run_shell_in_thread(command: str, token: CancelToken) -> tuple[threading.Thread, list[str]]:
+    output = []
+
+    def target():
+        set_current_token(token)
+        output.append(ExecuteShellCommandTool()._run(command))
+
+    thread = threading.Thread(target=target)
+    thread.start()
+    return thread, output
+
+def test_cancelling_kills_the_shell_and_its_children(tmp_path):
+    marker = tmp_path / "marker"
+    token = CancelToken()
+    thread, output = run_shell_in_thread(f"sleep 1 && touch {marker}", token)
+    time.sleep(0.2)
+
+    started = time.monotonic()
+    token.cancel("stop")
+    thread.join(5)
+
+    assert time.monotonic() - started < 0.5
+    assert output == [CANCELLED_OUTPUT]
+    time.sleep(1.2)
+    assert not marker.exists()
+
+def test_command_of_a_cancelled_run_does_not_start(tmp_path):
+    token = CancelToken()
+    token.cancel()
+    thread, output = run_shell_in_thread(f"touch {tmp_path / 'marker'}", token)
+    thread.join(5)
+
+    assert output == [CANCELLED_OUTPUT]
+    assert not (tmp_path / "marker").exists()
+
+@pytest.fixture
+def fake_docker(monkeypatch):
+    """Containers that keep running until removed, on a gate of two slots."""
+    state = {"started": [], "removed": []}
+    gate = CapacityGate("containers", 2)
+    monkeypatch.setattr(spawn_container, "container_slots", gate)
+
+    def spawn(git_url, branch_names, jobs):
+        container_id = f"c{len(state['started'])}"
+        state["started"].append(container_id)
+        return [container_id]
+
+    monkeypatch.setattr(spawn_container, "_spawn_containers", spawn)
+    monkeypatch.setattr(spawn_container, "_is_container_running", lambda ids: not set(ids) & set(state["removed"]))
+    monkeypatch.setattr(spawn_container, "_remove_containers", lambda ids: state["removed"].extend(ids))
+    state["gate"] = gate
+    return state
+
+def test_cancelled_run_removes_its_containers_and_frees_their_slots(fake_docker):
+    token = CancelToken()
+    errors = []
+
+    def target():
+        set_current_token(token)
+        try:
+            spawn_container.spawn_engineers("https://example.com/repo.git", {}, [{"group_name": g} for g in "abc"])
+        except RunCancelled as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=target)
+    thread.start()
+    time.sleep(0.2)
+    # Two containers hold both slots; the third job waits for one
+    assert fake_docker["started"] == ["c0", "c1"]
+    assert fake_docker["gate"].stats()["in_use"] == 2
+
+    started = time.monotonic()
+    token.cancel("stop")
+    thread.join(5)
+
+    assert time.monotonic() - started < 0.5
+    assert len(errors) == 1
+    assert sorted(fake_docker["removed"]) == ["c0", "c1"]
+    assert fake_docker["gate"].stats()["in_use"] == 0
+
+def shell_graph(command: str):
+    async def work(state: State) -> dict:
+        output = await asyncio.to_thread(ExecuteShellCommandTool()._run, command)
+        return {"response": output}
+
+    builder = StateGraph(State)
+    builder.add_node("work", work)
+    builder.add_edge(START, "work")
+    builder.add_edge("work", END)
+    return builder.compile()
+
+def test_cancel_endpoint_stops_the_run_and_its_commands(api, tmp_path):
+    marker = tmp_path / "marker"
+
+    async def scenario():
+        async with api(shell_graph(f"sleep 1 && touch {marker}")) as (client, _):
+            run_id = (await client.post("/runs", json=body())).json()["run_id"]
+            await wait_for_status(client, run_id, "running")
+            await asyncio.sleep(0.1)
+
+            cancelled = await client.post(f"/runs/{run_id}/cancel")
+            assert cancelled.status_code == 202
+            info = await wait_for_status(client, run_id, "cancelled")
+            assert info["error"] == "Run was cancelled by request."
+            assert (await client.post(f"/runs/{run_id}/cancel")).status_code == 409
+            assert (await client.get(f"/runs/{run_id}/result")).status_code == 409
+
+    asyncio.run(scenario())
+    time.sleep(1.2)
+    assert not marker.exists()
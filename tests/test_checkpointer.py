@@ -0,0 +1,163 @@
+import asyncio
+import operator
+import time
+from typing import Annotated, TypedDict
+
+import pytest
+from langgraph.checkpoint.base import empty_checkpoint
+from langgraph.graph import END, START, StateGraph
+
+from src.core.checkpointer import SQLiteCheckpointSaver, create_checkpointer
+from test_run_api import State, body, wait_for_status
+
+def thread(thread_id: str, **configurable) -> dict:
+    return {"configurable": {"thread_id": thread_id, "checkpoint_ns": "", **configurable}}
+
+def test_put_and_get_tuple_round_trip(tmp_path):
+    saver = SQLiteCheckpointSaver(str(tmp_path / "checkpoints.db"))
+    first = empty_checkpoint()
+    first["channel_values"] = {"response": "draft", "steps": ["a"]}
+    first["channel_versions"] = {"response": "1", "steps": "1"}
+    first_config = saver.put(thread("t"), first, {"source": "loop", "step": 0}, {"response": "1", "steps": "1"})
+
+    second = empty_checkpoint()
+    second["channel_values"] = {"response": "final", "steps": ["a"]}
+    second["channel_versions"] = {"response": "2", "steps": "1"}
+    second_config = saver.put(first_config, second, {"source": "loop", "step": 1}, {"response": "2"})
+
+    # A new saver on the same file, like a restarted process
+    latest = SQLiteCheckpointSaver(saver.path).get_tuple(thread("t"))
+    assert latest.config == second_config
+    assert latest.parent_config == first_config
+    # Unchanged channels are read from the blob of the earlier version
+    assert latest.checkpoint["channel_values"] == {"response": "final", "steps": ["a"]}
+    assert latest.metadata["step"] == 1
+
+    earlier = saver.get_tuple(first_config)
+    assert earlier.checkpoint["channel_values"]["response"] == "draft"
+    assert saver.get_tuple(thread("other")) is None
+    assert [item.metadata["step"] for item in saver.list(thread("t"))] == [1, 0]
+    assert [item.metadata["step"] for item in saver.list(None, filter={"step": 0})] == [0]
+    assert len([*saver.list(thread("t"), limit=1)]) == 1
+
+def test_pending_writes_are_stored_against_their_checkpoint(tmp_path):
+    saver = SQLiteCheckpointSaver(str(tmp_path / "checkpoints.db"))
+    config = saver.put(thread("t"), empty_checkpoint(), {"step": 0}, {})
+
+    saver.put_writes(config, [("response", "kept"), ("steps", ["b"])], task_id="task-1")
+    # A retried task does not replace the writes of its first attempt
+    saver.put_writes(config, [("response", "retried")], task_id="task-1")
+
+    assert saver.get_tuple(config).pending_writes == [("task-1", "response", "kept"), ("task-1", "steps", ["b"])]
+
+class FlakyState(TypedDict, total=False):
+    response: str
+    steps: Annotated[list[str], operator.add]
+
+def flaky_graph(checkpointer, executions: list[str], failures: dict[str, int]):
+    """`plan` runs first, then `build` and `test` in parallel; nodes raise while they have failures left."""
+    def node(name: str):
+        async def run(state: FlakyState) -> dict:
+            executions.append(name)
+            if failures.get(name):
+                failures[name] -= 1
+                raise RuntimeError(f"{name} failed")
+            return {"steps": [name]}
+        return run
+
+    builder = StateGraph(FlakyState)
+    for name in ("plan", "build", "test"):
+        builder.add_node(name, node(name))
+    builder.add_edge(START, "plan")
+    builder.add_edge("plan", "build")
+    builder.add_edge("plan", "test")
+    builder.add_edge("build", END)
+    builder.add_edge("test", END)
+    return builder.compile(checkpointer=checkpointer)
+
+def test_interrupted_graph_resumes_after_the_last_finished_node(tmp_path):
+    path = str(tmp_path / "checkpoints.db")
+    executions = []
+    config = {"configurable": {"thread_id": "run-1"}}
+
+    async def scenario():
+        graph = flaky_graph(SQLiteCheckpointSaver(path), executions, {"test": 1})
+        with pytest.raises(RuntimeError, match="test failed"):
+            await graph.ainvoke({"steps": []}, config)
+
+        # A fresh saver sees the step that was cut short, including the finished branch
+        restarted = flaky_graph(SQLiteCheckpointSaver(path), executions, {})
+        snapshot = await restarted.aget_state(config)
+        # `build` finished before `test` failed, so its writes are pending and only `test` is left
+        assert snapshot.next == ("test",)
+        assert snapshot.values["steps"] == ["plan", "build"]
+        pending = (await restarted.checkpointer.aget_tuple(config)).pending_writes
+        assert ("steps", ["build"]) in [(channel, value) for _, channel, value in pending]
+
+        executions.clear()
+        return await restarted.ainvoke(None, config)
+
+    result = asyncio.run(scenario())
+
+    # Neither `plan` nor the branch that already finished runs again
+    assert executions == ["test"]
+    assert sorted(result["steps"]) == ["build", "plan", "test"]
+
+def test_delete_thread_and_prune(tmp_path):
+    saver = SQLiteCheckpointSaver(str(tmp_path / "checkpoints.db"))
+    for thread_id in ("old", "new", "gone"):
+        config = saver.put(thread(thread_id), empty_checkpoint(), {"step": 0}, {})
+        saver.put_writes(config, [("response", thread_id)], task_id="task")
+
+    saver.delete_thread("gone")
+    assert saver.get_tuple(thread("gone")) is None
+    assert saver._connection().execute("SELECT COUNT(*) FROM checkpoint_writes WHERE thread_id = 'gone'").fetchone() == (0,)
+
+    saver._connection().execute("UPDATE checkpoints SET created_at = ? WHERE thread_id = 'old'", (time.time() - 60,))
+    assert saver.prune(max_age=30) == 1
+    assert saver.get_tuple(thread("old")) is None
+    assert saver.get_tuple(thread("new")) is not None
+
+def test_checkpointing_can_be_disabled(tmp_path):
+    assert create_checkpointer("") is None
+    assert create_checkpointer("none") is None
+    assert isinstance(create_checkpointer(str(tmp_path / "checkpoints.db")), SQLiteCheckpointSaver)
+
+def two_step_graph(checkpointer, executions: list[str], fail_once: list[bool]):
+    async def plan(state: State) -> dict:
+        executions.append("plan")
+        return {"steps": ["plan"]}
+
+    async def answer(state: State) -> dict:
+        executions.append("answer")
+        if fail_once:
+            fail_once.pop()
+            raise RuntimeError("model unavailable")
+        return {"response": "done", "steps": ["answer"]}
+
+    builder = StateGraph(State)
+    builder.add_node("plan", plan)
+    builder.add_node("answer", answer)
+    builder.add_edge(START, "plan")
+    builder.add_edge("plan", "answer")
+    builder.add_edge("answer", END)
+    return builder.compile(checkpointer=checkpointer)
+
+def test_resume_endpoint_continues_a_failed_run(api, tmp_path):
+    executions = []
+    graph = two_step_graph(SQLiteCheckpointSaver(str(tmp_path / "checkpoints.db")), executions, [True])
+
+    async def scenario():
+        async with api(graph) as (client, _):
+            run_id = (await client.post("/runs", json=body())).json()["run_id"]
+            failed = await wait_for_status(client, run_id, "failed")
+            assert failed["error"] == "model unavailable"
+
+            assert (await client.post(f"/runs/{run_id}/resume")).status_code == 202
+            await wait_for_status(client, run_id, "succeeded")
+            return (await client.get(f"/runs/{run_id}/result")).json()["response"]
+
+    result = asyncio.run(scenario())
+
+    assert executions == ["plan", "answer", "answer"]
+    assert result["steps"] == ["plan", "answer"]
@@ -0,0 +1,78 @@
+import asyncio
+
+import pytest
+from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.graph import END, START, StateGraph
+
+from src.core.deadline import Deadline, DeadlineExceeded, budgeted, current_deadline, deadline_scope, stage_budget
+from test_run_api import State, body, wait_for_status
+
+WEIGHTS = {"plan": 1, "build": 3}
+
+def test_stage_budget_shares_the_remaining_time_by_weight():
+    with deadline_scope(Deadline.after(40)):
+        assert stage_budget("plan", WEIGHTS) == pytest.approx(10, abs=0.1)
+        assert stage_budget("build", WEIGHTS) == pytest.approx(40, abs=0.1)
+        # Stages without a weight get whatever is left
+        assert stage_budget("report", WEIGHTS) == pytest.approx(40, abs=0.1)
+    assert stage_budget("plan", WEIGHTS) is None
+
+def test_budgeted_stage_runs_within_its_share():
+    async def stage():
+        return current_deadline()
+
+    async def scenario():
+        with deadline_scope(Deadline.after(4)):
+            return await budgeted("plan", stage, WEIGHTS)()
+
+    deadline = asyncio.run(scenario())
+
+    assert deadline.name == "plan"
+    # A tenth of the one-second budget is held back to wind down
+    assert deadline.remaining() == pytest.approx(0.9, abs=0.05)
+
+def test_budgeted_stage_is_stopped_at_the_end_of_its_budget():
+    async def stage():
+        await asyncio.sleep(5)
+
+    async def scenario():
+        with deadline_scope(Deadline.after(0.4)):
+            await budgeted("plan", stage, WEIGHTS)()
+
+    with pytest.raises(DeadlineExceeded, match="'plan' did not finish"):
+        asyncio.run(scenario())
+
+def staged_graph():
+    """`plan` finishes right away; `build` takes longer than any budget it gets."""
+    async def plan(state: State) -> dict:
+        return {"response": "plan ready", "steps": ["plan"]}
+
+    async def build(state: State) -> dict:
+        await asyncio.sleep(5)
+        return {"response": "built", "steps": ["build"]}
+
+    builder = StateGraph(State)
+    builder.add_node("plan", budgeted("plan", plan, WEIGHTS))
+    builder.add_node("build", budgeted("build", build, WEIGHTS))
+    builder.add_edge(START, "plan")
+    builder.add_edge("plan", "build")
+    builder.add_edge("build", END)
+    return builder.compile(checkpointer=InMemorySaver())
+
+def test_run_past_its_deadline_returns_the_partial_state(api):
+    async def scenario():
+        async with api(staged_graph()) as (client, _):
+            run_id = (await client.post("/runs", json=body(deadline_seconds=0.3))).json()["run_id"]
+            info = await wait_for_status(client, run_id, "deadline_exceeded")
+            result = await client.get(f"/runs/{run_id}/result?fields=response,steps")
+            invoked = await client.post("/invoke-workflow", json=body("another app", deadline_seconds=0.3))
+        return info, result, invoked
+
+    info, result, invoked = asyncio.run(scenario())
+
+    assert info["error"] == "Stage 'build' did not finish within its budget of 0s"
+    assert result.status_code == 200
+    assert result.json() == {"response": {"response": "plan ready", "steps": ["plan"]}, "error": info["error"]}
+    assert invoked.status_code == 200
+    assert invoked.json()["response"]["steps"] == ["plan"]
+    assert "did not finish" in invoked.json()["error"]
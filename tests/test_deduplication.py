@@ -0,0 +1,82 @@
+import asyncio
+
+from langgraph.graph import END, START, StateGraph
+
+from src.services.run_service import request_fingerprint
+from test_run_api import State, body, wait_for_status
+
+def counting_graph(release: asyncio.Event):
+    """Graph counting its executions in `graph.executions`."""
+    executions = []
+
+    async def answer(state: State) -> dict:
+        executions.append(state["messages"][-1].content)
+        await release.wait()
+        return {"response": f"run {len(executions)}"}
+
+    builder = StateGraph(State)
+    builder.add_node("answer", answer)
+    builder.add_edge(START, "answer")
+    builder.add_edge("answer", END)
+    graph = builder.compile()
+    graph.executions = executions
+    return graph
+
+def test_fingerprint_depends_on_input_and_repository():
+    assert request_fingerprint("todo app", "https://a.git") == request_fingerprint("todo app", "https://a.git")
+    assert request_fingerprint("todo app", "https://a.git") != request_fingerprint("todo app", "https://b.git")
+    assert request_fingerprint("todo app", "https://a.git") != request_fingerprint("blog", "https://a.git")
+
+def test_concurrent_identical_requests_share_one_run(api):
+    async def scenario():
+        release = asyncio.Event()
+        graph = counting_graph(release)
+        async with api(graph) as (client, _):
+            waiting = [asyncio.create_task(client.post("/invoke-workflow", json=body())) for _ in range(3)]
+            await asyncio.sleep(0.2)
+            release.set()
+            responses = await asyncio.gather(*waiting)
+
+        assert [response.status_code for response in responses] == [200] * 3
+        assert {response.json()["response"]["response"] for response in responses} == {"run 1"}
+        assert len(graph.executions) == 1
+
+    asyncio.run(scenario())
+
+def test_identical_request_after_completion_starts_a_new_run(api):
+    async def scenario():
+        release = asyncio.Event()
+        release.set()
+        graph = counting_graph(release)
+        async with api(graph) as (client, _):
+            first = (await client.post("/runs", json=body())).json()["run_id"]
+            await wait_for_status(client, first, "succeeded")
+            second = (await client.post("/runs", json=body())).json()["run_id"]
+            await wait_for_status(client, second, "succeeded")
+
+        assert first != second
+        assert len(graph.executions) == 2
+
+    asyncio.run(scenario())
+
+def test_idempotency_key_returns_the_same_run(api):
+    async def scenario():
+        release = asyncio.Event()
+        release.set()
+        graph = counting_graph(release)
+        async with api(graph) as (client, _):
+            headers = {"Idempotency-Key": "order-1"}
+            first = (await client.post("/runs", json=body(), headers=headers)).json()["run_id"]
+            await wait_for_status(client, first, "succeeded")
+
+            # A retry after the run finished still gets the same run back
+            retry = await client.post("/runs", json=body(), headers=headers)
+            assert retry.json()["run_id"] == first
+            assert retry.json()["status"] == "succeeded"
+
+            conflict = await client.post("/runs", json=body("something else"), headers=headers)
+            assert conflict.status_code == 422
+
+        assert len(graph.executions) == 1
+
+    asyncio.run(scenario())
@@ -0,0 +1,85 @@
+import asyncio
+import json
+
+import pytest
+from langchain_core.messages import HumanMessage
+
+from src.constants.run_status import RunStatus
+from src.services.admission_service import AdmissionRejected
+from src.services.event_log import EventLogStore
+from src.services.run_service import WorkflowRunService
+from test_run_api import echo_graph
+
+def inputs(text: str) -> dict:
+    return {"messages": [HumanMessage(content=text)], "base_url": "https://example.com/repo.git"}
+
+def test_drain_checkpoints_unfinished_runs_and_the_next_process_resumes_them(tmp_path):
+    checkpoint = tmp_path / "pending_runs.json"
+    event_logs = EventLogStore(str(tmp_path / "runs"))
+
+    async def first_process():
+        service = WorkflowRunService(
+            echo_graph(asyncio.Event()), max_concurrency=1, event_logs=event_logs, checkpoint_path=str(checkpoint)
+        )
+        await service.start()
+        running, _ = service.submit(inputs("running"), tenant="a", idempotency_key="key-1")
+        queued, _ = service.submit(inputs("queued"), tenant="b", detached=True)
+        await asyncio.sleep(0.05)
+        assert running.status == RunStatus.RUNNING
+
+        await service.drain(timeout=0.1)
+        await service.stop()
+
+        assert running.interrupted and queued.interrupted
+        with pytest.raises(AdmissionRejected) as rejected:
+            service.submit(inputs("late"))
+        assert rejected.value.status_code == 503
+        return running.run_id, queued.run_id
+
+    running_id, queued_id = asyncio.run(first_process())
+
+    records = {record["run_id"]: record for record in json.loads(checkpoint.read_text())}
+    assert set(records) == {running_id, queued_id}
+    assert records[running_id]["tenant"] == "a"
+    assert records[running_id]["idempotency_key"] == "key-1"
+    assert records[queued_id]["detached"] is True
+
+    async def second_process():
+        service = WorkflowRunService(echo_graph(), event_logs=event_logs, checkpoint_path=str(checkpoint))
+        await service.start()
+        runs = [service.get(running_id), service.get(queued_id)]
+        await asyncio.wait_for(asyncio.gather(*(run.wait() for run in runs)), 5)
+        # A retry with the idempotency key still finds the resumed run
+        retried, created = service.submit(inputs("running"), idempotency_key="key-1")
+        await service.stop()
+        return runs, retried, created
+
+    runs, retried, created = asyncio.run(second_process())
+
+    assert [run.status for run in runs] == [RunStatus.SUCCEEDED] * 2
+    assert [run.result["response"] for run in runs] == ["done: running", "done: queued"]
+    assert retried is runs[0] and not created
+    assert not checkpoint.exists()
+
+def test_drain_lets_runs_finish_within_the_timeout(tmp_path):
+    checkpoint = tmp_path / "pending_runs.json"
+
+    async def scenario():
+        release = asyncio.Event()
+        service = WorkflowRunService(
+            echo_graph(release), event_logs=EventLogStore(str(tmp_path / "runs")), checkpoint_path=str(checkpoint)
+        )
+        await service.start()
+        run, _ = service.submit(inputs("almost done"))
+        await asyncio.sleep(0.05)
+        asyncio.get_running_loop().call_later(0.1, release.set)
+
+        await service.drain(timeout=5)
+        await service.stop()
+        return run
+
+    run = asyncio.run(scenario())
+
+    assert run.status == RunStatus.SUCCEEDED
+    assert not run.interrupted
+    assert not checkpoint.exists()
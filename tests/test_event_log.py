@@ -0,0 +1,91 @@
+import asyncio
+import json
+
+from src.services.event_log import EventLogStore, RunEventLog
+from test_run_api import body, echo_graph, wait_for_status
+
+def read_all(log: RunEventLog) -> list[dict]:
+    async def collect():
+        return [event async for event in log.read()]
+    return asyncio.run(collect())
+
+def write_events(log: RunEventLog, events: list[dict]) -> list[int]:
+    async def append_all():
+        seqs = [await log.append(event) for event in events]
+        await log.close()
+        return seqs
+    return asyncio.run(append_all())
+
+def truncated_log(tmp_path):
+    path = tmp_path / "run.jsonl"
+    write_events(RunEventLog(path), [{"event": "on_chain_start"}, {"event": "on_chain_stream"}, {"event": "on_chain_end"}])
+    # A crash in the middle of writing the third line
+    data = path.read_bytes()
+    path.write_bytes(data[:-10])
+    return path
+
+def test_read_only_open_skips_a_truncated_tail(tmp_path):
+    path = truncated_log(tmp_path)
+    size = path.stat().st_size
+
+    log = RunEventLog(path, closed=True)
+
+    assert len(log) == 2
+    assert [event["seq"] for event in read_all(log)] == [0, 1]
+    # Read-only opens leave the file alone
+    assert path.stat().st_size == size
+
+def test_reopen_for_writing_cuts_off_a_truncated_tail(tmp_path):
+    path = truncated_log(tmp_path)
+
+    log = RunEventLog(path)
+    assert write_events(log, [{"event": "on_chain_end"}]) == [2]
+
+    lines = path.read_bytes().splitlines()
+    assert [json.loads(line)["seq"] for line in lines] == [0, 1, 2]
+    assert [event["event"] for event in read_all(RunEventLog(path, closed=True))] == [
+        "on_chain_start", "on_chain_stream", "on_chain_end",
+    ]
+
+def test_reopen_continues_the_sequence(tmp_path):
+    store = EventLogStore(str(tmp_path))
+    write_events(store.create("r0"), [{"event": "a"}, {"event": "b"}])
+
+    assert write_events(store.create("r0"), [{"event": "c"}]) == [2]
+    assert [event["event"] for event in read_all(store.open("r0"))] == ["a", "b", "c"]
+    assert store.open("missing") is None
+
+def test_filtered_reads_skip_other_events(tmp_path):
+    log = RunEventLog(tmp_path / "run.jsonl")
+    write_events(log, [
+        {"event": "on_chain_start", "metadata": {"langgraph_node": "plan"}},
+        {"event": "on_chat_model_stream", "metadata": {"langgraph_node": "code"}},
+        {"event": "on_chain_end", "metadata": {"langgraph_node": "plan"}},
+    ])
+
+    async def collect():
+        return [seq async for seq, _ in log.read_lines(match=lambda kind, node: node == "plan")]
+
+    assert asyncio.run(collect()) == [0, 2]
+
+def test_event_stream_resumes_from_an_offset(api):
+    async def scenario():
+        async with api(echo_graph()) as (client, _):
+            run_id = (await client.post("/runs", json=body())).json()["run_id"]
+            await wait_for_status(client, run_id, "succeeded")
+
+            full = [json.loads(line) for line in (await client.get(f"/runs/{run_id}/events")).text.splitlines()]
+            resumed = [json.loads(line) for line in (await client.get(f"/runs/{run_id}/events?offset=3")).text.splitlines()]
+            sse = await client.get(
+                f"/runs/{run_id}/events", headers={"Accept": "text/event-stream", "Last-Event-ID": "2"}
+            )
+        return run_id, full, resumed, sse
+
+    run_id, full, resumed, sse = asyncio.run(scenario())
+
+    events, end = full[:-1], full[-1]
+    assert [event["seq"] for event in events] == list(range(len(events)))
+    assert end == {"status": "succeeded", "run_id": run_id}
+    assert resumed[:-1] == events[3:]
+    ids = [line.removeprefix("id: ") for line in sse.text.splitlines() if line.startswith("id: ")]
+    assert ids == [str(seq) for seq in range(3, len(events))]
@@ -0,0 +1,83 @@
+import asyncio
+import json
+
+import pytest
+
+from src.utils.event_utils import EventStreamOptions, coalesce_token_chunks
+from test_run_api import body, echo_graph, wait_for_status
+
+def chunk(text: str, seq: int, run_id: str = "call-1") -> dict:
+    return {"event": "on_chat_model_stream", "run_id": run_id, "seq": seq, "data": {"chunk": {"content": text}}}
+
+async def source(events: list, error: Exception | None = None, pause: float = 0.0):
+    for event in events:
+        if pause:
+            await asyncio.sleep(pause)
+        yield event
+    if error is not None:
+        raise error
+
+def collect(events, max_delay: float = 1.0, max_chars: int = 1000) -> list[dict]:
+    async def run():
+        return [event async for event in coalesce_token_chunks(events, max_delay, max_chars)]
+    return asyncio.run(run())
+
+def test_consecutive_chunks_of_one_call_are_merged():
+    events = [chunk("Hel", 0), chunk("lo", 1), chunk("!", 2, run_id="call-2"), {"event": "on_chain_end", "seq": 3}]
+
+    merged = collect(source(events))
+
+    assert [event["data"]["chunk"]["content"] for event in merged[:2]] == ["Hello", "!"]
+    assert (merged[0]["seq_start"], merged[0]["seq"], merged[0]["chunk_count"]) == (0, 1, 2)
+    assert merged[2] == {"event": "on_chain_end", "seq": 3}
+
+def test_batches_are_flushed_at_max_chars():
+    merged = collect(source([chunk("abc", 0), chunk("def", 1), chunk("g", 2)]), max_chars=5)
+
+    assert [event["data"]["chunk"]["content"] for event in merged] == ["abcdef", "g"]
+
+def test_batches_are_flushed_after_max_delay_while_the_source_is_idle():
+    merged = collect(source([chunk("a", 0), chunk("b", 1)], pause=0.2), max_delay=0.05)
+
+    assert [event["data"]["chunk"]["content"] for event in merged] == ["a", "b"]
+
+def test_source_errors_propagate_after_the_pending_batch():
+    received = []
+
+    async def run():
+        async for event in coalesce_token_chunks(source([chunk("partial", 0)], RuntimeError("stream broke")), 1.0, 1000):
+            received.append(event)
+
+    with pytest.raises(RuntimeError, match="stream broke"):
+        asyncio.run(run())
+    assert [event["data"]["chunk"]["content"] for event in received] == ["partial"]
+
+def test_options_match_kinds_and_nodes():
+    options = EventStreamOptions(kinds={"on_chain_end"}, nodes={"answer"})
+
+    assert options.matches("on_chain_end", "answer")
+    assert not options.matches("on_chain_start", "answer")
+    assert not options.matches("on_chain_end", None)
+    assert EventStreamOptions().matches("anything", None)
+
+def test_options_strip_state_payloads():
+    event = {"event": "on_chain_end", "data": {"input": {"big": 1}, "output": {"big": 2}, "chunk": "x"}}
+
+    assert EventStreamOptions(include_payloads=False).transform(event) == {"event": "on_chain_end", "data": {"chunk": "x"}}
+    assert EventStreamOptions().transform(event) is event
+    assert EventStreamOptions().passthrough
+    assert not EventStreamOptions(coalesce_ms=50).passthrough
+
+def test_event_stream_filters_on_the_server(api):
+    async def scenario():
+        async with api(echo_graph()) as (client, _):
+            run_id = (await client.post("/runs", json=body())).json()["run_id"]
+            await wait_for_status(client, run_id, "succeeded")
+            response = await client.get(f"/runs/{run_id}/events?kinds=on_chain_end&nodes=answer&payloads=false")
+        return [json.loads(line) for line in response.text.splitlines()]
+
+    *events, end = asyncio.run(scenario())
+
+    assert [(event["event"], event["metadata"]["langgraph_node"]) for event in events] == [("on_chain_end", "answer")]
+    assert "input" not in events[0]["data"] and "output" not in events[0]["data"]
+    assert end["status"] == "succeeded"
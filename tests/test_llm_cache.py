@@ -0,0 +1,77 @@
+import asyncio
+import time
+
+from langchain_core.language_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration
+
+from src.core.llm_cache import TieredLLMCache, create_llm_cache
+
+LLM = "model=claude,temperature=0"
+
+def answer(text: str) -> list[ChatGeneration]:
+    return [ChatGeneration(message=AIMessage(content=text))]
+
+def test_entries_survive_a_restart(tmp_path):
+    path = str(tmp_path / "llm_cache.db")
+    TieredLLMCache(path).update("prompt", LLM, answer("hello"))
+
+    cache = TieredLLMCache(path)
+    first = cache.lookup("prompt", LLM)
+    second = cache.lookup("prompt", LLM)
+
+    assert first[0].message.content == second[0].message.content == "hello"
+    assert cache.lookup("prompt", "model=claude,temperature=0.7") is None
+    stats = cache.stats()
+    assert (stats["disk_hits"], stats["memory_hits"], stats["misses"]) == (1, 1, 1)
+    assert stats["hit_rate"] == 0.667
+
+def test_hits_are_copies(tmp_path):
+    cache = TieredLLMCache(str(tmp_path / "llm_cache.db"))
+    cache.update("prompt", LLM, answer("hello"))
+
+    cache.lookup("prompt", LLM)[0].message.id = "run-1"
+
+    assert cache.lookup("prompt", LLM)[0].message.id is None
+
+def test_expired_entries_are_misses(tmp_path):
+    cache = TieredLLMCache(str(tmp_path / "llm_cache.db"), ttl=60)
+    cache.update("prompt", LLM, answer("hello"))
+    cache._memory.clear()
+    cache._connection().execute("UPDATE llm_cache SET created_at = ?", (time.time() - 120,))
+
+    assert cache.lookup("prompt", LLM) is None
+    assert cache.stats()["expired"] == 1
+
+def test_least_recently_used_entries_are_evicted_beyond_the_size_budget(tmp_path):
+    cache = TieredLLMCache(str(tmp_path / "llm_cache.db"), memory_entries=1)
+    for prompt in ("a", "b", "c"):
+        cache.update(prompt, LLM, answer(prompt * 100))
+        time.sleep(0.01)
+    # "a" becomes the most recently used entry on disk
+    cache.lookup("a", LLM)
+    size = cache._connection().execute("SELECT MAX(size) FROM llm_cache").fetchone()[0]
+
+    cache.max_bytes = 2 * size
+    cache._evict()
+
+    assert len(cache._memory) == 1
+    cache._memory.clear()
+    assert [cache.lookup(prompt, LLM) is not None for prompt in "abc"] == [True, False, True]
+    assert cache.stats()["evicted"] == 1
+
+def test_repeated_model_calls_are_answered_from_the_cache(tmp_path):
+    cache = TieredLLMCache(str(tmp_path / "llm_cache.db"))
+    model = GenericFakeChatModel(messages=iter([AIMessage(content="first"), AIMessage(content="second")]), cache=cache)
+
+    async def scenario():
+        return [(await model.ainvoke("same prompt")).content for _ in range(2)]
+
+    assert asyncio.run(scenario()) == ["first", "first"]
+    assert model.invoke("same prompt").content == "first"
+    assert cache.stats()["writes"] == 1
+
+def test_caching_can_be_disabled(tmp_path):
+    assert create_llm_cache(None) is None
+    assert create_llm_cache("none") is None
+    assert isinstance(create_llm_cache(str(tmp_path / "llm_cache.db")), TieredLLMCache)
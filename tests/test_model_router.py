@@ -0,0 +1,91 @@
+import asyncio
+
+import pytest
+from langchain_core.runnables.fallbacks import RunnableWithFallbacks
+
+from src.core import bedrock_model, model_router
+from src.core.bedrock_model import ManagedChatBedrockConverse
+from src.core.bedrock_pool import StubBedrockClient
+from src.core.capacity import CapacityGate
+from src.core.model_router import ModelRouter, ModelUsageStats, load_model_routes, update_model
+from src.core.rate_limiter import AdaptiveRateLimiter
+
+SONNET = "us.anthropic.claude-sonnet-4-20250514-v1:0"
+HAIKU = "anthropic.claude-3-haiku-20240307-v1:0"
+
+@pytest.fixture
+def router(monkeypatch):
+    monkeypatch.setattr(bedrock_model, "bedrock_limiter", AdaptiveRateLimiter(CapacityGate("bedrock_calls", 4)))
+    monkeypatch.setattr(bedrock_model, "_backoff", lambda attempt: 0.0)
+    monkeypatch.setattr(model_router, "model_usage", ModelUsageStats())
+    monkeypatch.setattr(bedrock_model, "model_usage", model_router.model_usage)
+    default = ManagedChatBedrockConverse(
+        model=SONNET, client=StubBedrockClient(response="from sonnet"), region_name="us-east-1", temperature=0,
+    )
+    return ModelRouter(default, {
+        "define_req": [{"model": "ANTHROPIC_CLAUDE_3_HAIKU", "stub": {"response": "from haiku"}}, "default"],
+        "dev_planning": [{"model": "ANTHROPIC_CLAUDE_3_HAIKU", "stub": {"error_rate": 1.0}}, "default"],
+        "role_allocate": "ANTHROPIC_CLAUDE_3_HAIKU",
+    })
+
+def test_routed_names_use_their_first_model(router):
+    answer = router.model_for("define_req").invoke("question")
+
+    assert answer.content == "from haiku"
+    assert router.model_for("architect_agent").invoke("question").content == "from sonnet"
+    usage = model_router.model_usage.stats()
+    assert usage["define_req"][HAIKU]["calls"] == 1
+    assert usage["architect_agent"][SONNET]["calls"] == 1
+
+def test_failing_model_falls_back_to_the_next_one(router):
+    model = router.model_for("dev_planning")
+
+    answer = asyncio.run(model.ainvoke("question"))
+
+    assert isinstance(model, RunnableWithFallbacks)
+    assert answer.content == "from sonnet"
+    usage = model_router.model_usage.stats()["dev_planning"]
+    # The routed model was retried on its own before the call moved on
+    assert usage[HAIKU]["failures"] == bedrock_model.THROTTLE_RETRIES + 1
+    assert usage[SONNET]["calls"] == 1
+
+def test_routed_models_share_the_default_settings_and_clients(router):
+    single = router.model_for("role_allocate")
+
+    assert single.model_id == HAIKU
+    assert single.client is router.default.client
+    assert single.route == "role_allocate"
+    # Endpoints with the same location share one client
+    first = router.model_for("define_req").runnable.client
+    assert router.model_for("define_req").runnable.client is first
+
+def test_update_reaches_every_model_of_a_chain(router):
+    model = update_model(router.model_for("define_req"), disable_streaming=True)
+
+    assert model.runnable.disable_streaming is True
+    assert all(fallback.disable_streaming is True for fallback in model.fallbacks)
+
+def test_table_resolves_every_entry(router):
+    assert router.table()["define_req"] == {"models": [HAIKU, SONNET], "brownout": None}
+    assert router.table()["role_allocate"]["models"] == [HAIKU]
+
+def test_routes_are_read_from_the_environment(monkeypatch):
+    assert load_model_routes("TEST_MODEL_ROUTES") == {}
+    monkeypatch.setenv("TEST_MODEL_ROUTES", '{"define_req": ["ANTHROPIC_CLAUDE_3_HAIKU", "default"]}')
+
+    assert load_model_routes("TEST_MODEL_ROUTES") == {"define_req": ["ANTHROPIC_CLAUDE_3_HAIKU", "default"]}
+
+def test_cost_counts_cache_reads_and_writes_at_their_price():
+    stats = ModelUsageStats()
+    usage = {"input_tokens": 1_000_000, "output_tokens": 100_000, "input_token_details": {"cache_read": 1_000_000, "cache_creation": 400_000}}
+
+    stats.record("architect_agent", SONNET, 2.0, usage)
+    stats.record("architect_agent", SONNET, 4.0, None)
+    stats.record_failure("architect_agent", SONNET)
+    stats.record("define_req", "unknown-model", 1.0, usage)
+
+    entry = stats.stats()["architect_agent"][SONNET]
+    # (1M + 1M * 0.1 + 0.4M * 1.25) * $3 + 0.1M * $15
+    assert entry["cost_usd"] == 6.3
+    assert (entry["calls"], entry["failures"], entry["p50_latency_seconds"]) == (2, 1, 4.0)
+    assert stats.stats()["define_req"]["unknown-model"]["cost_usd"] is None
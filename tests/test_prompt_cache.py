@@ -0,0 +1,83 @@
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+
+from src.core.bedrock_model import ManagedChatBedrockConverse
+from src.core.bedrock_pool import StubBedrockClient
+from src.core.model_router import ModelRouter
+from src.core.prompt_cache import CACHE_POINT, insert_cache_points
+
+MODEL_ID = "us.anthropic.claude-sonnet-4-20250514-v1:0"
+
+class RecordingClient(StubBedrockClient):
+    """Stub client that keeps every Converse request."""
+    def __init__(self):
+        super().__init__(response="ok")
+        self.requests = []
+
+    def converse(self, **request) -> dict:
+        self.requests.append(request)
+        return super().converse(**request)
+
+def cache_points(request: dict) -> dict:
+    """Whether the system prompt ends with a cache point, and the indices of the Converse messages that do."""
+    def marked(blocks):
+        return bool(blocks) and "cachePoint" in blocks[-1]
+    return {
+        "system": marked(request.get("system", [])),
+        "messages": [i for i, message in enumerate(request["messages"]) if marked(message["content"])],
+    }
+
+def agent_turn() -> list:
+    return [
+        SystemMessage(content="You are the architect."),
+        HumanMessage(content="Plan with dev_rules"),
+        AIMessage(content="", tool_calls=[{"id": "call-1", "name": "shell", "args": {"command": "ls"}}]),
+        ToolMessage(content="README.md", tool_call_id="call-1"),
+    ]
+
+def test_cache_points_follow_the_system_prompt_the_first_user_message_and_the_newest_turn():
+    messages = insert_cache_points(agent_turn())
+
+    assert [message.content[-1] == CACHE_POINT if isinstance(message.content, list) else False for message in messages] == [
+        True, True, False, True,
+    ]
+    # The input is not modified
+    assert agent_turn()[0].content == "You are the architect."
+
+def test_empty_messages_get_no_cache_point():
+    messages = insert_cache_points([SystemMessage(content=""), HumanMessage(content=" ")])
+
+    assert [message.content for message in messages] == ["", " "]
+
+@pytest.fixture
+def router():
+    client = RecordingClient()
+    default = ManagedChatBedrockConverse(
+        model=MODEL_ID, client=client, region_name="us-east-1", temperature=0, prompt_caching=True,
+    )
+    return client, ModelRouter(default, {}, brownout_routes={"define_req": {"model": MODEL_ID, "stub": {}}})
+
+def test_agent_requests_carry_cache_points(router):
+    client, router = router
+
+    router.model_for("architect_agent").invoke(agent_turn())
+
+    # The AI message and the tool result become Converse messages 1 and 2
+    assert cache_points(client.requests[-1]) == {"system": True, "messages": [0, 2]}
+
+def test_one_shot_requests_carry_no_cache_points(router):
+    client, router = router
+    model = router.model_for("define_req", prompt_caching=False)
+
+    model.invoke([SystemMessage(content="Define the requirements."), HumanMessage(content="a todo app")])
+
+    assert cache_points(client.requests[-1]) == {"system": False, "messages": []}
+    # The cheaper model that answers under brownout is not caching either
+    assert model.brownout_model.prompt_caching is False
+
+def test_graph_turns_prompt_caching_off_for_one_shot_chains_only():
+    from src.workflow import graph as workflow
+
+    for name in ("define_req", "dev_env_init", "dev_planning", "role_allocate"):
+        assert workflow._chain_model(name).prompt_caching is False
+    assert workflow.model_router.model_for("architect_agent").prompt_caching is workflow.llm.prompt_caching
@@ -0,0 +1,105 @@
+import asyncio
+import time
+
+import pytest
+from botocore.exceptions import ClientError
+
+from src.core import rate_limiter
+from src.core.capacity import CapacityGate
+from src.core.rate_limiter import AdaptiveRateLimiter
+
+@pytest.fixture
+def limiter() -> AdaptiveRateLimiter:
+    return AdaptiveRateLimiter(CapacityGate("test", 8), min_concurrency=1)
+
+def test_throttle_halves_the_window_once_per_cooldown(limiter, monkeypatch):
+    limiter.on_throttle()
+    assert limiter.stats()["window"] == 4
+    assert limiter.gate.limit == 4
+
+    # A burst of throttles from the same congestion event counts once
+    limiter.on_throttle()
+    assert limiter.gate.limit == 4
+
+    monkeypatch.setattr(rate_limiter, "DECREASE_COOLDOWN_SECONDS", 0.0)
+    for _ in range(5):
+        limiter.on_throttle()
+    assert limiter.gate.limit == 1
+
+def test_success_grows_the_window_additively(limiter, monkeypatch):
+    monkeypatch.setattr(rate_limiter, "DECREASE_COOLDOWN_SECONDS", 0.0)
+    limiter.on_throttle()
+    limiter.on_throttle()
+    assert limiter.gate.limit == 2
+
+    # Each success adds 1/window: 2 -> 2.5 -> 2.9 -> 3.24
+    limiter.on_success()
+    limiter.on_success()
+    assert limiter.gate.limit == 2
+    limiter.on_success()
+    assert limiter.gate.limit == 3
+
+    for _ in range(100):
+        limiter.on_success()
+    assert limiter.gate.limit == 8
+
+def test_retry_after_pauses_admissions(limiter):
+    limiter.on_throttle(retry_after=0.3)
+    assert limiter.congested
+    assert limiter.stats()["paused_seconds"] > 0
+
+    started = time.monotonic()
+    assert limiter.acquire(timeout=2)
+    assert time.monotonic() - started >= 0.25
+    limiter.release()
+    assert not limiter.congested
+
+def test_acquire_times_out_while_paused(limiter):
+    limiter.on_throttle(retry_after=5)
+    assert not limiter.acquire(timeout=0.05)
+    assert limiter.stats()["queue_depth"] == 0
+
+def test_waiters_are_admitted_by_lane_when_a_slot_frees_up():
+    limiter = AdaptiveRateLimiter(CapacityGate("test", 1))
+    admitted = []
+
+    async def call(lane: str) -> None:
+        await limiter.aacquire(lane=lane)
+        admitted.append(lane)
+
+    async def main() -> None:
+        await limiter.aacquire()
+        waiters = [asyncio.create_task(call(lane)) for lane in ("low", "high", "normal")]
+        await asyncio.sleep(0.05)
+        assert limiter.congested
+        for _ in waiters:
+            limiter.release()
+            await asyncio.sleep(0.01)
+        await asyncio.gather(*waiters)
+        limiter.release()
+
+    asyncio.run(main())
+
+    assert admitted == ["high", "normal", "low"]
+    assert limiter.gate.stats()["in_use"] == 0
+
+def throttled() -> ClientError:
+    return ClientError({"Error": {"Code": "ThrottlingException", "Message": "Slow down"}}, "Converse")
+
+def test_workflow_retries_only_throttled_calls_twice_before_the_final_try():
+    from src.workflow.graph import _retry_async
+
+    attempts = []
+
+    async def call(fail: Exception):
+        attempts.append(fail)
+        raise fail
+
+    with pytest.raises(ClientError):
+        asyncio.run(_retry_async(call, throttled(), base_delay=0))
+    assert len(attempts) == 3
+
+    attempts.clear()
+    with pytest.raises(ValueError):
+        asyncio.run(_retry_async(call, ValueError("bad plan"), base_delay=0))
+    assert len(attempts) == 1
@@ -0,0 +1,136 @@
+import asyncio
+import gzip
+import json
+import threading
+
+import pytest
+from langchain_core.messages import AIMessage
+from langgraph.graph import END, START, StateGraph
+
+from src.utils import response_utils
+from src.utils.response_utils import choose_encoding, encoded_json_response, parse_fields, project_state
+from test_run_api import State, body, wait_for_status
+
+STATE = {
+    "response": "done",
+    "fe_branch_name": "fe/login",
+    "agent_results": [
+        {"role": "FE", "cost_usd": 0.5, "log": "..."},
+        {"role": "BE", "cost_usd": 0.7, "log": "..."},
+    ],
+    "plan": {"stories": ["a", "b"], "estimate": 3},
+}
+
+def test_project_state_selects_nested_fields():
+    projected = project_state(STATE, parse_fields("response, agent_results.cost_usd,plan.estimate,missing"))
+
+    assert projected == {
+        "response": "done",
+        "agent_results": [{"cost_usd": 0.5}, {"cost_usd": 0.7}],
+        "plan": {"estimate": 3},
+    }
+
+def test_project_state_merges_paths_below_one_list():
+    projected = project_state(STATE, parse_fields("agent_results.role,agent_results.cost_usd"))
+
+    assert projected == {"agent_results": [{"role": "FE", "cost_usd": 0.5}, {"role": "BE", "cost_usd": 0.7}]}
+
+def test_no_fields_keep_the_whole_state():
+    assert parse_fields(None) is None
+    assert parse_fields(" , ") == []
+    assert project_state(STATE, None) is STATE
+    assert project_state(None, [["response"]]) is None
+
+@pytest.mark.parametrize(
+    ("accept_encoding", "expected"),
+    [
+        (None, None),
+        ("gzip", "gzip"),
+        ("GZIP, deflate", "gzip"),
+        ("gzip;q=0", None),
+        ("gzip;q=0, zstd;q=0", None),
+        ("*", "zstd"),
+        ("*;q=0", None),
+        ("*, gzip;q=0", "zstd"),
+        ("zstd;q=0.5, gzip", "gzip"),
+        ("zstd, gzip", "zstd"),
+        ("br", None),
+    ],
+)
+def test_choose_encoding_respects_quality_values(accept_encoding, expected, monkeypatch):
+    monkeypatch.setattr(response_utils, "zstandard", object())
+
+    assert choose_encoding(accept_encoding) == expected
+
+def test_zstd_is_not_chosen_without_zstandard(monkeypatch):
+    monkeypatch.setattr(response_utils, "zstandard", None)
+
+    assert choose_encoding("zstd") is None
+    assert choose_encoding("zstd, gzip;q=0.1") == "gzip"
+
+def test_small_bodies_are_not_compressed():
+    response = asyncio.run(encoded_json_response({"ok": True}, "gzip"))
+
+    assert "Content-Encoding" not in response.headers
+    assert json.loads(response.body) == {"ok": True}
+
+@pytest.mark.parametrize("size", [4 * 1024, 256 * 1024])
+def test_large_bodies_are_gzipped(size):
+    content = {"log": "x" * size}
+
+    response = asyncio.run(encoded_json_response(content, "gzip;q=1, zstd;q=0"))
+
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert response.headers["Vary"] == "Accept-Encoding"
+    assert json.loads(gzip.decompress(response.body)) == content
+
+def test_large_bodies_are_compressed_off_the_event_loop(monkeypatch):
+    threads = []
+
+    def compress(body, encoding):
+        threads.append(threading.current_thread())
+        return gzip.compress(body)
+
+    monkeypatch.setattr(response_utils, "_compress", compress)
+
+    async def encode(size):
+        return await encoded_json_response({"log": "x" * size}, "gzip")
+
+    asyncio.run(encode(2 * 1024))
+    asyncio.run(encode(128 * 1024))
+
+    assert threads[0] is threading.main_thread()
+    assert threads[1] is not threading.main_thread()
+
+def transcript_graph(count: int):
+    async def talk(state: State) -> dict:
+        return {"messages": [AIMessage(content=f"message {i}") for i in range(count)], "response": "x" * 4096}
+
+    builder = StateGraph(State)
+    builder.add_node("talk", talk)
+    builder.add_edge(START, "talk")
+    builder.add_edge("talk", END)
+    return builder.compile()
+
+def test_result_projection_pagination_and_compression(api):
+    async def scenario():
+        async with api(transcript_graph(30)) as (client, _):
+            run_id = (await client.post("/runs", json=body())).json()["run_id"]
+            await wait_for_status(client, run_id, "succeeded")
+            projected = await client.get(f"/runs/{run_id}/result?fields=base_url")
+            page = await client.get(f"/runs/{run_id}/messages?offset=10&limit=5")
+            compressed = await client.get(f"/runs/{run_id}/result", headers={"Accept-Encoding": "gzip"})
+            refused = await client.get(f"/runs/{run_id}/result", headers={"Accept-Encoding": "gzip;q=0"})
+        return projected, page, compressed, refused
+
+    projected, page, compressed, refused = asyncio.run(scenario())
+
+    assert projected.json() == {"response": {"base_url": "https://example.com/repo.git"}}
+    page = page.json()
+    # The request message plus 30 answers
+    assert (page["total"], page["offset"], page["limit"]) == (31, 10, 5)
+    assert [message["content"] for message in page["messages"]] == [f"message {i}" for i in range(9, 14)]
+    # httpx decodes gzip transparently
+    assert compressed.headers["Content-Encoding"] == "gzip"
+    assert compressed.json()["response"]["response"] == "x" * 4096
+    assert "Content-Encoding" not in refused.headers
@@ -0,0 +1,101 @@
+import asyncio
+import operator
+from typing import Annotated, TypedDict
+
+from langchain_core.messages import AnyMessage
+from langgraph.graph import END, START, StateGraph, add_messages
+
+class State(TypedDict, total=False):
+    messages: Annotated[list[AnyMessage], add_messages]
+    base_url: str
+    response: str
+    steps: Annotated[list[str], operator.add]
+
+def echo_graph(release: asyncio.Event | None = None):
+    """One-node graph answering with the request text, optionally waiting for `release` first."""
+    async def answer(state: State) -> dict:
+        if release is not None:
+            await release.wait()
+        return {"response": f"done: {state['messages'][-1].content}", "steps": ["answer"]}
+
+    builder = StateGraph(State)
+    builder.add_node("answer", answer)
+    builder.add_edge(START, "answer")
+    builder.add_edge("answer", END)
+    return builder.compile()
+
+def body(text: str = "build a todo app", **fields) -> dict:
+    return {"input": text, "git_url": "https://example.com/repo.git", **fields}
+
+async def wait_for_status(client, run_id: str, *statuses: str) -> dict:
+    for _ in range(200):
+        info = (await client.get(f"/runs/{run_id}")).json()
+        if info["status"] in statuses:
+            return info
+        await asyncio.sleep(0.01)
+    raise AssertionError(f"Run {run_id} stayed {info['status']}")
+
+def test_submitted_run_completes_in_the_background(api):
+    async def scenario():
+        async with api(echo_graph()) as (client, _):
+            submitted = await client.post("/runs", json=body())
+            assert submitted.status_code == 202
+            run_id = submitted.json()["run_id"]
+
+            info = await wait_for_status(client, run_id, "succeeded")
+            assert info["started_at"] <= info["finished_at"]
+
+            result = await client.get(f"/runs/{run_id}/result")
+            assert result.status_code == 200
+            assert result.json()["response"]["response"] == "done: build a todo app"
+
+    asyncio.run(scenario())
+
+def test_result_of_an_unfinished_run_is_a_conflict(api):
+    async def scenario():
+        release = asyncio.Event()
+        async with api(echo_graph(release)) as (client, _):
+            run_id = (await client.post("/runs", json=body())).json()["run_id"]
+            await wait_for_status(client, run_id, "running")
+
+            result = await client.get(f"/runs/{run_id}/result")
+            assert result.status_code == 409
+            assert "running" in result.json()["detail"]
+            release.set()
+            await wait_for_status(client, run_id, "succeeded")
+
+    asyncio.run(scenario())
+
+def test_worker_pool_bounds_concurrent_runs(api):
+    async def scenario():
+        release = asyncio.Event()
+        async with api(echo_graph(release), max_concurrency=1) as (client, service):
+            first = (await client.post("/runs", json=body("first"))).json()["run_id"]
+            second = (await client.post("/runs", json=body("second"))).json()["run_id"]
+            await wait_for_status(client, first, "running")
+            await asyncio.sleep(0.05)
+
+            assert (await client.get(f"/runs/{second}")).json()["status"] == "queued"
+            assert service.stats()["running"] == 1
+
+            release.set()
+            await wait_for_status(client, second, "succeeded")
+
+    asyncio.run(scenario())
+
+def test_invoke_workflow_waits_for_the_result(api):
+    async def scenario():
+        async with api(echo_graph()) as (client, _):
+            response = await client.post("/invoke-workflow", json=body("hello"))
+            assert response.status_code == 200
+            assert response.json()["response"]["response"] == "done: hello"
+
+    asyncio.run(scenario())
+
+def test_unknown_run_is_not_found(api):
+    async def scenario():
+        async with api(echo_graph()) as (client, _):
+            assert (await client.get("/runs/missing")).status_code == 404
+            assert (await client.get("/runs/missing/result")).status_code == 404
+
+    asyncio.run(scenario())
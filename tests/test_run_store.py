@@ -0,0 +1,147 @@
+import time
+
+import pytest
+
+from src.constants.run_status import RunStatus
+from src.services.run_store import RedisRunStore, SQLiteRunStore
+
+@pytest.fixture(params=["sqlite", "redis"])
+def store(request, tmp_path):
+    if request.param == "sqlite":
+        return SQLiteRunStore(str(tmp_path / "runs.db"))
+    fakeredis = pytest.importorskip("fakeredis")
+    pytest.importorskip("lupa")
+    return RedisRunStore("", client=fakeredis.FakeRedis())
+
+def queue_run(store, run_id: str, tenant: str = "default", created_at: float | None = None, **fields) -> None:
+    store.create({
+        "run_id": run_id,
+        "tenant": tenant,
+        "status": RunStatus.QUEUED.value,
+        "created_at": time.time() if created_at is None else created_at,
+        "inputs": {"user_request": run_id},
+        "config": {},
+        "callback_urls": [],
+        "detached": False,
+        "result": None,
+        **fields,
+    })
+
+def test_claim_is_fifo_within_a_tenant_and_fair_across_tenants(store):
+    queue_run(store, "a0", "a", created_at=1)
+    queue_run(store, "a1", "a", created_at=2)
+    queue_run(store, "a2", "a", created_at=3)
+    queue_run(store, "b0", "b", created_at=4)
+
+    claimed = [store.claim("w1")["run_id"] for _ in range(4)]
+
+    # b0 goes second although it was queued last, because tenant a already has a run going
+    assert claimed == ["a0", "b0", "a1", "a2"]
+    assert store.claim("w1") is None
+
+def test_claim_marks_the_run_running(store):
+    queue_run(store, "r0")
+
+    record = store.claim("w1")
+
+    assert record["status"] == RunStatus.RUNNING.value
+    assert record["worker_id"] == "w1"
+    assert record["inputs"] == {"user_request": "r0"}
+    assert store.get("r0")["heartbeat_at"] is not None
+    assert store.stats()["running"] == 1
+    assert store.stats()["queued"] == 0
+
+def test_heartbeat_reports_cancel_requests(store):
+    queue_run(store, "r0")
+    queue_run(store, "r1")
+    store.claim("w1")
+    store.claim("w1")
+
+    assert store.request_cancel("r1", "Stop")
+
+    assert store.heartbeat(["r0", "r1"], "w1") == {"r1": "Stop"}
+
+def test_heartbeat_and_finish_are_fenced_after_a_stale_requeue(store):
+    queue_run(store, "r0")
+    store.claim("w1")
+
+    assert store.requeue_stale(timeout=-1) == ["r0"]
+    # The run went back to the queue: w1 must stop it and may not record an outcome
+    assert store.heartbeat(["r0"], "w1") == {"r0": None}
+    assert store.get("r0")["status"] == RunStatus.QUEUED.value
+
+    assert store.claim("w2")["run_id"] == "r0"
+    assert store.heartbeat(["r0"], "w1") == {"r0": None}
+    assert store.heartbeat(["r0"], "w2") == {}
+    assert not store.finish("r0", RunStatus.FAILED.value, None, "late", "w1")
+
+    assert store.finish("r0", RunStatus.SUCCEEDED.value, {"answer": 42}, None, "w2")
+    record = store.get("r0")
+    assert record["status"] == RunStatus.SUCCEEDED.value
+    assert record["result"] == {"answer": 42}
+    assert record["finished_at"] is not None
+
+def test_requeue_is_fenced_by_worker(store):
+    queue_run(store, "r0")
+    store.claim("w1")
+
+    store.requeue(["r0"], "w2")
+    assert store.get("r0")["status"] == RunStatus.RUNNING.value
+
+    store.requeue(["r0"], "w1")
+    record = store.get("r0")
+    assert record["status"] == RunStatus.QUEUED.value
+    assert record["worker_id"] is None
+
+def test_worker_cannot_finish_a_run_twice(store):
+    queue_run(store, "r0")
+    store.claim("w1")
+
+    assert store.finish("r0", RunStatus.SUCCEEDED.value, {"answer": 1}, None, "w1")
+    assert not store.finish("r0", RunStatus.FAILED.value, None, "again", "w1")
+    assert store.get("r0")["status"] == RunStatus.SUCCEEDED.value
+
+def test_cancel_of_a_queued_run_is_immediate(store):
+    queue_run(store, "r0")
+
+    assert store.request_cancel("r0", "No longer needed")
+
+    record = store.get("r0")
+    assert record["status"] == RunStatus.CANCELLED.value
+    assert record["cancel_reason"] == "No longer needed"
+    assert store.claim("w1") is None
+    assert not store.request_cancel("r0", "Again")
+
+@pytest.mark.parametrize("status", sorted(RunStatus.resumable_states()))
+def test_reopen_requeues_a_failed_run(store, status):
+    queue_run(store, "r0")
+    store.claim("w1")
+    store.finish("r0", status.value, None, "boom", "w1")
+
+    assert store.reopen("r0")
+    assert not store.reopen("r0")
+    record = store.get("r0")
+    assert record["status"] == RunStatus.QUEUED.value
+    assert record["error"] is None
+    assert store.claim("w2")["run_id"] == "r0"
+
+def test_attach_keeps_callbacks_across_a_reclaim(store):
+    queue_run(store, "r0", dedup_key="same")
+    store.claim("w1")
+    store.attach("r0", "http://example.com/hook", detached=False)
+    store.requeue(["r0"], "w1")
+
+    record = store.claim("w2")
+    assert record["callback_urls"] == ["http://example.com/hook"]
+    assert record["detached"] is True
+    assert store.find(dedup_key="same")["run_id"] == "r0"
+
+def test_events_are_sequenced(store):
+    queue_run(store, "r0")
+
+    assert store.append_event("r0", {"event": "on_chain_start", "metadata": {"langgraph_node": "plan"}}) == 0
+    assert store.append_event("r0", {"event": "on_chain_end"}) == 1
+
+    events = store.read_events("r0", 1)
+    assert [(seq, kind, node) for seq, kind, node, _ in events] == [(1, "on_chain_end", None)]
+    assert store.read_events("r0", 0)[0][1:3] == ("on_chain_start", "plan")
@@ -0,0 +1,116 @@
+import asyncio
+import sqlite3
+import threading
+
+import pytest
+from langchain_core.messages import HumanMessage
+
+from src.core.semantic_cache import SemanticCache, terms_match
+
+PARAPHRASES = [
+    ("로그인 기능 하나만 만들어 줘", "로그인 기능 하나 만들어줘"),
+    ("쇼핑몰 웹사이트 만들어줘. 결제 기능 포함", "쇼핑몰 웹사이트 만들어 줘, 결제 기능 포함!"),
+    ("Build a todo app with user login", "build a TODO app with user login."),
+    ("할 일 관리 앱을 만들어 주세요. 사용자 로그인 기능이 필요합니다.", "할일 관리 앱을 만들어주세요. 사용자 로그인 기능이 필요합니다"),
+    ("게시판 웹 서비스 만들어줘. 글쓰기, 댓글, 좋아요 기능", "게시판 웹서비스 만들어 줘 글쓰기 댓글 좋아요 기능"),
+    ("Create a blog platform with comments and tags", "Create a blog platform with tags and comments"),
+]
+
+# Requests that differ in a single clause: similar enough to be candidates, but asking for something else
+NEAR_MISSES = [
+    ("쇼핑몰 웹사이트 만들어줘. 결제 기능 포함", "쇼핑몰 웹사이트 만들어줘. 결제 기능 제외"),
+    ("Build a todo app with user login", "Build a todo app without user login"),
+    ("게시판 웹 서비스 만들어줘. 글쓰기, 댓글, 좋아요 기능", "게시판 웹 서비스 만들어줘. 글쓰기, 댓글 기능"),
+    ("할 일 관리 앱을 만들어 주세요. 사용자 로그인 기능이 필요합니다.", "할 일 관리 앱을 만들어 주세요. 사용자 로그인 기능은 필요 없습니다."),
+    ("Create a blog platform with comments and tags", "Create a blog platform with comments and tags in Java"),
+    ("React로 쇼핑몰 프론트엔드 만들어줘", "Vue로 쇼핑몰 프론트엔드 만들어줘"),
+    ("상품 목록 페이지 3개 만들어줘", "상품 목록 페이지 5개 만들어줘"),
+]
+
+@pytest.fixture
+def cache(tmp_path) -> SemanticCache:
+    return SemanticCache(str(tmp_path / "cache.db"))
+
+@pytest.mark.parametrize(("cached", "request_text"), PARAPHRASES)
+def test_paraphrases_hit(cache, cached, request_text):
+    cache.add(cached, {"request": cached}, scope="t1")
+
+    assert cache.lookup(request_text, scope="t1") == {"request": cached}
+
+@pytest.mark.parametrize(("cached", "request_text"), NEAR_MISSES)
+def test_near_misses_are_rejected(cache, cached, request_text):
+    cache.add(cached, {"request": cached}, scope="t1")
+
+    assert cache.lookup(request_text, scope="t1") is None
+    assert cache.lookup(cached, scope="t1") == {"request": cached}
+
+def test_entries_are_scoped_per_tenant(cache):
+    cache.add("Build a todo app with user login", {"tenant": "t1"}, scope="t1")
+
+    assert cache.lookup("Build a todo app with user login", scope="t2") is None
+    cache.add("Build a todo app with user login", {"tenant": "t2"}, scope="t2")
+    assert cache.lookup("build a TODO app with user login.", scope="t1") == {"tenant": "t1"}
+    assert cache.lookup("build a TODO app with user login.", scope="t2") == {"tenant": "t2"}
+
+def test_entries_survive_a_restart(tmp_path):
+    path = str(tmp_path / "cache.db")
+    SemanticCache(path).add("로그인 기능 하나만 만들어 줘", {"ok": True}, scope="t1")
+
+    reopened = SemanticCache(path)
+
+    assert reopened.lookup("로그인 기능 하나 만들어줘", scope="t1") == {"ok": True}
+
+def test_entries_without_a_scope_are_dropped(tmp_path):
+    path = str(tmp_path / "cache.db")
+    db = sqlite3.connect(path)
+    db.execute("CREATE TABLE semantic_cache (key TEXT PRIMARY KEY, signature TEXT, value TEXT, created_at REAL)")
+    db.execute("INSERT INTO semantic_cache VALUES ('k', '[]', '{}', 0)")
+    db.commit()
+    db.close()
+
+    assert SemanticCache(path).stats()["entries"] == 0
+
+def test_terms_match():
+    assert terms_match("할 일 관리 앱", "할일 관리 앱")
+    assert not terms_match("todo app with login", "todo app without login")
+
+class RecordingCache(SemanticCache):
+    """Records the thread of every lookup and write."""
+    def __init__(self, path: str):
+        super().__init__(path)
+        self.threads = []
+
+    def lookup(self, text, scope="default"):
+        self.threads.append(threading.current_thread())
+        return super().lookup(text, scope)
+
+    def add(self, text, value, scope="default"):
+        self.threads.append(threading.current_thread())
+        super().add(text, value, scope)
+
+def test_define_req_uses_the_cache_off_the_event_loop(tmp_path, monkeypatch):
+    from src.workflow import graph as workflow
+
+    cache = RecordingCache(str(tmp_path / "cache.db"))
+    calls = []
+
+    class Chain:
+        async def ainvoke(self, inputs):
+            calls.append(inputs)
+            return {"project_name": "Todo", "functional_requirements": ["login"]}
+
+    monkeypatch.setattr(workflow, "semantic_cache", cache)
+    monkeypatch.setattr(workflow, "req_def_chain", Chain())
+
+    async def define(text: str, tenant: str):
+        return await workflow.define_req({"messages": [HumanMessage(content=text)]}, {"configurable": {"tenant": tenant}})
+
+    first = asyncio.run(define("Build a todo app with user login", "a"))
+    paraphrased = asyncio.run(define("build a TODO app with user login.", "a"))
+    other_tenant = asyncio.run(define("Build a todo app with user login", "b"))
+
+    assert first["project_name"] == paraphrased["project_name"] == other_tenant["project_name"] == "Todo"
+    assert len(calls) == 2
+    # lookup, add / lookup / lookup, add
+    assert len(cache.threads) == 5
+    assert threading.main_thread() not in cache.threads
@@ -0,0 +1,110 @@
+import asyncio
+
+import pytest
+from langchain_core.messages import AIMessage
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.runnables import RunnableLambda
+from pydantic import BaseModel
+
+from src.utils.structured_output import StructuredOutputError, repair, structured_chain
+
+class Endpoint(BaseModel):
+    method: str
+    path: str
+
+class Api(BaseModel):
+    name: str
+    endpoints: list[Endpoint]
+    tags: list[str] = []
+
+def test_valid_tool_call_args():
+    message = AIMessage(content="", tool_calls=[{"name": "Api", "args": {"name": "todo", "endpoints": []}, "id": "1"}])
+
+    parsed, _, errors = repair(message, Api)
+
+    assert parsed == Api(name="todo", endpoints=[])
+    assert errors == ""
+
+def test_json_in_a_code_fence_with_a_trailing_comma():
+    message = AIMessage(content='Here it is:\n```json\n{"name": "todo", "endpoints": [{"method": "GET", "path": "/"},],}\n```')
+
+    parsed, _, _ = repair(message, Api)
+
+    assert parsed == Api(name="todo", endpoints=[Endpoint(method="GET", path="/")])
+
+def test_wrapper_object_and_json_strings_are_unwrapped():
+    args = {"Api": {"name": "todo", "endpoints": '[{"method": "POST", "path": "/items"}]', "tags": "crud"}}
+    message = AIMessage(content="", tool_calls=[{"name": "Api", "args": args, "id": "1"}])
+
+    parsed, _, _ = repair(message, Api)
+
+    assert parsed == Api(name="todo", endpoints=[Endpoint(method="POST", path="/items")], tags=["crud"])
+
+def test_invalid_tool_call_json_is_parsed():
+    message = AIMessage(
+        content="",
+        invalid_tool_calls=[{"name": "Api", "args": '{"name": "todo", "endpoints": null,}', "id": "1", "error": None}],
+    )
+
+    parsed, _, _ = repair(message, Api)
+
+    assert parsed == Api(name="todo", endpoints=[])
+
+def test_remaining_errors_are_described():
+    message = AIMessage(content='{"endpoints": [{"method": "GET"}]}')
+
+    parsed, candidate, errors = repair(message, Api)
+
+    assert parsed is None
+    assert candidate == {"endpoints": [{"method": "GET"}]}
+    assert errors.splitlines() == [
+        "name: Field required (got {'endpoints': [{'method': 'GET'}]})",
+        "endpoints.0.path: Field required (got {'method': 'GET'})",
+    ]
+
+def test_output_without_json():
+    parsed, candidate, errors = repair(AIMessage(content="I cannot do that."), Api)
+
+    assert parsed is None
+    assert candidate == "I cannot do that."
+    assert errors == "The output contains no JSON object."
+
+class ScriptedModel:
+    """Stands in for a chat model's `with_structured_output(include_raw=True)`, returning prepared messages."""
+
+    def __init__(self, *messages: AIMessage):
+        self.messages = list(messages)
+        self.calls = []
+
+    def with_structured_output(self, schema, include_raw: bool = False):
+        def respond(prompt_value):
+            self.calls.append(prompt_value)
+            raw = self.messages.pop(0)
+            args = raw.tool_calls[0]["args"] if raw.tool_calls else None
+            try:
+                parsed = schema.model_validate(args) if args is not None else None
+            except ValueError:
+                parsed = None
+            return {"raw": raw, "parsed": parsed, "parsing_error": None}
+        return RunnableLambda(respond)
+
+PROMPT = ChatPromptTemplate([("human", "{request}")])
+
+def test_chain_asks_for_a_correction():
+    model = ScriptedModel(
+        AIMessage(content='{"name": "todo"}'),
+        AIMessage(content="", tool_calls=[{"name": "Api", "args": {"name": "todo", "endpoints": []}, "id": "1"}]),
+    )
+
+    result = asyncio.run(structured_chain(PROMPT, model, Api, corrections=1).ainvoke({"request": "todo api"}))
+
+    assert result == {"name": "todo", "endpoints": [], "tags": []}
+    correction = model.calls[1].to_string()
+    assert "endpoints: Field required" in correction
+    assert "todo api" not in correction
+
+def test_chain_fails_after_its_corrections():
+    model = ScriptedModel(AIMessage(content='{"name": "todo"}'), AIMessage(content="Sorry."))
+
+    with pytest.raises(StructuredOutputError, match="endpoints: Field required"):
+        asyncio.run(structured_chain(PROMPT, model, Api, corrections=1).ainvoke({"request": "todo api"}))
@@ -0,0 +1,82 @@
+import asyncio
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from src.services.webhook_service import deliver_webhook
+from test_run_api import body, echo_graph, wait_for_status
+
+class Receiver:
+    """Local webhook endpoint answering with scripted status codes; 200 once the script runs out."""
+
+    def __init__(self):
+        self.statuses: list[int] = []
+        self.payloads: list[dict] = []
+        self.received = threading.Event()
+        receiver = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                length = int(self.headers["Content-Length"])
+                receiver.payloads.append(json.loads(self.rfile.read(length)))
+                self.send_response(receiver.statuses.pop(0) if receiver.statuses else 200)
+                self.end_headers()
+                receiver.received.set()
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}/hook"
+
+@pytest.fixture
+def receiver():
+    receiver = Receiver()
+    thread = threading.Thread(target=receiver.server.serve_forever, daemon=True)
+    thread.start()
+    yield receiver
+    receiver.server.shutdown()
+    receiver.server.server_close()
+
+def test_retryable_failures_are_retried(receiver):
+    receiver.statuses = [503, 500]
+
+    delivered = asyncio.run(deliver_webhook(receiver.url, {"run_id": "r0"}, max_retries=3, base_delay=0.01))
+
+    assert delivered
+    assert receiver.payloads == [{"run_id": "r0"}] * 3
+
+def test_client_errors_are_not_retried(receiver):
+    receiver.statuses = [400]
+
+    assert not asyncio.run(deliver_webhook(receiver.url, {"run_id": "r0"}, max_retries=3, base_delay=0.01))
+    assert len(receiver.payloads) == 1
+
+def test_gives_up_after_max_retries(receiver):
+    receiver.statuses = [503] * 5
+
+    assert not asyncio.run(deliver_webhook(receiver.url, {"run_id": "r0"}, max_retries=2, base_delay=0.01))
+    assert len(receiver.payloads) == 3
+
+def test_unreachable_receiver_is_retried():
+    delivered = asyncio.run(deliver_webhook("http://127.0.0.1:9/hook", {}, max_retries=1, base_delay=0.01, timeout=1))
+
+    assert not delivered
+
+def test_run_outcome_is_posted_to_the_callback_url(api, receiver):
+    async def scenario():
+        async with api(echo_graph()) as (client, _):
+            response = await client.post("/invoke-workflow", json=body(callback_url=receiver.url))
+            # The connection is not held open when the outcome goes to a webhook
+            assert response.status_code == 202
+            run_id = response.json()["run_id"]
+            await wait_for_status(client, run_id, "succeeded")
+            assert await asyncio.to_thread(receiver.received.wait, 5)
+
+    asyncio.run(scenario())
+
+    payload, = receiver.payloads
+    assert payload["status"] == "succeeded"
+    assert payload["response"]["response"] == "done: build a todo app"